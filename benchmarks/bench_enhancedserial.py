@@ -0,0 +1,142 @@
+"""
+Copyright 2019 ARM Limited
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Benchmark for EnhancedSerial line reading over a pty loopback. Compares the bytearray line
+framer against the previous str concatenating implementation.
+
+Usage: python benchmarks/bench_enhancedserial.py [--megabytes 0.25] [--line-length 120]
+"""
+
+import argparse
+import os
+import sys
+import time
+from threading import Thread
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# pylint: disable=wrong-import-position
+from serial import SerialException, SerialTimeoutException
+from icetea_lib.enhancedserial import EnhancedSerial
+
+CLOCK = getattr(time, "perf_counter", time.time)
+
+
+class LegacyEnhancedSerial(EnhancedSerial):  # pylint: disable=too-many-ancestors
+    """
+    EnhancedSerial with the previous readline implementation.
+    """
+    def __init__(self, *args, **kwargs):
+        super(LegacyEnhancedSerial, self).__init__(*args, **kwargs)
+        self.legacy_buf = ''
+
+    def readline(self, timeout=1):
+        tries = 0
+        while 1:
+            try:
+                block = self.read(512)
+                if isinstance(block, bytes):
+                    block = block.decode()
+                elif isinstance(block, str):
+                    block = block.decode()
+                else:
+                    raise ValueError("Unknown data")
+            except (SerialTimeoutException, SerialException, ValueError):
+                block = ''
+            with self.buffer_lock:
+                self.legacy_buf += block
+                pos = self.legacy_buf.find('\n')
+                if pos >= 0:
+                    line, self.legacy_buf = self.legacy_buf[:pos+1], self.legacy_buf[pos+1:]
+                    return line
+            tries += 1
+            if tries * self.timeout > timeout:
+                break
+        return None
+
+    def readlines(self, timeout=1):
+        lines = []
+        while 1:
+            line = self.readline(timeout=timeout)
+            if line:
+                lines.append(line)
+            if not line or line[-1:] != '\n':
+                break
+        return lines
+
+
+def writer(master_fd, payload, repeat):
+    """
+    Write payload repeat times to pty master.
+    """
+    for _ in range(repeat):
+        view = memoryview(payload)
+        while view:
+            written = os.write(master_fd, view)
+            view = view[written:]
+
+
+def run_case(serial_class, megabytes, line_length, batch):
+    """
+    Read megabytes of lines through a pty and return (MB/s, lines/s).
+    """
+    master_fd, slave_fd = os.openpty()
+    port = serial_class(os.ttyname(slave_fd), baudrate=460800, timeout=0.05)
+    line = ("x" * (line_length - 1) + "\n").encode()
+    payload = line * max(1, 65536 // len(line))
+    repeat = max(1, int(megabytes * 1024 * 1024 / len(payload)))
+    expected = repeat * (len(payload) // len(line))
+    thread = Thread(target=writer, args=(master_fd, payload, repeat))
+    start = CLOCK()
+    thread.start()
+    received = 0
+    while received < expected:
+        if batch:
+            lines = port.readlines(timeout=2)
+        else:
+            lines = [port.readline(timeout=2)]
+        if not lines or lines[0] is None:
+            break
+        received += len(lines)
+    duration = CLOCK() - start
+    thread.join()
+    port.close()
+    os.close(master_fd)
+    os.close(slave_fd)
+    if received != expected:
+        raise RuntimeError("%s received %d/%d lines" % (serial_class.__name__, received,
+                                                        expected))
+    return received * len(line) / duration / 1024 / 1024, received / duration
+
+
+def main():
+    """
+    Benchmark entry point.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark EnhancedSerial line reading")
+    parser.add_argument("--megabytes", type=float, default=0.25, help="Amount of data to read")
+    parser.add_argument("--line-length", type=int, default=120, help="Length of one line")
+    args = parser.parse_args()
+
+    print("%-28s %10s %12s" % ("implementation", "MB/s", "lines/s"))
+    cases = [("legacy readline", LegacyEnhancedSerial, False),
+             ("framer readline", EnhancedSerial, False),
+             ("framer readlines", EnhancedSerial, True)]
+    for name, serial_class, batch in cases:
+        rate, lines = run_case(serial_class, args.megabytes, args.line_length, batch)
+        print("%-28s %10.2f %12.0f" % (name, rate, lines))
+
+
+if __name__ == "__main__":
+    main()
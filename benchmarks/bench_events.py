@@ -0,0 +1,82 @@
+"""
+Copyright 2019 ARM Limited
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Benchmark for event dispatch. Registers a number of regex EventMatchers waiting for lines
+from other duts and measures the cost of emitting DUT_LINE_RECEIVED events from one dut.
+
+Usage: python benchmarks/bench_events.py [--matchers 0,10,100,1000] [--events 20000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# pylint: disable=wrong-import-position
+from icetea_lib.Events.EventMatcher import EventMatcher
+from icetea_lib.Events.Generics import Event, EventTypes
+
+CLOCK = getattr(time, "perf_counter", time.time)
+
+
+class Source(object):  # pylint: disable=too-few-public-methods
+    """
+    Stand-in for a dut emitting events.
+    """
+    def __init__(self, name):
+        self.name = name
+
+
+def run_case(matcher_count, event_count):
+    """
+    Emit events from one source while matcher_count matchers wait for other sources.
+
+    :return: microseconds per event
+    """
+    others = [Source("dut%d" % i) for i in range(max(1, matcher_count // 10))]
+    matchers = [EventMatcher(EventTypes.DUT_LINE_RECEIVED, "regex:^ready [0-9]+$",
+                             others[i % len(others)], forget=False)
+                for i in range(matcher_count)]
+    source = Source("emitter")
+    watcher = EventMatcher(EventTypes.DUT_LINE_RECEIVED, "regex:never matches$", source,
+                           forget=False)
+    start = CLOCK()
+    for _ in range(event_count):
+        Event(EventTypes.DUT_LINE_RECEIVED, source, "line of trace data from the dut")
+    duration = CLOCK() - start
+    watcher.forget()
+    for matcher in matchers:
+        matcher.forget()
+    return duration / event_count * 1e6
+
+
+def main():
+    """
+    Benchmark entry point.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark event dispatch")
+    parser.add_argument("--matchers", default="0,10,100,1000",
+                        help="Comma separated counts of matchers for other duts")
+    parser.add_argument("--events", type=int, default=20000, help="Events emitted per case")
+    args = parser.parse_args()
+
+    print("%10s %12s" % ("matchers", "us/event"))
+    for matcher_count in [int(count) for count in args.matchers.split(",")]:
+        print("%10d %12.2f" % (matcher_count, run_case(matcher_count, args.events)))
+
+
+if __name__ == "__main__":
+    main()
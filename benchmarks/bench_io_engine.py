@@ -0,0 +1,161 @@
+"""
+Copyright 2019 ARM Limited
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Benchmark for dut I/O engines. Compares the DutThread + NonBlockingStreamReader design,
+direct processing in the NonBlockingStreamReader threads and the DutReactor with a number
+of pipe backed duts. Every dut gets its own writer
+thread emitting timestamped lines and the latency is measured from write to
+DUT_LINE_RECEIVED event.
+
+Usage: python benchmarks/bench_io_engine.py [--duts 1,10,30,60] [--lines 2000]
+"""
+
+import argparse
+import os
+import sys
+import time
+from argparse import Namespace
+from threading import Event, Lock, Thread
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# pylint: disable=wrong-import-position
+import icetea_lib.LogManager as LogManager
+from icetea_lib.DeviceConnectors.Dut import Dut
+from icetea_lib.Events.Generics import EventTypes, Observer
+from icetea_lib.tools.GenericProcess import NonBlockingStreamReader
+
+CLOCK = getattr(time, "perf_counter", time.time)
+
+
+class PipeDut(Dut):
+    """
+    Dut reading lines from a pipe with the selected I/O engine.
+    """
+    def __init__(self, name, params):
+        super(PipeDut, self).__init__(name, params)
+        self.read_fd, self.write_fd = os.pipe()
+        self.reader = None
+
+    def open_connection(self):
+        reactor = Dut.get_reactor()
+        if reactor is not None:
+            self.reader = reactor.create_stream(self.read_fd, lambda: Dut.process_dut(self))
+        else:
+            self.reader = NonBlockingStreamReader(os.fdopen(self.read_fd, "rb", 0),
+                                                  lambda: Dut.process_received(self))
+        self.reader.start()
+
+    def close_connection(self):
+        self.reader.stop()
+        os.close(self.write_fd)
+
+    def readline(self, timeout=1):
+        return self.reader.readline()
+
+    def writeline(self, data):
+        pass
+
+    def print_info(self):
+        pass
+
+    def prepare_connection_close(self):
+        pass
+
+
+class LatencyCollector(Observer):
+    """
+    Collects line latencies from DUT_LINE_RECEIVED events.
+    """
+    def __init__(self, expected):
+        super(LatencyCollector, self).__init__()
+        self.expected = expected
+        self.latencies = []
+        self.done = Event()
+        self._lock = Lock()
+        self.observe(EventTypes.DUT_LINE_RECEIVED, self._line_received)
+
+    def _line_received(self, _dut, line):
+        latency = CLOCK() - float(line.split(" ", 1)[0])
+        with self._lock:
+            self.latencies.append(latency)
+            if len(self.latencies) >= self.expected:
+                self.done.set()
+
+
+def writer(dut, lines, interval):
+    """
+    Write timestamped lines into dut pipe.
+    """
+    payload = " " + "x" * 60 + "\n"
+    for _ in range(lines):
+        os.write(dut.write_fd, ("%.9f" % CLOCK() + payload).encode())
+        if interval:
+            time.sleep(interval)
+
+
+def run_case(engine, dut_count, lines, interval):
+    """
+    Run one benchmark case and return (lines/s, p50, p99) latencies in milliseconds.
+    """
+    params = Namespace(io_engine=engine)
+    duts = [PipeDut("D%d" % index, params) for index in range(dut_count)]
+    for dut in duts:
+        dut.open_dut()
+        dut.start_dut_thread()
+    collector = LatencyCollector(dut_count * lines)
+    start = CLOCK()
+    writers = [Thread(target=writer, args=(dut, lines, interval)) for dut in duts]
+    for thread in writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    finished = collector.done.wait(120)
+    duration = CLOCK() - start
+    collector.forget()
+    for dut in duts:
+        dut.close_dut(use_prepare=False)
+        dut.close_connection()
+    if not finished:
+        raise RuntimeError("%s engine lost lines with %d duts" % (engine, dut_count))
+    latencies = sorted(collector.latencies)
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    return len(latencies) / duration, p50, p99
+
+
+def main():
+    """
+    Benchmark entry point.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark dut I/O engines")
+    parser.add_argument("--duts", default="1,10,30,60", help="Comma separated dut counts")
+    parser.add_argument("--lines", type=int, default=2000, help="Lines written per dut")
+    parser.add_argument("--interval", type=float, default=0.0,
+                        help="Delay between lines written by one dut, in seconds")
+    args = parser.parse_args()
+
+    logdir = os.path.join("log", "bench_io_engine")
+    LogManager.init_base_logging(logdir, verbose=0, silent=True)
+    LogManager.init_testcase_logging("bench_io_engine", verbose=0, silent=True)
+
+    print("%-8s %6s %12s %10s %10s" % ("engine", "duts", "lines/s", "p50 ms", "p99 ms"))
+    for dut_count in [int(count) for count in args.duts.split(",")]:
+        for engine in ("thread", "direct", "reactor"):
+            rate, p50, p99 = run_case(engine, dut_count, args.lines, args.interval)
+            print("%-8s %6d %12.0f %10.3f %10.3f" % (engine, dut_count, rate, p50, p99))
+
+
+if __name__ == "__main__":
+    main()
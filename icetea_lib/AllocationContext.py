@@ -133,6 +133,7 @@ class AllocationContextList(object):
         self.dutinformations = []
         self._resource_configuration = None
         self._dut_initialization_functions = {}
+        self._connection_error_handler = None
 
     def __len__(self):
         """
@@ -206,6 +207,16 @@ class AllocationContextList(object):
         """
         return self._dut_initialization_functions.get(dut_type)
 
+    def set_connection_error_handler(self, fnctn):
+        """
+        Set a callable that is called with the dut when opening a dut connection fails, for
+        example to let the allocator know the device didn't work.
+
+        :param fnctn: callable
+        :return: Nothing
+        """
+        self._connection_error_handler = fnctn
+
     def set_resconf(self, resconf):
         """
         Set resource configuration.
@@ -357,18 +368,29 @@ class AllocationContextList(object):
         :raises DutConnectionError: if problems were encountered while opening dut connection.
         """
         for dut in self.duts:
-            try:
-                dut.start_dut_thread()
-                if hasattr(dut, "command"):
-                    dut.open_dut(dut.command)
-                else:
-                    dut.open_dut()
-            except DutConnectionError:
-                self.logger.exception("Failed when opening dut connection")
-                dut.close_dut(False)
-                dut.close_connection()
-                dut = None
-                raise
+            self.open_dut_connection(dut)
+
+    def open_dut_connection(self, dut):
+        """
+        Opens connection to a Dut. Starts Dut read threads.
+
+        :param dut: Dut
+        :return: Nothing
+        :raises DutConnectionError: if problems were encountered while opening dut connection.
+        """
+        try:
+            dut.start_dut_thread()
+            if hasattr(dut, "command"):
+                dut.open_dut(dut.command)
+            else:
+                dut.open_dut()
+        except DutConnectionError:
+            self.logger.exception("Failed when opening dut connection")
+            if self._connection_error_handler is not None:
+                self._connection_error_handler(dut)
+            dut.close_dut(False)
+            dut.close_connection()
+            raise
 
     def check_flashing_need(self, execution_type, build_id, force):
         """
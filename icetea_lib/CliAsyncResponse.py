@@ -17,30 +17,163 @@ which is a proxy for a future CliResponse.
 
 """
 
+import time
+from threading import Event, Lock
+
+try:
+    from queue import Queue, Empty
+except ImportError:
+    from Queue import Queue, Empty  # pylint: disable=import-error
+
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
 import icetea_lib.LogManager as LogManager
 
+CLOCK = getattr(time, "monotonic", time.time)
+
 
-class CliAsyncResponse(object):  # pylint: disable=too-few-public-methods
+class CliAsyncResponse(object):
     """Proxy class to a future CliResponse, a response to an async comand.
        If any function of Cliresponse is called on an instance of this class
        the system will wait and block for the response to become ready.
+
+       The response also implements the concurrent.futures.Future interface, and the wrapped
+       Future is available as the future attribute. Done callbacks are called with the
+       CliAsyncResponse, in the dut thread if the response arrives from the dut.
     """
 
-    def __init__(self, dut):
+    def __init__(self, dut, request=None, deadline=None, pipelined=False):
+        """
+        :param dut: Dut that executes the command.
+        :param request: CliRequest of the command.
+        :param deadline: Deadline for the response, in dut time.
+        :param pipelined: True if the command was sent in pipelined mode.
+        """
         try:
             self.logger = LogManager.get_bench_logger()
         except KeyError:
             self.logger = None
         self.response = None
+        self.error = None
+        self.ready = Event()
+        self._completed = False
+        self._complete_lock = Lock()
+        self.future = Future()
+        # Commands can't be cancelled once they have been given to the dut.
+        self.future.set_running_or_notify_cancel()
         self.dut = dut
+        self.request = request
+        self.deadline = deadline
+        self.pipelined = pipelined
 
-    def set_response(self, response):
+    def set_response(self, response, error=None):
         """
         Set the response, this function should not be called directly,
         the DUT will do it when a response is available.
+
+        :param response: CliResponse
+        :param error: Exception to raise to the caller waiting for the response, if the
+        command failed.
         """
-        if self.response is None:
+        # The dut thread and the waiting thread can both complete the response, the first one
+        # wins. Done callbacks are called outside the lock.
+        with self._complete_lock:
+            if self._completed or self.future.done():
+                return
+            self._completed = True
+            # Error first, accessors that see the response must see its error too.
+            self.error = error
             self.response = response
+        self.ready.set()
+        if error is not None:
+            self.future.set_exception(error)
+        else:
+            self.future.set_result(response)
+
+    def wait(self, timeout=None):
+        """
+        Wait for the response. A response whose deadline has passed is completed with a
+        timeout error.
+
+        :param timeout: Seconds to wait, None to wait until the deadline of the command.
+        :return: Boolean, True if the response is ready.
+        """
+        if timeout is not None and not self.ready.is_set():
+            remaining = None
+            if self.deadline is not None:
+                remaining = max(0, self.deadline - self.dut.get_time())
+            if self.ready.wait(timeout if remaining is None else min(timeout, remaining)):
+                return True
+            if remaining is None or timeout < remaining:
+                return False
+        try:
+            self.__wait_for_response()
+        except Exception:  # pylint: disable=broad-except
+            # Errors of the command are stored in the future.
+            if not self.future.done():
+                raise
+        return self.ready.is_set()
+
+    def done(self):
+        """
+        :return: Boolean, True if the response is ready.
+        """
+        return self.future.done()
+
+    def running(self):
+        """
+        :return: Boolean, True if the command is still waiting for the response.
+        """
+        return not self.future.done()
+
+    def cancel(self):  # pylint: disable=no-self-use
+        """
+        Commands can't be cancelled.
+
+        :return: False
+        """
+        return False
+
+    def cancelled(self):  # pylint: disable=no-self-use
+        """
+        :return: False
+        """
+        return False
+
+    def result(self, timeout=None):
+        """
+        Get the response, waiting for it if needed.
+
+        :param timeout: Seconds to wait, None to wait until the deadline of the command.
+        :return: CliResponse
+        :raises: concurrent.futures.TimeoutError if the response was not ready in time.
+        TestStepError, TestStepTimeout if the command failed.
+        """
+        if not self.wait(timeout):
+            raise FutureTimeoutError()
+        return self.future.result(0)
+
+    def exception(self, timeout=None):
+        """
+        Get the error of the command, waiting for the response if needed.
+
+        :param timeout: Seconds to wait, None to wait until the deadline of the command.
+        :return: Exception or None
+        :raises: concurrent.futures.TimeoutError if the response was not ready in time.
+        """
+        if not self.wait(timeout):
+            raise FutureTimeoutError()
+        return self.future.exception(0)
+
+    def add_done_callback(self, callback):
+        """
+        Call callback with this response when the response is ready. If the response is
+        already ready, callback is called immediately.
+
+        :param callback: callable taking a CliAsyncResponse
+        :return: Nothing
+        """
+        self.future.add_done_callback(lambda _: callback(self))
 
     def __wait_for_response(self):
         """
@@ -49,25 +182,96 @@ class CliAsyncResponse(object):  # pylint: disable=too-few-public-methods
         if self.response is None:
             # The response will be filled - anyway - by the DUT,
             # there is no need to set it twice.
-            self.dut._wait_for_exec_ready()  # pylint: disable=protected-access
+            if self.pipelined:
+                self.dut._wait_for_pipelined_response(self)  # pylint: disable=protected-access
+            else:
+                self.dut._wait_for_exec_ready()  # pylint: disable=protected-access
+
+    def __get_response(self):
+        """
+        Wait for the response and raise the error of the command if it failed, for example
+        because the dut died.
+
+        :return: CliResponse
+        :raises: TestStepError, TestStepTimeout if the command failed.
+        """
+        self.__wait_for_response()
+        if self.error is not None:
+            if getattr(self.dut, "died", False):
+                self.dut._complete_death_reason()  # pylint: disable=protected-access
+            raise self.error
+        return self.response
 
     def __getattr__(self, name):
         """
         Forward calls and attribute lookup to the inner response once it is available
         """
-        self.__wait_for_response()
-        return getattr(self.response, name)
+        return getattr(self.__get_response(), name)
 
     def __str__(self):
         """
         Return the string representation of the response once it is available
         """
-        self.__wait_for_response()
-        return self.response.__str__()
+        return self.__get_response().__str__()
 
     def __getitem__(self, item):
         """
         Index operator forwarded to the response once it is available
         """
-        self.__wait_for_response()
-        return self.response.__getitem__(item)
+        return self.__get_response().__getitem__(item)
+
+
+def as_completed(responses, timeout=None, poll_interval=1):
+    """
+    Iterate responses in the order they become ready.
+
+    :param responses: iterable of CliAsyncResponse
+    :param timeout: Seconds to wait for all responses, None to wait until the deadlines of the
+    commands.
+    :param poll_interval: Maximum seconds to wait without a response becoming ready.
+    :return: generator of CliAsyncResponse
+    :raises: concurrent.futures.TimeoutError if all responses were not ready before timeout.
+    """
+    pending = set(responses)
+    ready = Queue()
+    for response in pending:
+        response.add_done_callback(ready.put)
+    end = None if timeout is None else CLOCK() + timeout
+    while pending:
+        wait_time = poll_interval
+        if end is not None:
+            wait_time = max(0, min(wait_time, end - CLOCK()))
+        for response in pending:
+            if response.deadline is not None:
+                wait_time = max(0, min(wait_time, response.deadline - response.dut.get_time()))
+        try:
+            response = ready.get(timeout=wait_time)
+        except Empty:
+            if end is not None and CLOCK() >= end:
+                raise FutureTimeoutError("%d responses not ready" % len(pending))
+            # Complete responses whose deadline has passed.
+            for response in list(pending):
+                if response.deadline is not None and \
+                        response.deadline <= response.dut.get_time():
+                    response.wait(0)
+            continue
+        if response in pending:
+            pending.remove(response)
+            yield response
+
+
+def wait_all(responses, timeout=None):
+    """
+    Wait for all responses to become ready.
+
+    :param responses: iterable of CliAsyncResponse
+    :param timeout: Seconds to wait for all responses, None to wait until the deadlines of the
+    commands.
+    :return: Boolean, True if all responses are ready.
+    """
+    try:
+        for _ in as_completed(responses, timeout):
+            pass
+    except FutureTimeoutError:
+        return False
+    return True
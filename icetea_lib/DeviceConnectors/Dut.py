@@ -18,22 +18,29 @@ mechanisms.
 """
 
 
-import re
+import binascii
+import os
+import tempfile
 import time
 import types
 from collections import deque
-from threading import Thread, Event, Semaphore
+from threading import Thread, Event, Semaphore, Condition, Lock, RLock
 from six import string_types
 
 import icetea_lib.LogManager as LogManager
 from icetea_lib.CliAsyncResponse import CliAsyncResponse
 from icetea_lib.CliRequest import CliRequest
 from icetea_lib.CliResponse import CliResponse
+from icetea_lib.DeviceConnectors.DutReactor import DutReactor, reactor_available
+from icetea_lib.DeviceConnectors.LineClassifier import LineClassifier
 from icetea_lib.Events.EventMatcher import EventMatcher
 from icetea_lib.Events.Generics import EventTypes
 from icetea_lib.Events.Generics import Event as EventObject
+from icetea_lib.Events.Generics import get_event_queue, set_event_queue
+from icetea_lib.Events.EventQueue import EventQueue
 from icetea_lib.TestStepError import TestStepError, TestStepFail, TestStepTimeout
-from icetea_lib.tools.tools import num
+from icetea_lib.TraceStore import TraceStore
+from icetea_lib.tools.Framers import create_framer
 
 
 class DutConnectionError(Exception):
@@ -60,15 +67,17 @@ class Dut(object):  # pylint: disable=too-many-instance-attributes,too-many-publ
     """
 
     _dutlist = None
+    _dutlist_lock = Lock()  # Duts are created and closed in parallel
     _run = False
     _th = None
     _logger = None
     _sem = None
     _signalled_duts = None
+    _reactor = None
+    _direct = False
+    trace_policies = ("off", "ring", "spill")
 
     def __init__(self, name, params=None):
-        if Dut._dutlist is None:
-            Dut._dutlist = []
         self.testcase = ''
         self.version = {}
         self.dutinformation = None
@@ -88,20 +97,40 @@ class Dut(object):  # pylint: disable=too-many-instance-attributes,too-many-publ
         self.waiting_for_response = None
         self.response_coming_in = None  # Response coming in
         self.prev = None  # Previous command, stored for logging purposes
-        self._store_traces = True
-        self.traces = []  # All traces
+        self._trace_policy = "ring"
+        self._trace_policy_on = "ring"  # Policy restored when store_traces is set True
+        self.traces = TraceStore()  # All traces
         self.response_traces = []  # Incoming response lines
         self.response_received = Event()
         self.response_received.set()
+        self.alive_check_interval = 1  # [s] max interval between _dut_is_alive checks
+        self.died = False  # True after the connection to the dut has broken
+        self.death_reason = None  # Reason of the death reported by the connector, if any
+        self._pipelined = None
+        self._pipeline = deque()  # Outstanding pipelined commands, oldest first
+        self._pipeline_writes = deque()  # Pipelined commands waiting to be written
+        self._pipeline_cond = Condition()
+        self._line_classifier = None
+        self._frame_codec = None  # Framer of the "framing" configuration, used for encoding
+        self._frames = deque()  # Received binary frames, oldest first
+        self._frame_cond = Condition()
         self.config = {}
         self.init_cli_cmds = None
         self.post_cli_cmds = None
         self.params = params
+        self._init_trace_policy()
         self.index = None
         self.init_done = Event()
+        # Serializes processing of this dut between the dut thread and read threads.
+        self._process_lock = RLock()
         self.init_event_matcher = None
         self.init_wait_timeout = None
-        Dut._dutlist.append(self)
+        # Seconds close_connection may take, None for the default of the connector.
+        self.close_timeout = None
+        with Dut._dutlist_lock:
+            if Dut._dutlist is None:
+                Dut._dutlist = []
+            Dut._dutlist.append(self)
 
     @property
     def platform(self):
@@ -186,27 +215,182 @@ class Dut(object):  # pylint: disable=too-many-instance-attributes,too-many-publ
     @property
     def store_traces(self):
         """
-        Getter for _store_traces. _store_traces controls in memory storing of received lines.
+        Getter for store_traces. store_traces controls storing of received lines, it is False
+        when trace_policy is "off".
 
         :return: Boolean
         """
-        return self._store_traces
+        return self._trace_policy != "off"
 
     @store_traces.setter
     def store_traces(self, value):
         """
-        Setter for _store_traces. _store_traces controls in memory storing of received lines.
-        Also logs the change for the user.
+        Setter for store_traces. Setting False changes trace_policy to "off", setting True
+        restores the previous trace_policy. Also logs the change for the user.
 
         :param value: Boolean
         :return: Nothing
         """
         if not value:
-            self.logger.debug("Stopping storing received lines for dut %d", self.index)
-            self._store_traces = False
+            self.logger.debug("Stopping storing received lines for dut %s", self.index)
+            if self._trace_policy != "off":
+                self._trace_policy_on = self._trace_policy
+            self.trace_policy = "off"
         else:
-            self.logger.debug("Resuming storing received lines for dut %d", self.index)
-            self._store_traces = True
+            self.logger.debug("Resuming storing received lines for dut %s", self.index)
+            if self._trace_policy == "off":
+                self.trace_policy = self._trace_policy_on
+
+    @property
+    def trace_policy(self):
+        """
+        Getter for trace_policy. "off" doesn't store received lines, "ring" keeps
+        trace_ring_size newest lines in memory and "spill" writes older lines to a file.
+
+        :return: str
+        """
+        return self._trace_policy
+
+    @trace_policy.setter
+    def trace_policy(self, value):
+        """
+        Setter for trace_policy.
+
+        :param value: "off", "ring" or "spill"
+        :return: Nothing
+        :raises: ValueError if value is not a valid policy.
+        """
+        if value not in Dut.trace_policies:
+            raise ValueError("Invalid trace policy %s" % value)
+        if value == "spill":
+            if self.traces.spill_file is None:
+                self.traces.spill_file = self._get_trace_spill_filename()
+        else:
+            self.traces.spill_file = None
+        self._trace_policy = value
+
+    @property
+    def trace_ring_size(self):
+        """
+        Getter for trace_ring_size, the amount of received lines kept in memory.
+
+        :return: int, 0 for unlimited
+        """
+        return self.traces.ring_size
+
+    @trace_ring_size.setter
+    def trace_ring_size(self, value):
+        """
+        Setter for trace_ring_size.
+
+        :param value: int, 0 for unlimited
+        :return: Nothing
+        """
+        self.traces.ring_size = value
+
+    def _init_trace_policy(self):
+        """
+        Set trace policy and ring size from command line arguments.
+
+        :return: Nothing
+        """
+        policy = getattr(self.params, "trace_policy", None) if self.params else None
+        if policy in Dut.trace_policies:
+            self.trace_policy = policy
+        ring_size = getattr(self.params, "trace_ring_size", None) if self.params else None
+        if isinstance(ring_size, int) and ring_size > 0:
+            self.trace_ring_size = ring_size
+
+    def _get_trace_spill_filename(self):
+        """
+        Get file name for spilled traces. File is placed in the test case log directory, or
+        in a temporary directory if test case logging is not initialized.
+
+        :return: str
+        """
+        logdir = LogManager.get_testcase_log_dir()
+        if isinstance(logdir, string_types) and os.path.isdir(logdir):
+            return LogManager.get_testcase_logfilename("%s_traces.log" % self.name)
+        handle, filename = tempfile.mkstemp(prefix="%s_traces" % self.name, suffix=".log")
+        os.close(handle)
+        return filename
+
+    @property
+    def pipelined(self):
+        """
+        Getter for pipelined mode. In pipelined mode commands are written without waiting for
+        the response of the previous command and responses are matched to the commands in
+        order. Enabled with application configuration key cli_pipelining, if not set directly.
+
+        :return: Boolean
+        """
+        if self._pipelined is not None:
+            return self._pipelined
+        return bool(self._get_app_config("cli_pipelining", False))
+
+    @pipelined.setter
+    def pipelined(self, value):
+        """
+        Setter for pipelined mode.
+
+        :param value: Boolean, None to use application configuration.
+        :return: Nothing
+        """
+        self._pipelined = value
+
+    @property
+    def pipeline_depth(self):
+        """
+        Maximum amount of outstanding commands in pipelined mode. Application configuration
+        key cli_pipeline_depth, default is 16.
+
+        :return: int
+        """
+        return self._get_app_config("cli_pipeline_depth", 16)
+
+    @property
+    def framed(self):
+        """
+        True if the dut uses a binary framing instead of text lines. Configured with key
+        "framing" of the application configuration.
+
+        :return: Boolean
+        """
+        return self._get_frame_codec().binary
+
+    def _get_frame_codec(self):
+        """
+        Get the framer of this dut used for encoding frames, creating it on first use.
+
+        :return: framer object
+        :raises: ValueError if the framing configuration is not valid.
+        """
+        if self._frame_codec is None:
+            self._frame_codec = self.create_framer()
+        return self._frame_codec
+
+    def create_framer(self):
+        """
+        Create a framer for reading the connection of this dut, as configured with key
+        "framing" of the application configuration. See Framers.create_framer.
+
+        :return: framer object, LineFramer if framing is not configured.
+        :raises: ValueError if the framing configuration is not valid.
+        """
+        return create_framer(self._get_app_config("framing"))
+
+    def _get_app_config(self, key, default=None):
+        """
+        Get value from application configuration of this dut.
+
+        :param key: configuration key
+        :param default: value returned if key is not found
+        :return: configuration value or default
+        """
+        app = self.config.get("application") if isinstance(self.config, dict) else None
+        if isinstance(app, dict):
+            return app.get(key, default)
+        return default
 
     # Minimum requirements from Dut Implementation
     def open_connection(self):
@@ -231,6 +415,16 @@ class Dut(object):  # pylint: disable=too-many-instance-attributes,too-many-publ
         """
         raise NotImplementedError("writeline is not implemented")
 
+    def writelines(self, lines):
+        """
+        Write several lines to DUT. Connectors can override this to write the lines at once.
+
+        :param lines: list of strings, not containing line feeds.
+        :return: Nothing
+        """
+        for line in lines:
+            self.writeline(line)
+
     def readline(self, timeout=1):
         """read single string line from DUT.
 
@@ -239,6 +433,15 @@ class Dut(object):  # pylint: disable=too-many-instance-attributes,too-many-publ
         """
         raise NotImplementedError("readline is not implemented")
 
+    def write_raw(self, data):
+        """
+        Write bytes to DUT as they are. Required by the binary frame API.
+
+        :param data: bytes
+        :return: Nothing
+        """
+        raise NotImplementedError("write_raw is not implemented")
+
     def print_info(self):
         '''
         Log information relevant to this DUT.
@@ -345,6 +548,9 @@ class Dut(object):  # pylint: disable=too-many-instance-attributes,too-many-publ
         '
         :return: Nothing
         """
+        if self.framed:
+            # Cli commands can not be sent in binary frames.
+            return
         if self.init_cli_cmds is None:
             self.init_cli_cmds = self.set_default_init_cli_cmds()
 
@@ -386,7 +592,7 @@ class Dut(object):  # pylint: disable=too-many-instance-attributes,too-many-publ
         """
         init_done = self.init_done.wait(timeout=self.init_wait_timeout)
         if not init_done:
-            if hasattr(self, "peek"):
+            if hasattr(self, "peek") and not self.framed:
                 app = self.config.get("application")
                 if app:
                     bef_init_cmds = app.get("cli_ready_trigger")
@@ -439,7 +645,12 @@ class Dut(object):  # pylint: disable=too-many-instance-attributes,too-many-publ
         if port is not None:
             self.comport = port
 
+        self.died = False
+        self.death_reason = None
         try:
+            # Configuration errors are noticed before connecting.
+            self._line_classifier = LineClassifier.from_config(
+                self._get_app_config("line_classifier"))
             self.open_connection()
         except (DutConnectionError, ValueError) as err:
             self.close_dut(use_prepare=False)
@@ -457,6 +668,274 @@ class Dut(object):  # pylint: disable=too-many-instance-attributes,too-many-publ
         """
         pass
 
+    def _get_death_reason(self):  # pylint: disable=no-self-use
+        """
+        Get the reason the connection broke, for example the exit status of a process.
+        Each dut should implement it's own if available.
+
+        :return: str or None
+        """
+        return None
+
+    def _complete_death_reason(self):
+        """
+        Fill in the reason of the death if it was not known yet when the death was noticed.
+        Called from the thread that reports the error, so connectors can wait for the reason
+        here instead of blocking the dut thread. Each dut should implement it's own if needed.
+
+        :return: Nothing
+        """
+        pass
+
+    def _death_error(self):
+        """
+        Create the error raised to callers waiting for responses from a dead dut.
+
+        :return: TestStepError
+        """
+        msg = "No response received, DUT {} died".format(self.name)
+        if self.death_reason:
+            msg += " ({})".format(self.death_reason)
+        return TestStepError(msg)
+
+    def _dut_died(self, reason=None):
+        """
+        Notify that the dut connection is broken. A command waiting for response fails
+        immediately instead of waiting for its timeout. DUT_DIED event is sent the first
+        time this is called.
+
+        :param reason: str, reason of the death. Asked from _get_death_reason if None.
+        :return: Nothing
+        """
+        first = not self.died
+        if first:
+            self.died = True
+            self.death_reason = reason if reason is not None else self._get_death_reason()
+            self.logger.warning("DUT %s died%s", self.name,
+                                ": " + self.death_reason if self.death_reason else "",
+                                extra={'type': '!<-'})
+        error = self._death_error()
+        self.response_coming_in = -1
+        self.response_received.set()
+        async_response = self.query_async_response
+        if async_response is not None:
+            async_response.set_response(CliResponse(), error=error)
+        self._fail_pipeline(error)
+        with self._frame_cond:
+            self._frame_cond.notify_all()
+        if first:
+            EventObject(EventTypes.DUT_DIED, self, self.death_reason)
+
+    def send_frame(self, payload):
+        """
+        Encode payload with the framing of this dut and write it.
+
+        :param payload: bytes
+        :return: Nothing
+        :raises: TestStepError if the dut doesn't use binary framing or writing fails.
+        """
+        codec = self._get_frame_codec()
+        if not codec.binary:
+            raise TestStepError("DUT {} doesn't use binary framing".format(self.name))
+        if self.died:
+            raise self._death_error()
+        self.logger.info(binascii.hexlify(payload).decode("ascii"), extra={'type': '-->'})
+        try:
+            self.write_raw(codec.encode(payload))
+        except RuntimeError as error:
+            self._dut_died()
+            raise TestStepError("Writing frame to DUT {} failed: {}".format(self.name, error))
+
+    def wait_frame(self, timeout=10):
+        """
+        Wait for a frame from the dut. Frames are returned in the order they were received.
+
+        :param timeout: Seconds to wait
+        :return: bytes
+        :raises: TestStepTimeout if no frame was received in time, TestStepError if the dut
+        died.
+        """
+        deadline = time.time() + timeout
+        with self._frame_cond:
+            while not self._frames:
+                if self.died:
+                    raise self._death_error()
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise TestStepTimeout("No frame received from DUT {} in {} s".format(
+                        self.name, timeout))
+                self._frame_cond.wait(remaining)
+            return self._frames.popleft()
+
+    def request_frame(self, payload, timeout=10):
+        """
+        Send a frame and wait for the response frame. Frames received before the request
+        was sent are discarded.
+
+        :param payload: bytes
+        :param timeout: Seconds to wait for the response
+        :return: bytes, the response frame
+        :raises: TestStepTimeout if no response was received in time, TestStepError if
+        sending fails or the dut died.
+        """
+        with self._frame_cond:
+            self._frames.clear()
+        self.send_frame(payload)
+        return self.wait_frame(timeout)
+
+    def _frame_received(self, frame):
+        """
+        Deliver a received binary frame to DUT_FRAME_RECEIVED observers and wait_frame.
+
+        :param frame: bytes
+        :return: Nothing
+        """
+        self.logger.debug(binascii.hexlify(frame).decode("ascii"), extra={'type': '<<<'})
+        EventObject(EventTypes.DUT_FRAME_RECEIVED, self, frame)
+        with self._frame_cond:
+            self._frames.append(frame)
+            self._frame_cond.notify_all()
+
+    def _execute_pipelined(self, req):
+        """
+        Queue command for writing in pipelined mode. Blocks while pipeline_depth commands are
+        outstanding. A command that is not waited for is sent after the outstanding commands
+        have completed. Like in the normal mode, its response is discarded if it arrives within
+        a second, and the next command is sent after that.
+
+        :param req: CliRequest
+        :return: CliAsyncResponse if req is asynchronous, CliResponse otherwise.
+        :raises: TestStepTimeout if there was no room in the pipeline before command timeout.
+        TestStepError, TestStepFail, TestStepTimeout when the response is not successful.
+        """
+        deadline = self.get_time() + req.timeout
+        async_response = CliAsyncResponse(self, request=req, deadline=deadline, pipelined=True)
+        limit = self.pipeline_depth if req.wait else 1
+        with self._pipeline_cond:
+            while True:
+                self._drop_expired_placeholders()
+                placeholder = self._pipeline[0] if self._pipeline and \
+                    not self._pipeline[0].request.wait else None
+                if placeholder is None and len(self._pipeline) < limit:
+                    break
+                remaining = deadline - self.get_time()
+                if remaining <= 0:
+                    self.logger.error("CMD timeout: %s, pipeline full", req.cmd)
+                    raise TestStepTimeout(self.name + " CMD timeout: " + req.cmd)
+                if placeholder is not None:
+                    remaining = min(remaining, max(0, placeholder.deadline - self.get_time()))
+                self._pipeline_cond.wait(min(remaining, self.alive_check_interval))
+            if not req.wait:
+                # Placeholder that takes the response of the command, if one arrives, so it
+                # isn't matched to the next command.
+                async_response.deadline = self.get_time() + 1
+            self._pipeline.append(async_response)
+            self._pipeline_writes.append(req)
+        self.logger.debug("Pipelined CMD %s, timeout=%s", req.cmd, req.timeout,
+                          extra={'type': '<->'})
+        Dut.process_dut(self)
+
+        if not req.wait:
+            return CliResponse()
+        if req.asynchronous:
+            return async_response
+        return self._wait_for_pipelined_response(async_response)
+
+    def _wait_for_pipelined_response(self, async_response):
+        """
+        Wait for the response of a pipelined command until its deadline.
+
+        :param async_response: CliAsyncResponse of the command
+        :return: CliResponse
+        :raises: TestStepTimeout, TestStepError
+        """
+        while not async_response.ready.is_set():
+            remaining = async_response.deadline - self.get_time()
+            if remaining <= 0:
+                cmd = async_response.request.cmd
+                self.logger.error("CMD timeout: " + cmd)
+                # Responses are matched in order, the rest of the pipeline can't be trusted.
+                self._fail_pipeline(TestStepTimeout(self.name + " CMD timeout: " + cmd),
+                                    timeout=True)
+                break
+            if not async_response.ready.wait(min(remaining, self.alive_check_interval)):
+                self._dut_is_alive()
+        if async_response.error is not None:
+            if self.died:
+                self._complete_death_reason()
+            raise async_response.error
+        return async_response.response
+
+    def _drop_expired_placeholders(self):
+        """
+        Remove commands that were not waited for from the head of the pipeline once the time
+        for their response has passed. Called with _pipeline_cond held.
+
+        :return: Nothing
+        """
+        now = self.get_time()
+        while self._pipeline and not self._pipeline[0].request.wait and \
+                self._pipeline[0].deadline <= now:
+            # Nobody waits for placeholders, no callbacks are called.
+            self._pipeline.popleft().set_response(CliResponse())
+            self._pipeline_cond.notify_all()
+
+    def _fail_pipeline(self, error, timeout=False):
+        """
+        Fail all outstanding pipelined commands.
+
+        :param error: Exception raised to the callers waiting for the commands.
+        :param timeout: Boolean, mark the responses as timed out.
+        :return: Nothing
+        """
+        with self._pipeline_cond:
+            pending = list(self._pipeline)
+            self._pipeline.clear()
+            self._pipeline_writes.clear()
+            self._pipeline_cond.notify_all()
+        for async_response in pending:
+            response = CliResponse()
+            response.timeout = timeout
+            async_response.set_response(response, error=error)
+
+    def _process_pipeline(self):
+        """
+        Write queued pipelined commands and match a received line to the oldest outstanding
+        command. Called from the dut processing thread.
+
+        :return: True if a line was handled, False otherwise.
+        """
+        items = []
+        while self._pipeline_writes:
+            item = self._pipeline_writes.popleft()
+            self.logger.info(item.cmd, extra={'type': '-->'})
+            items.append(item)
+        if items:
+            try:
+                self.writelines([item.cmd for item in items])
+            except RuntimeError:
+                self._dut_died()
+                return True
+            self.prev = items[-1]
+        if not self._pipeline:
+            return False
+        response = self._read_response()
+        if response is None:
+            return True
+        if response == -1:
+            self._dut_died()
+            return True
+        with self._pipeline_cond:
+            self._drop_expired_placeholders()
+            try:
+                async_response = self._pipeline.popleft()
+            except IndexError:
+                return True
+            self._pipeline_cond.notify_all()
+        response.set_response_time(async_response.request.get_timedelta(self.get_time()))
+        async_response.set_response(response)
+        return True
+
     def _wait_for_exec_ready(self):
         """
         Wait for response.
@@ -464,27 +943,42 @@ class Dut(object):  # pylint: disable=too-many-instance-attributes,too-many-publ
         :return: CliResponse object coming in
         :raises: TestStepTimeout, TestStepError
         """
-        while not self.response_received.wait(1) and self.query_timeout != 0:
-            if self.query_timeout != 0 and self.query_timeout < self.get_time():
+        if self.query_timeout == 0:
+            self.response_received.wait(1)
+        # Wake up on response, dut death or exactly at the deadline. Waits are capped to
+        # alive_check_interval to poll _dut_is_alive for duts that can't notify their death.
+        while self.query_timeout != 0:
+            remaining = self.query_timeout - self.get_time()
+            if self.response_received.wait(max(0, min(remaining, self.alive_check_interval))):
+                break
+            if self.query_timeout != 0 and self.query_timeout <= self.get_time():
                 if self.prev:
                     cmd = self.prev.cmd
                 else:
                     cmd = "???"
                 self.logger.error("CMD timeout: "+ cmd)
                 self.query_timeout = 0
-                raise TestStepTimeout(self.name + " CMD timeout: " + cmd)
+                error = TestStepTimeout(self.name + " CMD timeout: " + cmd)
+                if self.query_async_response is not None:
+                    response = CliResponse()
+                    response.timeout = True
+                    self.query_async_response.set_response(response, error=error)
+                    self.query_async_response = None
+                raise error
             self.logger.debug("Waiting for response... "
                               "timeout=%d", self.query_timeout - self.get_time())
             self._dut_is_alive()
 
         if self.response_coming_in == -1:
+            self._complete_death_reason()
+            error = self._death_error()
             if self.query_async_response is not None:
                 # fullfill the async response with a dummy response and clean the state
-                self.query_async_response.set_response(CliResponse())
+                self.query_async_response.set_response(CliResponse(), error=error)
                 self.query_async_response = None
             # raise and log the error
             self.logger.error("No response received, DUT died")
-            raise TestStepError("No response received, DUT "+self.name+" died")
+            raise error
 
         # if an async response is pending, fullfill it with the result
         if self.query_async_response is not None:
@@ -521,6 +1015,9 @@ class Dut(object):  # pylint: disable=too-many-instance-attributes,too-many-publ
                              timeout=timeout,
                              asynchronous=asynchronous)
 
+        if self.pipelined:
+            return self._execute_pipelined(req)
+
         # wait for previous command ready
         if req.wait:
             response = self._wait_for_exec_ready()
@@ -535,6 +1032,11 @@ class Dut(object):  # pylint: disable=too-many-instance-attributes,too-many-publ
         # Tell Query to worker thread
         self.response_received.clear()
         self.query_timeout = self.get_time() + req.timeout if req.wait else 0
+        if req.asynchronous is True:
+            # Set before signalling, the dut thread fulfills the response when it arrives.
+            self.query_async_expected = req.expected_retcode
+            self.query_async_response = CliAsyncResponse(self, request=req,
+                                                         deadline=self.query_timeout or None)
         self.query = req
 
         msg = "Async CMD {}, " \
@@ -545,10 +1047,7 @@ class Dut(object):  # pylint: disable=too-many-instance-attributes,too-many-publ
         Dut.process_dut(self)
 
         if req.asynchronous is True:
-            self.query_async_expected = req.expected_retcode
-            async_response = CliAsyncResponse(self)
-            self.query_async_response = async_response
-            return async_response
+            return self.query_async_response
 
         if req.wait is False:
             self.query_async_expected = req.expected_retcode
@@ -564,6 +1063,45 @@ class Dut(object):  # pylint: disable=too-many-instance-attributes,too-many-publ
 
         return self._wait_for_exec_ready()
 
+    def prepare_reuse(self):
+        """
+        Prepare an open dut for the next test case. Loggers are recreated for the logs of the
+        new test case and traces of the previous test case are discarded.
+
+        :return: Nothing
+        """
+        self.logger = LogManager.get_bench_logger('Dut.%s' % self.dut_name, self.dut_name)
+        if Dut._logger is not None:
+            Dut._logger = LogManager.get_bench_logger('Dut')
+        with self._process_lock:
+            self.traces.close()
+            self.traces = TraceStore(self.traces.ring_size)
+            # Spilled traces go to the log directory of the new test case.
+            self.trace_policy = self._trace_policy
+            self.response_traces = []
+
+    def check_health(self, reset_cmds=None, health_cmd=None):
+        """
+        Reset an open dut and check that it still responds.
+
+        :param reset_cmds: list of commands executed first
+        :param health_cmd: command that has to return 0, or None
+        :return: Boolean, True if all commands were executed and health_cmd returned 0.
+        """
+        try:
+            for cmd in reset_cmds or []:
+                self.execute_command(cmd)
+            if health_cmd:
+                response = self.execute_command(health_cmd)
+                if response.retcode != 0:
+                    self.logger.warning("Health check '%s' returned %s", health_cmd,
+                                        response.retcode)
+                    return False
+        except Exception as error:  # pylint: disable=broad-except
+            self.logger.warning("Resetting dut %s failed: %s", self.dut_name, error)
+            return False
+        return not self.died
+
     def close_dut(self, use_prepare=True):
         """
         Close connection to dut.
@@ -581,7 +1119,12 @@ class Dut(object):  # pylint: disable=too-many-instance-attributes,too-many-publ
                     # We can ignore this for dead Duts, just continue with cleanup
                     pass
             self.stopped = True
-            Dut._dutlist.remove(self)
+            self._fail_pipeline(TestStepError("DUT " + self.name + " closed"))
+            self.traces.close()
+            with Dut._dutlist_lock:
+                Dut._dutlist.remove(self)
+                # Only the dut closed last stops the shared I/O threads.
+                last = not Dut._dutlist
             # Remove myself from signalled dut list, if I'm still there
             if Dut._signalled_duts and Dut._signalled_duts.count(self):
                 try:
@@ -589,13 +1132,19 @@ class Dut(object):  # pylint: disable=too-many-instance-attributes,too-many-publ
                 except ValueError:
                     pass
 
+            if not last:
+                return
+            if Dut._reactor is not None:
+                Dut._reactor.stop()
+                Dut._reactor = None
+            Dut._direct = False
+            self._stop_event_queue()
             try:
-                if not Dut._dutlist:
-                    Dut._run = False
-                    Dut._sem.release()
-                    Dut._th.join()
-                    del Dut._th
-                    Dut._th = None
+                Dut._run = False
+                Dut._sem.release()
+                Dut._th.join()
+                del Dut._th
+                Dut._th = None
             except AttributeError:
                 pass
 
@@ -624,12 +1173,45 @@ class Dut(object):  # pylint: disable=too-many-instance-attributes,too-many-publ
         """
         if dut.finished():
             return
+        if Dut._reactor is not None:
+            Dut._reactor.signal(dut)
+            return
         Dut._signalled_duts.appendleft(dut)
         Dut._sem.release()
 
+    @staticmethod
+    def process_received(dut):
+        """
+        Notify that a read thread of dut has received a line. With the direct I/O engine the
+        line is processed immediately in the calling thread, otherwise the dut thread is
+        signalled like with process_dut.
+
+        :param dut: Dut
+        :return: Nothing
+        """
+        if not Dut._direct:
+            Dut.process_dut(dut)
+            return
+        if dut.finished():
+            return
+        try:
+            dut.process_signal()
+        except Exception:  # pylint: disable=broad-except
+            # Keep the read thread of the dut running.
+            Dut._logger.exception("Exception while processing dut %s", dut.name)
+
+    @staticmethod
+    def get_reactor():
+        """
+        Get the running DutReactor if the reactor I/O engine is in use.
+
+        :return: DutReactor or None
+        """
+        return Dut._reactor
+
     # Thread runner
     @staticmethod
-    def run():  # pylint: disable=too-many-branches
+    def run():
         """
         Main thread runner for all Duts.
 
@@ -640,60 +1222,84 @@ class Dut(object):  # pylint: disable=too-many-instance-attributes,too-many-publ
             Dut._sem.acquire()
             try:
                 dut = Dut._signalled_duts.pop()
-                # Check for pending requests
-                if dut.waiting_for_response is not None:
-                    item = dut.waiting_for_response
-                    # pylint: disable=protected-access
-                    dut.response_coming_in = dut._read_response()
-                    if dut.response_coming_in is None:
-                        # Continue to next node
-                        continue
-                    if isinstance(dut.response_coming_in, CliResponse):
-                        dut.response_coming_in.set_response_time(item.get_timedelta(dut.get_time()))
-                    dut.waiting_for_response = None
-                    dut.logger.debug("Got response", extra={'type': '<->'})
-                    dut.response_received.set()
-                    continue
-
-                # Check for new Request
-                if dut.query is not None:
-                    item = dut.query
-                    dut.query = None
-                    dut.logger.info(item.cmd, extra={'type': '-->'})
-                    try:
-                        dut.writeline(item.cmd)
-                    except RuntimeError:
-                        dut.response_coming_in = -1
-                        dut.response_received.set()
-                        continue
-                    dut.prev = item # Save previous command for logging purposes
-                    if item.wait:
-                        # Only caller will care if this was asynchronous.
-                        dut.waiting_for_response = item
-                    else:
-                        dut.query_timeout = 0
-                        dut.response_received.set()
-                    continue
-
-                try:
-                    line = dut.readline()
-                except RuntimeError:
-                    dut.response_coming_in = -1
-                    dut.response_received.set()
-                    continue
-                if line:
-                    if dut.store_traces:
-                        dut.traces.append(line)
-                    EventObject(EventTypes.DUT_LINE_RECEIVED, dut, line)
-                    retcode = dut.check_retcode(line)
-                    if retcode is not None:
-                        dut.logger.warning("unrequested retcode", extra={'type': '!<-'})
-                    dut.logger.debug(line, extra={'type': '<<<'})
-
+                dut.process_signal()
             except IndexError:
                 pass
         Dut._logger.debug("End DUT communication", extra={'type': '<->'})
 
+    def process_signal(self):
+        """
+        Handle one processing signal for this dut: read a response line for a pending command,
+        write a new command or handle an unrequested line.
+
+        :return: Nothing
+        """
+        with self._process_lock:
+            self._process_signal()
+
+    def _process_signal(self):
+        """
+        Processing of one signal, see process_signal.
+
+        :return: Nothing
+        """
+        if (self._pipeline_writes or self._pipeline) and self._process_pipeline():
+            return
+
+        # Check for pending requests
+        if self.waiting_for_response is not None:
+            item = self.waiting_for_response
+            self.response_coming_in = self._read_response()
+            if self.response_coming_in is None:
+                # Continue to next node
+                return
+            self.waiting_for_response = None
+            if self.response_coming_in == -1:
+                self._dut_died()
+                return
+            self.response_coming_in.set_response_time(item.get_timedelta(self.get_time()))
+            self.logger.debug("Got response", extra={'type': '<->'})
+            self.response_received.set()
+            async_response = self.query_async_response
+            if async_response is not None and isinstance(self.response_coming_in, CliResponse):
+                async_response.set_response(self.response_coming_in)
+            return
+
+        # Check for new Request
+        if self.query is not None:
+            item = self.query
+            self.query = None
+            self.logger.info(item.cmd, extra={'type': '-->'})
+            try:
+                self.writeline(item.cmd)
+            except RuntimeError:
+                self._dut_died()
+                return
+            self.prev = item # Save previous command for logging purposes
+            if item.wait:
+                # Only caller will care if this was asynchronous.
+                self.waiting_for_response = item
+            else:
+                self.query_timeout = 0
+                self.response_received.set()
+            return
+
+        try:
+            line = self.readline()
+        except RuntimeError:
+            self._dut_died()
+            return
+        if line and self.framed:
+            self._frame_received(line)
+        elif line:
+            if self.store_traces:
+                self.traces.append(line)
+            EventObject(EventTypes.DUT_LINE_RECEIVED, self, line)
+            retcode = self.check_retcode(line)
+            if retcode is not None:
+                self.logger.warning("unrequested retcode", extra={'type': '!<-'})
+            self.logger.debug(line, extra={'type': '<<<'})
+
     def _read_response(self):
         """
         Internal response reader.
@@ -705,18 +1311,21 @@ class Dut(object):  # pylint: disable=too-many-instance-attributes,too-many-publ
         except RuntimeError:
             Dut._logger.warning("Failed to read PIPE", extra={'type': '!<-'})
             return -1
-        if line:
+        if line and self.framed:
+            self._frame_received(line)
+        elif line:
             if self.store_traces:
                 self.traces.append(line)
-                self.response_traces.append(line)
             EventObject(EventTypes.DUT_LINE_RECEIVED, self, line)
-            match = re.search(r"^\[([\w\W]{4})\]\[([\W\w]{4,}?)\]\: (.*)", line)
-            if match:
+            line_class = self.line_classifier.classify(line)
+            if self.store_traces and not line_class.prompt:
+                self.response_traces.append(line)
+            if line_class.trace:
                 self.logger.debug(line, extra={'type': '<<<'})
             else:
                 self.logger.info(line, extra={'type': '<--'})
 
-            retcode = self.check_retcode(line)
+            retcode = self._get_retcode(line_class)
             if retcode is not None:
                 resp = CliResponse()
                 resp.retcode = retcode
@@ -729,22 +1338,40 @@ class Dut(object):  # pylint: disable=too-many-instance-attributes,too-many-publ
     # check retcode
     def check_retcode(self, line):
         """
-        Look for retcode on line line and return return code if found.
+        Look for retcode on line line and return return code if found. The retcode and boot
+        patterns are configured with key "line_classifier" of the application configuration.
 
         :param line: Line to search from
         :return: integer return code or -1 if "cmd tasklet init" is found. None if retcode or cmd
         tasklet init not found.
         """
-        retcode = None
-        match = re.search(r"retcode\: ([-\d]{1,})", line)
-        if match:
-            retcode = num(str(match.group(1)))
+        return self._get_retcode(self.line_classifier.classify(line))
+
+    def _get_retcode(self, line_class):
+        """
+        Get the return code of a classified line.
 
-        match = re.search("cmd tasklet init", line)
-        if match:
+        :param line_class: LineClass
+        :return: integer return code, -1 if the line is a boot marker or None.
+        """
+        if line_class.boot:
             self.logger.debug("Device Boot up", extra={'type': '   '})
             return -1
-        return retcode
+        return line_class.retcode
+
+    @property
+    def line_classifier(self):
+        """
+        Classifier of received lines, configured with key "line_classifier" of the application
+        configuration.
+
+        :return: LineClassifier
+        :raises: ValueError if the configuration is not valid.
+        """
+        if self._line_classifier is None:
+            self._line_classifier = LineClassifier.from_config(
+                self._get_app_config("line_classifier"))
+        return self._line_classifier
 
     def finished(self):
         """
@@ -754,18 +1381,70 @@ class Dut(object):  # pylint: disable=too-many-instance-attributes,too-many-publ
         """
         return self.stopped
 
-    def start_dut_thread(self):  # pylint: disable=no-self-use
+    def start_dut_thread(self):
         """
-        Start Dut thread.
+        Start Dut thread, or the DutReactor if it was selected with --io_engine. With the direct
+        I/O engine, received lines are processed in the read threads of the connections.
 
         :return: Nothing
         """
-        if Dut._th is None:
+        if Dut._th is None and Dut._reactor is None:
             Dut._run = True
             Dut._sem = Semaphore(0)
             Dut._signalled_duts = deque()
             Dut._logger = LogManager.get_bench_logger('Dut')
+            self._start_event_queue()
+            if self._get_io_engine() == "reactor":
+                if reactor_available():
+                    Dut._reactor = DutReactor(Dut._logger)
+                    Dut._reactor.start()
+                    return
+                Dut._logger.warning("Reactor I/O engine not supported on this platform, "
+                                    "using DutThread instead.")
+            # The dut thread writes commands also when read threads process received lines.
+            Dut._direct = self._get_io_engine() == "direct"
             Dut._th = Thread(target=Dut.run, name='DutThread')
 
             Dut._th.daemon = True
             Dut._th.start()
+
+    def _start_event_queue(self):
+        """
+        Start asynchronous event delivery if it was selected with --event_delivery.
+
+        :return: Nothing
+        """
+        params = self.params
+        if not params or getattr(params, "event_delivery", "sync") != "async":
+            return
+        if get_event_queue() is not None:
+            return
+        event_queue = EventQueue(workers=getattr(params, "event_workers", 2),
+                                 queue_size=getattr(params, "event_queue_size", 1000),
+                                 policy=getattr(params, "event_queue_policy", "block"),
+                                 logger=Dut._logger)
+        event_queue.start()
+        set_event_queue(event_queue)
+
+    @staticmethod
+    def _stop_event_queue():
+        """
+        Deliver queued events and return to synchronous event delivery.
+
+        :return: Nothing
+        """
+        event_queue = set_event_queue(None)
+        if event_queue is None:
+            return
+        event_queue.stop()
+        if Dut._logger:
+            Dut._logger.debug("Event delivery stats: %s", event_queue.stats())
+
+    def _get_io_engine(self):
+        """
+        Get the name of the I/O engine selected with --io_engine.
+
+        :return: "thread", "direct" or "reactor"
+        """
+        engine = getattr(self.params, "io_engine", None) if self.params else None
+        return engine if engine in ("thread", "direct", "reactor") else "thread"
@@ -0,0 +1,375 @@
+"""
+Copyright 2019 ARM Limited
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+DutReactor module. Contains an optional I/O engine for duts, built on a single selector loop.
+The reactor owns the file descriptors of the dut connections, frames received data into lines
+and runs the dut processing for each line in its own thread. This replaces both the global
+DutThread and the per-connection read threads.
+"""
+
+import errno
+import os
+from collections import deque
+from threading import Event, Thread, current_thread
+
+try:
+    import selectors
+except ImportError:
+    selectors = None  # pylint: disable=invalid-name
+
+from icetea_lib.tools.Framers import LineFramer
+from icetea_lib.tools.tools import strip_escape, UNIXPLATFORM
+
+
+def reactor_available():
+    """
+    Check if the reactor can be used on this platform.
+
+    :return: Boolean
+    """
+    return selectors is not None and UNIXPLATFORM
+
+
+class ReactorStream(object):
+    """
+    A file descriptor registered to a DutReactor. Implements the same interface as
+    NonBlockingStreamReader (readline, has_error, stop), so connectors can use either one.
+    """
+    def __init__(self, reactor, fileobj, callback=None, framer=None):
+        self._reactor = reactor
+        self.fileobj = fileobj
+        self.fd = fileobj if isinstance(fileobj, int) else fileobj.fileno()  # pylint: disable=invalid-name
+        self.callback = callback
+        self.framer = framer if framer is not None else LineFramer()
+        self.read_queue = deque()
+        self.closed = False
+        self.unregistered = Event()
+        self._has_error = False
+
+    def feed(self, data):
+        """
+        Frame received data and queue the complete lines, or the decoded frames of a binary
+        framer. Callback is called once for every line.
+
+        :param data: bytes
+        :return: Nothing
+        """
+        framer = self.framer
+        for line in framer.feed(data):
+            self.read_queue.appendleft(line if framer.binary else strip_escape(line.strip()))
+            if self.callback is not None:
+                self.callback()
+
+    def set_error(self):
+        """
+        Mark the stream broken and notify the callback so the owner notices it.
+
+        :return: Nothing
+        """
+        self._has_error = True
+        if self.callback is not None:
+            self.callback()
+
+    def has_error(self):
+        """
+        :return: Boolean, True if reading the stream has failed.
+        """
+        return self._has_error
+
+    def readline(self):
+        """
+        Pop a received line.
+
+        :return: line or None if no lines are available.
+        :raises: RuntimeError if the stream is broken and all lines have been read.
+        """
+        try:
+            return self.read_queue.pop()
+        except IndexError:
+            if self._has_error:
+                raise RuntimeError("Errors reading stream")
+        return None
+
+    def peek(self):
+        """
+        Peek into the incomplete line.
+
+        :return: str, bytes of the incomplete frame for binary framers.
+        """
+        return self.framer.peek()
+
+    def start(self):
+        """
+        Register the stream to the reactor. Data is read and callback called after this.
+
+        :return: Nothing
+        """
+        self._reactor.register_stream(self)
+
+    def stop(self):
+        """
+        Unregister the stream from the reactor. The file descriptor can be closed after this.
+
+        :return: Nothing
+        """
+        self._reactor.remove_stream(self)
+
+
+class DutReactor(object):
+    """
+    Selector based I/O loop for duts. Registered streams are read when data is available and
+    duts signalled with signal() are processed in the reactor thread.
+    """
+    read_size = 64 * 1024
+    # Seconds remove_stream waits for the reactor thread to unregister a stream.
+    remove_timeout = 5
+
+    def __init__(self, logger=None):
+        if not reactor_available():
+            raise EnvironmentError("Selector based I/O is not supported on this platform")
+        self.logger = logger
+        self._selector = selectors.DefaultSelector()
+        self._signalled = deque()
+        self._removed = deque()
+        self._running = False
+        self._closed = False
+        self._thread = None
+        self._wake_r, self._wake_w = os.pipe()
+        for file_descr in (self._wake_r, self._wake_w):
+            _set_nonblocking(file_descr)
+        self._selector.register(self._wake_r, selectors.EVENT_READ, None)
+
+    def start(self):
+        """
+        Start the reactor thread.
+
+        :return: Nothing
+        """
+        self._running = True
+        self._thread = Thread(target=self.run, name="DutReactor")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop and join the reactor thread and release its resources. When called from the
+        reactor thread, for example when the last dut is closed in its processing, the loop
+        exits after the current processing and releases the resources itself.
+
+        :return: Nothing
+        """
+        self._running = False
+        if self._thread is not None and self._thread is current_thread():
+            return
+        self._wake()
+        if self._thread is not None:
+            self._thread.join()
+        self._thread = None
+        self._close()
+
+    def _close(self):
+        """
+        Release the selector and the wake up pipe.
+
+        :return: Nothing
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._selector.close()
+        os.close(self._wake_r)
+        os.close(self._wake_w)
+
+    def create_stream(self, fileobj, callback=None, framer=None):
+        """
+        Create a stream for a readable file object or file descriptor. The stream is read after
+        its start() has been called.
+
+        :param fileobj: file object with fileno() or a file descriptor.
+        :param callback: callable, called once for every received line and when the stream breaks
+        :param framer: framer object, LineFramer by default.
+        :return: ReactorStream
+        """
+        return ReactorStream(self, fileobj, callback, framer)
+
+    def register_stream(self, stream):
+        """
+        Start reading a stream.
+
+        :param stream: ReactorStream
+        :return: Nothing
+        """
+        _set_nonblocking(stream.fd)
+        self._selector.register(stream.fd, selectors.EVENT_READ, stream)
+        self._wake()
+
+    def remove_stream(self, stream):
+        """
+        Unregister a stream. Data still queued in the stream can be read after this. When
+        called from another thread, the stream is unregistered in the reactor thread and this
+        waits for it, so the reactor doesn't read the file descriptor after it has been closed.
+
+        :param stream: ReactorStream
+        :return: Nothing
+        """
+        thread = self._thread
+        if thread is None or thread is current_thread() or not thread.is_alive():
+            stream.closed = True
+            self._unregister(stream)
+            return
+        if not stream.closed:
+            stream.closed = True
+            self._removed.appendleft(stream)
+            self._wake()
+        if not stream.unregistered.wait(self.remove_timeout):
+            if self.logger:
+                self.logger.warning("DUT reactor didn't unregister stream %s in time", stream.fd)
+            self._unregister(stream)
+
+    def _unregister(self, stream):
+        """
+        Remove a stream from the selector.
+
+        :param stream: ReactorStream
+        :return: Nothing
+        """
+        try:
+            self._selector.unregister(stream.fd)
+        except (KeyError, ValueError):
+            pass
+        stream.unregistered.set()
+
+    def _unregister_removed(self):
+        """
+        Unregister the streams removed from other threads.
+
+        :return: Nothing
+        """
+        while self._removed:
+            self._unregister(self._removed.pop())
+
+    def signal(self, dut):
+        """
+        Signal that dut needs processing.
+
+        :param dut: Dut
+        :return: Nothing
+        """
+        self._signalled.appendleft(dut)
+        if current_thread() is not self._thread:
+            self._wake()
+
+    def _wake(self):
+        """
+        Wake the reactor thread from select.
+
+        :return: Nothing
+        """
+        if self._closed:
+            return
+        try:
+            os.write(self._wake_w, b"\0")
+        except OSError:
+            # Pipe is full, a wake up is already pending.
+            pass
+
+    def _drain_wake(self):
+        """
+        Empty the wake up pipe.
+
+        :return: Nothing
+        """
+        try:
+            while os.read(self._wake_r, 4096):
+                pass
+        except OSError:
+            pass
+
+    def _read_stream(self, stream):
+        """
+        Read available data from stream. A stream that reached end of file or failed is
+        unregistered and marked broken.
+
+        :param stream: ReactorStream
+        :return: Nothing
+        """
+        if stream.closed:
+            # Removed while waiting in select, the owner may have closed the descriptor.
+            return
+        try:
+            data = os.read(stream.fd, self.read_size)
+        except OSError as error:
+            if error.errno in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                return
+            data = b""
+        if stream.closed:
+            return
+        if data:
+            stream.feed(data)
+            return
+        self.remove_stream(stream)
+        stream.set_error()
+
+    def _process_signalled(self):
+        """
+        Run processing for all signalled duts.
+
+        :return: Nothing
+        """
+        while self._signalled:
+            dut = self._signalled.pop()
+            try:
+                dut.process_signal()
+            except Exception:  # pylint: disable=broad-except
+                # Never let a single dut stop the I/O of the others.
+                if self.logger:
+                    self.logger.exception("Exception while processing dut %s", dut.name)
+
+    def run(self):
+        """
+        Reactor loop.
+
+        :return: Nothing
+        """
+        if self.logger:
+            self.logger.debug("Start DUT reactor", extra={'type': '<->'})
+        while self._running:
+            self._process_signalled()
+            if not self._running:
+                # Stopped while processing a dut.
+                break
+            for key, _ in self._selector.select():
+                if key.data is None:
+                    self._drain_wake()
+                else:
+                    self._read_stream(key.data)
+            self._unregister_removed()
+        self._unregister_removed()
+        if self.logger:
+            self.logger.debug("End DUT reactor", extra={'type': '<->'})
+        if self._thread is current_thread() and not self._closed:
+            # stop() was called from this thread and didn't wait for the loop to exit.
+            self._close()
+
+
+def _set_nonblocking(file_descr):
+    """
+    Set O_NONBLOCK flag for a file descriptor.
+
+    :param file_descr: int
+    :return: Nothing
+    """
+    import fcntl
+    flags = fcntl.fcntl(file_descr, fcntl.F_GETFL)
+    fcntl.fcntl(file_descr, fcntl.F_SETFL, flags | os.O_NONBLOCK)
@@ -0,0 +1,207 @@
+"""
+Copyright 2019 ARM Limited
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+LineClassifier module. Contains LineClassifier, which finds return codes, boot markers, trace
+prefixes and prompts from lines received from a dut.
+"""
+
+import re
+from collections import namedtuple
+from threading import Lock
+
+from icetea_lib.tools.tools import num
+
+# retcode: int or None, boot, trace, prompt: Boolean
+LineClass = namedtuple("LineClass", ["retcode", "boot", "trace", "prompt"])
+PLAIN_LINE = LineClass(None, False, False, False)
+_DEFAULT_FLAGS = re.compile("").flags
+_OCTAL_DIGITS = "01234567"
+
+
+def _shift_group_references(pattern, offset, kind):
+    """
+    Renumber references to numbered groups, for example \\1 and (?(1)yes|no), when the
+    pattern is combined with others so that its groups start from group offset + 1.
+
+    :param pattern: regular expression
+    :param offset: amount of groups before the groups of the pattern
+    :param kind: kind of the pattern, for error messages
+    :return: regular expression
+    :raises: ValueError if a renumbered reference would be over 99.
+    """
+    def reference(number):
+        number = int(number) + offset
+        if number > 99:
+            raise ValueError("Too many groups before the references of {} pattern {}".format(
+                kind, pattern))
+        return str(number)
+
+    result = []
+    position = 0
+    in_class = False
+    while position < len(pattern):
+        char = pattern[position]
+        if char == "\\" and position + 1 < len(pattern):
+            escaped = pattern[position + 1]
+            octal = pattern[position + 1:position + 4]
+            if in_class or not escaped.isdigit() or escaped == "0" or \
+                    (len(octal) == 3 and all(digit in _OCTAL_DIGITS for digit in octal)):
+                # Not a group reference: other escapes and octal escapes are kept as they are.
+                result.append(pattern[position:position + 2])
+                position += 2
+                continue
+            end = position + 2
+            if end < len(pattern) and pattern[end].isdigit():
+                end += 1
+            result.append("\\" + reference(pattern[position + 1:end]))
+            position = end
+            continue
+        if in_class:
+            in_class = char != "]"
+            result.append(char)
+            position += 1
+            continue
+        if char == "[":
+            in_class = True
+            end = position + 1
+            if pattern[end:end + 1] == "^":
+                end += 1
+            if pattern[end:end + 1] == "]":
+                # ] right after [ or [^ is a literal.
+                end += 1
+            result.append(pattern[position:end])
+            position = end
+            continue
+        condition = re.match(r"\(\?\((\d+)\)", pattern[position:])
+        if condition:
+            result.append("(?({})".format(reference(condition.group(1))))
+            position += condition.end()
+            continue
+        result.append(char)
+        position += 1
+    return "".join(result)
+
+
+class LineClassifier(object):
+    """
+    Classifies received lines with a set of patterns compiled into a single regular expression,
+    so each line is searched only once. Classifiers are shared by all duts with the same
+    configuration, see from_config.
+    """
+    kinds = ("retcode", "boot", "trace", "prompt")
+    defaults = {
+        "retcode": r"retcode\: ([-\d]{1,})",
+        "boot": r"cmd tasklet init",
+        "trace": r"^\[[\w\W]{4}\]\[[\W\w]{4,}?\]\: ",
+        "prompt": None,
+    }
+    _cache = {}
+    _cache_lock = Lock()
+
+    def __init__(self, retcode=defaults["retcode"], boot=defaults["boot"],
+                 trace=defaults["trace"], prompt=defaults["prompt"]):
+        """
+        :param retcode: Pattern of return code lines. The first group of the pattern is the
+        return code. None to not look for return codes.
+        :param boot: Pattern of lines printed when the dut boots, None to disable.
+        :param trace: Pattern of trace lines, which are logged on debug level. None to disable.
+        :param prompt: Pattern of prompt lines, which are not included in command responses.
+        None to disable.
+        :raises: ValueError if a pattern is not valid. Inline global flags, such as (?i), and
+        group names used in several patterns are not valid, since the patterns are combined.
+        """
+        patterns = dict(zip(LineClassifier.kinds, (retcode, boot, trace, prompt)))
+        parts = []
+        names = {}  # group name -> kind
+        self._kinds = {}
+        index = 1
+        for kind in LineClassifier.kinds:
+            pattern = patterns[kind]
+            if not pattern:
+                continue
+            try:
+                compiled = re.compile(pattern)
+            except re.error as error:
+                raise ValueError("Invalid {} pattern {}: {}".format(kind, pattern, error))
+            if compiled.flags & ~_DEFAULT_FLAGS:
+                raise ValueError("Invalid {} pattern {}: global flags would apply to all "
+                                 "patterns, use scoped flags like (?i:...)".format(kind, pattern))
+            for name in compiled.groupindex:
+                if name in names:
+                    raise ValueError("Group name {} is used in {} and {} patterns".format(
+                        name, names[name], kind))
+                names[name] = kind
+            if kind == "retcode" and compiled.groups < 1:
+                raise ValueError("Retcode pattern {} has no group for the return code".format(
+                    pattern))
+            # Groups of the pattern are numbered after the groups of the patterns before it.
+            parts.append("({})".format(_shift_group_references(pattern, index, kind)))
+            self._kinds[index] = kind
+            index += compiled.groups + 1
+        self.patterns = patterns
+        try:
+            self._finditer = re.compile("|".join(parts)).finditer if parts else None
+        except re.error as error:
+            raise ValueError("Invalid line_classifier patterns: {}".format(error))
+
+    @staticmethod
+    def from_config(config=None):
+        """
+        Get the classifier for the "line_classifier" value of a dut configuration.
+        Patterns that are not given use the defaults.
+
+        :param config: dict with keys retcode, boot, trace and prompt, or None for defaults.
+        :return: LineClassifier
+        :raises: ValueError if the configuration is not valid.
+        """
+        config = config or {}
+        if not isinstance(config, dict):
+            raise ValueError("Invalid line_classifier {}, expected a dictionary".format(config))
+        unknown = set(config) - set(LineClassifier.kinds)
+        if unknown:
+            raise ValueError("Unknown line_classifier keys: {}".format(
+                ", ".join(sorted(unknown))))
+        patterns = dict(LineClassifier.defaults)
+        patterns.update(config)
+        key = tuple(patterns[kind] for kind in LineClassifier.kinds)
+        with LineClassifier._cache_lock:
+            classifier = LineClassifier._cache.get(key)
+            if classifier is None:
+                classifier = LineClassifier(*key)
+                LineClassifier._cache[key] = classifier
+        return classifier
+
+    def classify(self, line):
+        """
+        Classify a line.
+
+        :param line: str
+        :return: LineClass. retcode is the first return code found on the line, or None.
+        """
+        if self._finditer is None:
+            return PLAIN_LINE
+        retcode = None
+        found = None
+        kinds = self._kinds
+        for match in self._finditer(line):
+            index = match.lastindex
+            kind = kinds[index]
+            if found is None:
+                found = set()
+            found.add(kind)
+            if kind == "retcode" and retcode is None:
+                retcode = num(str(match.group(index + 1)))
+        if found is None:
+            return PLAIN_LINE
+        return LineClass(retcode, "boot" in found, "trace" in found, "prompt" in found)
@@ -32,9 +32,31 @@ class EventMatcher(Observer):
         self.event_type = event_type
         self.flag_to_set = flag
         self.callback = callback
+        self.__pattern = None
         self.match_data = match_data
         self.__forget = forget
-        self.observe(event_type, self._event_received)
+        self.observe(event_type, self._event_received, source=caller)
+
+    @property
+    def match_data(self):
+        """
+        Match data, a string or a regular expression prefixed with regex:.
+        """
+        return self.__match_data
+
+    @match_data.setter
+    def match_data(self, value):
+        """
+        Set match data and compile it if it is a regular expression.
+
+        :param value: str
+        :return: Nothing
+        """
+        self.__match_data = value
+        if value.startswith("regex:"):
+            self.__pattern = re.compile(value.split(":", 1)[1])
+        else:
+            self.__pattern = None
 
     def _event_received(self, ref, data):
         """
@@ -55,8 +77,8 @@ class EventMatcher(Observer):
 
     def _resolve_match_data(self, ref, event_data):
         """
-        If match_data is prefixed with regex: compile it to a regular expression pattern.
-        Match event data with match_data as either regex or string.
+        Match event data with match_data as either regex or string. Regular expression is
+        compiled when match_data is set.
 
         :param ref: Reference to object that generated this event.
         :param event_data: Data from event, as string.
@@ -69,10 +91,8 @@ class EventMatcher(Observer):
             return False
         try:
             dat = event_data if IS_PYTHON3 else event_data.decode("utf-8")
-            if self.match_data.startswith("regex:"):
-                splt = self.match_data.split(":", 1)
-                pttrn = re.compile(splt[1])
-                match = re.search(pttrn, dat)
+            if self.__pattern is not None:
+                match = self.__pattern.search(dat)
                 return match if match is not None else False
             return event_data if self.match_data in dat else False
         except UnicodeDecodeError:
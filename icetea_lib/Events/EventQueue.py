@@ -0,0 +1,189 @@
+"""
+Copyright 2019 ARM Limited
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+EventQueue module. Contains EventQueue, which delivers events to observers in a pool of worker
+threads, so slow observer callbacks don't block the thread that emitted the event.
+"""
+
+import time
+from threading import Lock, Thread, current_thread
+
+try:
+    from queue import Queue, Full
+except ImportError:
+    from Queue import Queue, Full  # pylint: disable=import-error
+
+CLOCK = getattr(time, "monotonic", time.time)
+
+
+class EventQueue(object):
+    """
+    Bounded queue of event deliveries, handled by a pool of worker threads. Deliveries with the
+    same key are always handled by the same worker, in the order they were queued.
+
+    When the queue of a worker is full, the "block" policy makes the emitter wait for space and
+    the "drop" policy drops the delivery. Deliveries queued from a worker thread never block,
+    they are handled immediately if the queue is full.
+    """
+    policies = ("block", "drop")
+
+    def __init__(self, workers=2, queue_size=1000, policy="block", logger=None):
+        """
+        :param workers: Amount of worker threads
+        :param queue_size: Maximum amount of queued deliveries per worker
+        :param policy: "block" or "drop"
+        :param logger: logger for exceptions raised by callbacks
+        """
+        if policy not in self.policies:
+            raise ValueError("Unknown event queue policy {}".format(policy))
+        self.workers = max(1, workers)
+        self.queue_size = queue_size
+        self.policy = policy
+        self.logger = logger
+        self._queues = []
+        self._threads = []
+        self._lock = Lock()
+        self._delivered = 0
+        self._dropped = 0
+        self._max_depth = 0
+        self._last_lag = 0.0
+        self._max_lag = 0.0
+        self._total_lag = 0.0
+
+    def start(self):
+        """
+        Start the worker threads.
+
+        :return: Nothing
+        """
+        for index in range(self.workers):
+            queue = Queue(maxsize=self.queue_size)
+            thread = Thread(target=self._work, args=(queue,), name="EventWorker-%d" % index)
+            thread.daemon = True
+            self._queues.append(queue)
+            self._threads.append(thread)
+            thread.start()
+
+    def stop(self):
+        """
+        Deliver all queued events and stop the worker threads.
+
+        :return: Nothing
+        """
+        for queue in self._queues:
+            queue.put(None)
+        for thread in self._threads:
+            if thread is not current_thread():
+                thread.join()
+        self._queues = []
+        self._threads = []
+
+    def flush(self):
+        """
+        Wait until all queued events have been delivered.
+
+        :return: Nothing
+        """
+        if self._in_worker():
+            return
+        for queue in self._queues:
+            queue.join()
+
+    def put(self, key, function, args):
+        """
+        Queue a delivery.
+
+        :param key: hashable, deliveries with the same key are handled in order.
+        :param function: callable that delivers the event
+        :param args: tuple of arguments for function
+        :return: Boolean, False if the delivery was dropped.
+        """
+        queue = self._queues[hash(key) % len(self._queues)]
+        item = (CLOCK(), function, args)
+        block = self.policy == "block" and not self._in_worker()
+        try:
+            queue.put(item, block)
+        except Full:
+            if self.policy == "drop":
+                with self._lock:
+                    self._dropped += 1
+                return False
+            self._deliver(item)
+            return True
+        depth = queue.qsize()
+        if depth > self._max_depth:
+            self._max_depth = depth
+        return True
+
+    def stats(self):
+        """
+        Get delivery counters.
+
+        :return: dict with depth (currently queued), max_depth (per worker), delivered, dropped,
+        and last_lag, max_lag and average_lag in seconds from emitting to delivering an event.
+        """
+        with self._lock:
+            return {
+                "depth": sum(queue.qsize() for queue in self._queues),
+                "max_depth": self._max_depth,
+                "delivered": self._delivered,
+                "dropped": self._dropped,
+                "last_lag": self._last_lag,
+                "max_lag": self._max_lag,
+                "average_lag": self._total_lag / self._delivered if self._delivered else 0.0
+            }
+
+    def _in_worker(self):
+        """
+        :return: Boolean, True if called from a worker thread.
+        """
+        return current_thread() in self._threads
+
+    def _deliver(self, item):
+        """
+        Run a delivery and update counters.
+
+        :param item: tuple (queued time, function, args)
+        :return: Nothing
+        """
+        queued, function, args = item
+        lag = CLOCK() - queued
+        with self._lock:
+            self._delivered += 1
+            self._last_lag = lag
+            self._total_lag += lag
+            if lag > self._max_lag:
+                self._max_lag = lag
+        try:
+            function(*args)
+        except Exception:  # pylint: disable=broad-except
+            # A failing callback must not stop delivering events to other observers.
+            if self.logger:
+                self.logger.exception("Exception in event callback")
+
+    def _work(self, queue):
+        """
+        Worker thread loop.
+
+        :param queue: Queue of this worker
+        :return: Nothing
+        """
+        while True:
+            item = queue.get()
+            try:
+                if item is None:
+                    return
+                self._deliver(item)
+            finally:
+                queue.task_done()
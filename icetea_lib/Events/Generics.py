@@ -15,6 +15,11 @@ limitations under the License.
 This module contains generic event mechanism classes.
 """
 
+from collections import OrderedDict
+from itertools import count
+from operator import itemgetter
+from threading import Lock
+
 
 # pylint: disable=too-few-public-methods
 class EventTypes(object):
@@ -22,6 +27,8 @@ class EventTypes(object):
     Enum for event types
     """
     DUT_LINE_RECEIVED = 1
+    DUT_DIED = 2  # Callback arguments: dut, reason (str or None)
+    DUT_FRAME_RECEIVED = 3  # Callback arguments: dut, frame (bytes)
 
 
 class Observer(object):
@@ -31,9 +38,15 @@ class Observer(object):
     2. Make sure Observer's initializer gets called!
     3. Use .observe(event_name, callback_function) to register
        events that u want to observe. event_name is just a string-
-       identifier for a certain event
+       identifier for a certain event. Give source to only receive
+       events whose first argument is the source object.
     """
-    _observers = []
+    # Observed callbacks indexed by event type and source. Source None is for observers of
+    # events from any source. Values are dicts of observer id: entry, where entry is a tuple
+    # (sequence number, observer, callback).
+    _index = {}
+    _sequence = count()
+    _lock = Lock()
 
     def __init__(self):
         self._observed_events = {}
@@ -45,25 +58,110 @@ class Observer(object):
         :return: Nothing
         """
         self.forget()
-        self._observers.append(self)
 
-    def observe(self, event, callback_fn):
+    def observe(self, event, callback_fn, source=None):
         """
         Observe function. Sets callback function for received event
         :param event: Event type
         :param callback_fn: Callable
+        :param source: Only observe events from this source object, None for any source.
         :return: Nothing
         """
-        self._observed_events[event] = callback_fn
+        with Observer._lock:
+            self._unregister(event)
+            key = _source_key(source)
+            entry = (next(Observer._sequence), self, callback_fn)
+            Observer._index.setdefault(event, {}).setdefault(key, OrderedDict())[id(self)] = entry
+            # Source is referenced to keep its id reserved while it is used as a key.
+            self._observed_events[event] = (key, entry, source)
 
     def forget(self):
         """
         Reset _observed events. Remove self from observers.
         :return: Nothing
         """
-        self._observed_events = {}
-        if self in self._observers:
-            self._observers.remove(self)
+        with Observer._lock:
+            for event in list(self._observed_events):
+                self._unregister(event)
+            self._observed_events = {}
+
+    def _unregister(self, event):
+        """
+        Remove callback of event from the index. Caller must hold the lock.
+
+        :param event: Event type
+        :return: Nothing
+        """
+        observed = self._observed_events.pop(event, None)
+        if observed is None:
+            return
+        sources = Observer._index[event]
+        observers = sources[observed[0]]
+        del observers[id(self)]
+        if not observers:
+            del sources[observed[0]]
+            if not sources:
+                del Observer._index[event]
+
+    def _is_observing(self, event, entry):
+        """
+        Check if callback entry is still registered for event.
+
+        :param event: Event type
+        :param entry: Entry from the index
+        :return: Boolean
+        """
+        observed = self._observed_events.get(event)
+        return observed is not None and observed[1] is entry
+
+
+_EVENT_QUEUE = []
+
+
+def set_event_queue(event_queue):
+    """
+    Select how events are delivered to observers.
+
+    :param event_queue: EventQueue to deliver events asynchronously, None to call observers
+    synchronously in the thread that emits the event.
+    :return: EventQueue that was used before, or None.
+    """
+    previous = get_event_queue()
+    _EVENT_QUEUE[:] = [event_queue] if event_queue is not None else []
+    return previous
+
+
+def get_event_queue():
+    """
+    Get the EventQueue used to deliver events.
+
+    :return: EventQueue or None if events are delivered synchronously.
+    """
+    return _EVENT_QUEUE[0] if _EVENT_QUEUE else None
+
+
+def _deliver(event, entry, callback_args):
+    """
+    Call observer callback unless the observer has stopped observing the event.
+
+    :param event: Event type
+    :param entry: Entry from the observer index
+    :param callback_args: Event arguments
+    :return: Nothing
+    """
+    # Callbacks can make other observers forget the event.
+    if entry[1]._is_observing(event, entry):  # pylint: disable=protected-access
+        entry[2](*callback_args)
+
+
+def _source_key(source):
+    """
+    Index key for event source. Sources are compared by identity.
+
+    :param source: object or None
+    :return: key
+    """
+    return None if source is None else id(source)
 
 
 # pylint: disable=protected-access
@@ -72,9 +170,28 @@ class Event(object):
     Event emitter
     Usage:
     1. Call from anywhere in your code
-    The apropriate observers will get notified once the event fires
+    The apropriate observers will get notified once the event fires.
+    The first callback argument is the source of the event.
+    If an EventQueue has been set with set_event_queue, observers are notified in its worker
+    threads, otherwise before the constructor returns.
     """
     def __init__(self, event, *callback_args):
-        for observer in Observer._observers:
-            if event in observer._observed_events:
-                observer._observed_events[event](*callback_args)
+        sources = Observer._index.get(event)
+        if not sources:
+            return
+        with Observer._lock:
+            entries = list(sources.get(None, {}).values())
+            if callback_args and callback_args[0] is not None:
+                from_source = sources.get(_source_key(callback_args[0]))
+                if from_source:
+                    # Notify in the order observers were registered.
+                    entries.extend(from_source.values())
+                    entries.sort(key=itemgetter(0))
+        event_queue = get_event_queue()
+        if event_queue is None:
+            for entry in entries:
+                _deliver(event, entry, callback_args)
+            return
+        for entry in entries:
+            # Key by observer to keep the events of each observer in order.
+            event_queue.put(id(entry[1]), _deliver, (event, entry, callback_args))
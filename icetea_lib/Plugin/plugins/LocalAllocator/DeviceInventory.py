@@ -0,0 +1,313 @@
+"""
+Copyright 2019 ARM Limited
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+DeviceInventory module. Contains DeviceInventory, which caches detected devices and the health
+of their serial ports between allocations.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import struct
+import sys
+import time
+from threading import Lock
+
+DEFAULT_WATCH_PATHS = ("/dev", "/dev/serial/by-id")
+DEFAULT_MAX_AGE = 60
+ALL_CHANGED = None  # Changes can't be named, everything has to be checked again
+
+
+class PollingWatcher(object):
+    """
+    Notices added and removed entries of directories by comparing directory listings.
+    """
+    def __init__(self, paths):
+        self.paths = list(paths)
+        self._listings = self._list()
+
+    def _list(self):
+        """
+        :return: dict of watched path to set of names in it. Missing paths have no names.
+        """
+        listings = {}
+        for path in self.paths:
+            try:
+                listings[path] = set(os.listdir(path))
+            except OSError:
+                listings[path] = set()
+        return listings
+
+    def changes(self):
+        """
+        :return: set of names of changed entries since the previous call.
+        """
+        listings = self._list()
+        changed = set()
+        for path in self.paths:
+            changed |= listings[path] ^ self._listings[path]
+        self._listings = listings
+        return changed
+
+    def close(self):
+        """
+        Nothing to release.
+        """
+        pass
+
+
+class InotifyWatcher(object):
+    """
+    Notices changes to entries of directories with inotify. Events are read when changes are
+    asked for, so no thread is needed.
+    """
+    event_header = struct.Struct("iIII")
+    # IN_ATTRIB, IN_MOVED_FROM, IN_MOVED_TO, IN_CREATE, IN_DELETE, IN_DELETE_SELF
+    mask = 0x4 | 0x40 | 0x80 | 0x100 | 0x200 | 0x400
+    in_q_overflow = 0x4000
+    in_ignored = 0x8000
+
+    def __init__(self, paths):
+        """
+        :param paths: list of directories to watch
+        :raises: OSError if inotify is not available.
+        """
+        if not sys.platform.startswith("linux"):
+            raise OSError(errno.ENOSYS, "inotify is only available on Linux")
+        self.paths = list(paths)
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        # IN_NONBLOCK | IN_CLOEXEC
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | 0o2000000)
+        if self._fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self._watches = {}  # watch descriptor -> path
+        self._add_watches()
+
+    def _add_watches(self):
+        """
+        Watch the paths that exist and are not watched yet, for example a directory created
+        when the first device was plugged in.
+
+        :return: Nothing
+        """
+        watched = set(self._watches.values())
+        for path in self.paths:
+            if path in watched or not os.path.isdir(path):
+                continue
+            wd = self._libc.inotify_add_watch(self._fd, path.encode(), self.mask)
+            if wd >= 0:
+                self._watches[wd] = path
+
+    def changes(self):
+        """
+        :return: set of names of changed entries since the previous call, or ALL_CHANGED if
+        events were lost.
+        """
+        data = b""
+        while True:
+            try:
+                chunk = os.read(self._fd, 65536)
+            except OSError as error:
+                if error.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    break
+                raise
+            if not chunk:
+                break
+            data += chunk
+        changed = set()
+        offset = 0
+        rewatch = False
+        while offset + self.event_header.size <= len(data):
+            wd, mask, _, length = self.event_header.unpack_from(data, offset)
+            offset += self.event_header.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if mask & self.in_q_overflow:
+                changed = ALL_CHANGED
+            elif mask & self.in_ignored:
+                # Watched directory was removed.
+                self._watches.pop(wd, None)
+                rewatch = True
+            elif changed is not ALL_CHANGED:
+                changed.add(name.decode("utf-8", "replace") if name else
+                            os.path.basename(self._watches.get(wd, "")))
+        if rewatch or len(self._watches) < len(self.paths):
+            self._add_watches()
+        return changed
+
+    def close(self):
+        """
+        Close the inotify descriptor.
+
+        :return: Nothing
+        """
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+def create_watcher(paths, use_inotify=True):
+    """
+    Create an inotify watcher, or a polling watcher if inotify is not available.
+
+    :param paths: list of directories to watch
+    :param use_inotify: False to always poll
+    :return: InotifyWatcher or PollingWatcher
+    """
+    if use_inotify:
+        try:
+            return InotifyWatcher(paths)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(paths)
+
+
+class DeviceInventory(object):
+    """
+    Keeps the devices detected by DutDetection between allocations. Devices are detected again
+    only when entries of the watched directories change or the cached list gets older than
+    max_age. Serial ports found usable are not opened again until their device entries change,
+    the cached list expires or opening a dut on the port fails.
+    """
+    def __init__(self, detection, logger, mbeds=None, watch_paths=None,
+                 max_age=DEFAULT_MAX_AGE, use_inotify=True):
+        """
+        :param detection: DutDetection class
+        :param logger: logging.Logger
+        :param mbeds: Stand-in for mbedls passed to DutDetection, or None to use mbedls.
+        :param watch_paths: Directories whose changes make devices be detected again.
+        :param max_age: Seconds the detected devices are used at most, 0 to detect devices for
+        every allocation.
+        :param use_inotify: False to poll the watched directories instead of using inotify.
+        """
+        self.logger = logger
+        self._detection_class = detection
+        self._mbeds = mbeds
+        self._detection = None
+        self.max_age = max_age
+        self._watcher = create_watcher(watch_paths or DEFAULT_WATCH_PATHS, use_inotify)
+        self._devices = None
+        self._scanned = 0
+        self._usable_ports = set()
+        self._failures = {}  # serial port -> amount of failed checks
+        self._lock = Lock()
+        self._stats = {"queries": 0, "scans": 0, "port_checks": 0, "port_hits": 0}
+
+    def _get_detection(self):
+        """
+        :return: mbed detection object, created on first use.
+        """
+        if self._detection is None:
+            if self._mbeds is not None:
+                self._detection = self._detection_class(mbeds=self._mbeds)
+            else:
+                self._detection = self._detection_class()
+        return self._detection
+
+    def _forget_ports(self, changed):
+        """
+        Forget health of serial ports whose device entries changed.
+
+        :param changed: set of changed names, or ALL_CHANGED
+        :return: Nothing
+        """
+        if changed is ALL_CHANGED:
+            self._usable_ports.clear()
+            return
+        for port in list(self._usable_ports):
+            if os.path.basename(port) in changed or \
+                    os.path.basename(os.path.realpath(port)) in changed:
+                self._usable_ports.discard(port)
+
+    def get_available_devices(self):
+        """
+        Get detected devices, from the cache if nothing has changed.
+
+        :return: List of connected devices as dictionaries.
+        """
+        with self._lock:
+            self._stats["queries"] += 1
+            changed = self._watcher.changes()
+            if changed is ALL_CHANGED or changed:
+                self._forget_ports(changed)
+            expired = self.max_age is not None and time.time() - self._scanned >= self.max_age
+            if self._devices is None or changed is ALL_CHANGED or changed or expired:
+                self.logger.debug("Detecting devices")
+                if expired:
+                    self._usable_ports.clear()
+                self._devices = self._get_detection().get_available_devices() or []
+                self._scanned = time.time()
+                self._stats["scans"] += 1
+            # Allocation marks the copies, the cached devices stay free for later allocations.
+            return [dict(dev) for dev in self._devices]
+
+    def is_port_usable(self, port_name):
+        """
+        Check that a serial port can be opened. Usable ports are remembered, failed ports are
+        checked again next time.
+
+        :param port_name: Name of port
+        :return: Boolean
+        """
+        with self._lock:
+            if port_name in self._usable_ports:
+                self._stats["port_hits"] += 1
+                return True
+            self._stats["port_checks"] += 1
+        usable = self._detection_class.is_port_usable(port_name)
+        with self._lock:
+            if usable:
+                self._usable_ports.add(port_name)
+                self._failures.pop(port_name, None)
+            else:
+                self._failures[port_name] = self._failures.get(port_name, 0) + 1
+        return usable
+
+    def mark_port_failed(self, port_name):
+        """
+        Forget that a port was usable, for example after opening it failed.
+
+        :param port_name: Name of port
+        :return: Nothing
+        """
+        with self._lock:
+            self._usable_ports.discard(port_name)
+            self._failures[port_name] = self._failures.get(port_name, 0) + 1
+
+    def port_health(self):
+        """
+        :return: dict, serial port -> amount of failed checks since the port was last usable.
+        Usable ports have 0.
+        """
+        with self._lock:
+            health = dict((port, 0) for port in self._usable_ports)
+            health.update(self._failures)
+            return health
+
+    def stats(self):
+        """
+        :return: dict with amount of queries, device scans, opened ports and port checks
+        answered from memory.
+        """
+        return dict(self._stats)
+
+    def close(self):
+        """
+        Stop watching for changes.
+
+        :return: Nothing
+        """
+        self._watcher.close()
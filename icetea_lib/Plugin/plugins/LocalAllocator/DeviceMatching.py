@@ -0,0 +1,115 @@
+"""
+Copyright 2019 ARM Limited
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+DeviceMatching module. Assigns devices to dut requirements as a maximum bipartite matching.
+"""
+
+from collections import deque
+
+
+def platform_index(devices):
+    """
+    Index devices by platform name.
+
+    :param devices: list of device dictionaries
+    :return: dict, platform name -> list of indexes of devices of the platform, in order.
+    """
+    index = {}
+    for ind, dev in enumerate(devices):
+        index.setdefault(dev.get("platform_name"), []).append(ind)
+    return index
+
+
+def match_devices(candidates, usable=None):
+    """
+    Find a device for as many requirements as possible, with each device used at most once.
+    Requirements first take their most preferred free device, remaining requirements are
+    matched with the Hopcroft-Karp algorithm, which moves earlier assignments when it makes
+    room for more requirements.
+
+    :param candidates: list with a list of acceptable devices for each requirement, most
+    preferred first. Devices can be any hashable values.
+    :param usable: callable, returns False for a device that can't be used. Called at most once
+    per device, and only for devices the matching considers.
+    :return: list with the device of each requirement, None for requirements without a device.
+    """
+    checked = {}
+
+    def is_usable(dev):
+        if dev not in checked:
+            checked[dev] = usable is None or usable(dev)
+        return checked[dev]
+
+    assigned = [None] * len(candidates)
+    owners = {}  # device -> index of requirement
+    for req, devices in enumerate(candidates):
+        for dev in devices:
+            if dev not in owners and is_usable(dev):
+                assigned[req] = dev
+                owners[dev] = req
+                break
+
+    while True:
+        free = [req for req, dev in enumerate(assigned) if dev is None]
+        layers = _build_layers(free, candidates, owners, is_usable)
+        if layers is None:
+            return assigned
+        for req in free:
+            _augment(req, candidates, assigned, owners, layers, checked)
+
+
+def _build_layers(free, candidates, owners, is_usable):
+    """
+    Breadth-first search from unassigned requirements along alternating paths.
+
+    :return: dict, requirement -> layer, or None if there are no augmenting paths.
+    """
+    layers = dict((req, 0) for req in free)
+    queue = deque(free)
+    limit = None
+    while queue:
+        req = queue.popleft()
+        if limit is not None and layers[req] >= limit:
+            continue
+        for dev in candidates[req]:
+            if not is_usable(dev):
+                continue
+            owner = owners.get(dev)
+            if owner is None:
+                limit = layers[req] + 1
+            elif owner not in layers:
+                layers[owner] = layers[req] + 1
+                queue.append(owner)
+    return layers if limit is not None else None
+
+
+def _augment(req, candidates, assigned, owners, layers, checked):
+    """
+    Depth-first search for an augmenting path from requirement req along the layers, and
+    flip the assignments on the path.
+
+    :return: Boolean, True if an augmenting path was found.
+    """
+    for dev in candidates[req]:
+        if not checked.get(dev):
+            continue
+        owner = owners.get(dev)
+        if owner is None or (layers.get(owner) == layers[req] + 1 and
+                             _augment(owner, candidates, assigned, owners, layers, checked)):
+            assigned[req] = dev
+            owners[dev] = req
+            return True
+    # Dead end, don't search through this requirement again in this phase.
+    layers[req] = None
+    return False
@@ -24,14 +24,40 @@ from serial import SerialException, Serial
 from icetea_lib.ResourceProvider.Allocators.exceptions import AllocationError
 
 
+class StaticMbeds(object):  # pylint: disable=too-few-public-methods
+    """
+    Stand-in for mbedls that lists a fixed set of devices, for hosts without mbedls or
+    without hardware.
+    """
+
+    def __init__(self, devices):
+        """
+        :param devices: list of device dictionaries with at least platform_name, serial_port
+        and target_id.
+        """
+        self.devices = devices
+
+    def list_mbeds(self):
+        """
+        :return: Copies of the devices.
+        """
+        return [dict(dev) for dev in self.devices]
+
+
 class DutDetection(object):
     """
     DutDetection class. Contains methods to detect usable ports and available devices using
     mbedls and serial module.
     """
 
-    def __init__(self):
-        self.mbeds = None
+    def __init__(self, mbeds=None):
+        """
+        :param mbeds: Object with a list_mbeds method used instead of mbedls, for example
+        StaticMbeds.
+        """
+        self.mbeds = mbeds
+        if mbeds is not None:
+            return
         try:
             from mbed_lstools.main import create
             self.mbeds = create()
@@ -15,10 +15,15 @@ limitations under the License.
 DutMbed module contains the DutMbed Dut subclass.
 """
 # pylint: disable=too-many-branches,too-many-arguments
+import os
+import time
+
 from prettytable import PrettyTable
+from six import string_types
 
 from icetea_lib.LogManager import get_external_logger
 from icetea_lib.Plugin.plugins.LocalAllocator.DutSerial import DutSerial
+from icetea_lib.Plugin.plugins.LocalAllocator.FlashState import FlashStateStore
 from icetea_lib.DeviceConnectors.Dut import DutConnectionError
 from icetea_lib.build import Build
 
@@ -101,6 +106,7 @@ class DutMbed(DutSerial):
             retcode = flasher.flash(build=buildfile, target_id=target_id,
                                     device_mapping_table=[self.device])
         except FLASHER_ERRORS as error:
+            self._update_flash_state(None)
             if error.__class__ == NotImplementedError:
                 self.logger.error("Flashing not supported for this platform!")
             elif error.__class__ == SyntaxError:
@@ -112,8 +118,10 @@ class DutMbed(DutSerial):
             raise DutConnectionError(error)
         if retcode == 0:
             self.dutinformation.build_binary_sha1 = self.build.sha1
+            self._update_flash_state(self.build.sha1)
             return True
         self.dutinformation.build_binary_sha1 = None
+        self._update_flash_state(None)
         return False
 
     def _flash_needed(self, **kwargs):
@@ -128,8 +136,76 @@ class DutMbed(DutSerial):
         cur_binary_sha1 = self.dutinformation.build_binary_sha1
         if not forceflash and self.build.sha1 == cur_binary_sha1:
             return False
+        if forceflash:
+            return True
+        return not self._flashed_in_earlier_run()
+
+    def _get_flash_state(self):
+        """
+        Get the store of images flashed in earlier runs, set with --flash_state_db.
+
+        :return: FlashStateStore, or None if the store is not in use.
+        """
+        path = getattr(self.params, "flash_state_db", None) if self.params else None
+        if isinstance(path, string_types) and path:
+            return FlashStateStore(path)
+        return None
+
+    def _flash_failed_on_board(self):
+        """
+        Check if the board reports that the latest image copied to it, possibly by another
+        tool, was not flashed. DAPLink leaves FAIL.TXT to its mount point in that case.
+
+        :return: Boolean
+        """
+        mount_point = self.device.get("mount_point") if self.device else None
+        return bool(mount_point) and os.path.isfile(os.path.join(mount_point, "FAIL.TXT"))
+
+    def _flashed_in_earlier_run(self):
+        """
+        Check if the image was flashed to the board in an earlier run.
+
+        :return: Boolean
+        """
+        store = self._get_flash_state()
+        target_id = self.device.get("target_id") if self.device else None
+        if store is None or not target_id:
+            return False
+        try:
+            if self._flash_failed_on_board():
+                self.logger.info("Board %s reports a failed flash, flashing again", target_id)
+                store.invalidate(target_id)
+                return False
+            record = store.get(target_id)
+        except (IOError, OSError) as error:
+            self.logger.warning("Reading flash state from %s failed: %s", store.path, error)
+            return False
+        if not record or record.get("sha1") != self.build.sha1:
+            return False
+        self.logger.info("Image %s was flashed to %s at %s", self.build.sha1, target_id,
+                         time.ctime(record.get("timestamp", 0)))
+        self.dutinformation.build_binary_sha1 = self.build.sha1
         return True
 
+    def _update_flash_state(self, sha1):
+        """
+        Record the image flashed to the board, or forget the image if flashing failed.
+
+        :param sha1: sha1 of the flashed image, None if flashing failed.
+        :return: Nothing
+        """
+        store = self._get_flash_state()
+        target_id = self.device.get("target_id") if self.device else None
+        if store is None or not target_id:
+            return
+        try:
+            if sha1:
+                store.record(target_id, sha1)
+            else:
+                store.invalidate(target_id)
+        except (IOError, OSError) as error:
+            self.logger.warning("Updating flash state in %s failed: %s", store.path, error)
+
     def print_info(self):
         """
         Prints Dut information nicely formatted into a table.
@@ -16,7 +16,7 @@ DutProcess module.
 """
 
 from icetea_lib.DeviceConnectors.Dut import Dut, DutConnectionError
-from icetea_lib.tools.GenericProcess import GenericProcess
+from icetea_lib.tools.GenericProcess import GenericProcess, UNIXPLATFORM
 from icetea_lib.DeviceConnectors.DutInformation import DutInformation
 from icetea_lib.build.build import Build
 # pylint: disable=redefined-builtin
@@ -38,6 +38,8 @@ class DutProcess(Dut, GenericProcess):  # pylint: disable=too-many-instance-attr
                                              self.resource_id if self.resource_id else "",
                                              index=None, build=None)
         self.command = None
+        self._exit_noticed = False
+        self.process_pool = None  # ProcessPool to reuse processes from, None to disable
 
     def open_connection(self):
         """
@@ -56,17 +58,91 @@ class DutProcess(Dut, GenericProcess):  # pylint: disable=too-many-instance-attr
             self.logger.error("Build initialization failed. Check your build location.")
             self.logger.debug(error)
             raise DutConnectionError(error)
-        # Start process&reader thread. Call Dut.process_dut() when new data is coming
+        # Start process&reader thread. Call Dut.process_received() when new data is coming
         app = self.config.get("application")
         if app and app.get("bin_args"):
             self.cmd = self.cmd + app.get("bin_args")
+        self._exit_noticed = False
+        self.framing = self._get_app_config("framing")
+        callback = lambda: Dut.process_received(self)
+        if self._open_pooled(callback):
+            return
         try:
-            self.start_process(self.cmd, processing_callback=lambda: Dut.process_dut(self))
+            self.start_process(self.cmd, processing_callback=callback,
+                               reactor=Dut.get_reactor())
         except KeyboardInterrupt:
             raise
         except Exception as error:
             raise DutConnectionError("Couldn't start DUT target process {}".format(error))
 
+    def _pool_key(self, cmd_arr):
+        """
+        Get the key a process started with cmd_arr is pooled with. Processes run under a
+        debugger or with valgrind writing a log file are not pooled, because debugger sessions
+        and valgrind logs belong to a single test case.
+
+        :param cmd_arr: Command line of the process
+        :return: tuple or None if the process can not be pooled.
+        """
+        if self.process_pool is None or not UNIXPLATFORM:
+            return None
+        if self.gdb or self.gdbs or self.vgdb or (self.valgrind and not self.valgrind_console):
+            return None
+        return tuple(cmd_arr), self.path, self.pty
+
+    def _open_pooled(self, callback):
+        """
+        Take a process from the process pool into use and reset it with the pool_reset_cmds
+        and pool_health_cmd of the application configuration. A process that fails the reset
+        is stopped.
+
+        :param callback: Callback for processing lines
+        :return: Boolean, True if a pooled process was taken into use.
+        """
+        key = self._pool_key(self._build_command())
+        if key is None:
+            return False
+        proc = self.process_pool.acquire(key)
+        if proc is None:
+            return False
+        self.cmd_arr = list(key[0])
+        self.attach_process(proc, processing_callback=callback, reactor=Dut.get_reactor())
+        if self._reset_pooled():
+            # The process printed its cli_ready_trigger when it was started.
+            self.init_done.set()
+            return True
+        self.logger.warning("Pooled process %d failed to reset, starting a new process",
+                            proc.pid, extra={'type': '<->'})
+        self.process_pool.discard(self.detach_process())
+        self.died = False
+        self.death_reason = None
+        self._exit_noticed = False
+        return False
+
+    def _reset_pooled(self):
+        """
+        Run pool_reset_cmds and pool_health_cmd of the application configuration.
+
+        :return: Boolean, True if all commands were executed and pool_health_cmd returned 0.
+        """
+        return self.check_health(self._get_app_config("pool_reset_cmds"),
+                                 self._get_app_config("pool_health_cmd"))
+
+    def _release_to_pool(self):
+        """
+        Put the process in the process pool instead of stopping it, if it is still running
+        and can be pooled.
+
+        :return: Boolean, True if the process was released to the pool.
+        """
+        if not self.proc or self.died or not self.cmd_arr:
+            return False
+        key = self._pool_key(self.cmd_arr)
+        if key is None or self._wait_exit(0) is not None:
+            return False
+        self.logger.debug("Release process %d to pool", self.proc.pid, extra={'type': '<->'})
+        return self.process_pool.release(key, self.detach_process())
+
     def prepareConnectionClose(self):  # pylint: disable=C0103
         """
         Deprecated version of prepare_connection_close. Still present for backwards compatibility.
@@ -86,12 +162,15 @@ class DutProcess(Dut, GenericProcess):  # pylint: disable=too-many-instance-attr
 
     def close_connection(self):
         """
-        Stop the process.
+        Stop the process or release it to the process pool. The process is given close_timeout
+        seconds to exit before it is killed.
 
         :return: Nothing
         """
         self.logger.debug("Close CLI Process '%s'" % self.cmd, extra={'type': '<->'})
-        self.stop_process()
+        if self._release_to_pool():
+            return
+        self.stop_process(timeout=self.close_timeout)
 
     def writeline(self, data, crlf="\n"):  # pylint: disable=arguments-differ
         """
@@ -103,6 +182,15 @@ class DutProcess(Dut, GenericProcess):  # pylint: disable=too-many-instance-attr
         """
         GenericProcess.writeline(self, data, crlf=crlf)
 
+    def write_raw(self, data):
+        """
+        Write bytes to process.
+
+        :param data: bytes
+        :return: Nothing
+        """
+        GenericProcess.write_raw(self, data)
+
     def readline(self, timeout=1):
         """
         Read a line from the process.
@@ -112,6 +200,59 @@ class DutProcess(Dut, GenericProcess):  # pylint: disable=too-many-instance-attr
         """
         return GenericProcess.readline(self, timeout=timeout)
 
+    def _get_death_reason(self):
+        """
+        Get the exit status of the process, if it has already exited. Called from the dut
+        thread, so the exit is not waited for.
+
+        :return: str or None if the process is still running.
+        """
+        return self._exit_reason(0)
+
+    def _complete_death_reason(self):
+        """
+        Output pipe closes just before the process exits, so the exit is waited for a moment
+        if the exit status was not known when the death was noticed.
+
+        :return: Nothing
+        """
+        if self.death_reason is None:
+            self.death_reason = self._exit_reason(0.5)
+            if self.death_reason:
+                self.logger.warning("DUT %s died: %s", self.name, self.death_reason,
+                                    extra={'type': '!<-'})
+
+    def _exit_reason(self, timeout):
+        """
+        Wait for the process to exit and describe its exit status.
+
+        :param timeout: Seconds to wait for the exit
+        :return: str or None if the process is still running.
+        """
+        if not self.proc:
+            return None
+        returncode = self._wait_exit(timeout)
+        if returncode is None:
+            return None
+        if returncode < 0:
+            return "killed by signal {}".format(-returncode)
+        return "exit status {}".format(returncode)
+
+    def _dut_is_alive(self):
+        """
+        Notice a process that exited without closing its output, for example because a child
+        process inherited it. Death is reported on the check after the one that noticed the
+        exit, so output written before exiting is processed first.
+
+        :return: Nothing
+        """
+        if self.died or not self.proc or self._wait_exit(0) is None:
+            return
+        if not self._exit_noticed:
+            self._exit_noticed = True
+            return
+        self._dut_died()
+
     def reset(self, method=None):
         """
         Not implemented
@@ -29,7 +29,8 @@ from prettytable import PrettyTable
 
 from icetea_lib.DeviceConnectors.Dut import Dut, DutConnectionError
 from icetea_lib.enhancedserial import EnhancedSerial
-from icetea_lib.tools.tools import strip_escape, split_by_n
+from icetea_lib.tools.ChunkedWriter import ChunkedWriter
+from icetea_lib.tools.tools import strip_escape
 from icetea_lib.DeviceConnectors.DutInformation import DutInformation
 
 
@@ -81,6 +82,8 @@ class DutSerial(Dut):
         ch_mode_config = ch_mode_config if ch_mode_config is not None else {}
         serial_config = serial_config if serial_config is not None else {}
         self.readthread = None
+        self.stream = None  # ReactorStream when the reactor I/O engine is in use
+        self.writer = None  # ChunkedWriter when chunk mode is in use
         self.port = False
         self.comport = port
         self.type = 'serial'
@@ -98,6 +101,7 @@ class DutSerial(Dut):
                                                start_delay=ch_mode_config.get("ch_mode_start_delay",
                                                                               0))
         self.input_queue = deque()  # Input queue
+        self.read_error = None  # Error that stopped the read thread
         self.daemon = True  # Allow Python to stop us
         self.keep_reading = False
 
@@ -251,7 +255,7 @@ class DutSerial(Dut):
         :raises: DutConnectionError if serial port was already open or a SerialException occurs.
         ValueError if EnhancedSerial __init__ or value setters raise ValueError
         """
-        if self.readthread is not None:
+        if self.readthread is not None or self.stream is not None:
             raise DutConnectionError("Trying to open serial port which was already open")
 
         self.logger.info("Open Connection "
@@ -263,6 +267,7 @@ class DutSerial(Dut):
             self.logger.debug("Use software flow control for dut: %s" % self.dut_name)
         if self.serial_rtscts:
             self.logger.debug("Use hardware flow control for dut: %s" % self.dut_name)
+        framer = self.create_framer()
         try:
             self.port = EnhancedSerial(self.comport)
             self.port.baudrate = self.serial_baudrate
@@ -287,7 +292,17 @@ class DutSerial(Dut):
             self.logger.info("Use normal serial write mode", extra={'type': '<->'})
         if self.params.reset:
             self.reset()
+        reactor = Dut.get_reactor()
+        if reactor is not None:
+            # Let the reactor read the port instead of a dedicated thread
+            self.stream = reactor.create_stream(self.port, callback=lambda: Dut.process_dut(self),
+                                                framer=framer)
+            self.stream.start()
+            return
+        if framer.binary:
+            self.port.framer = framer
         # Start the serial reading thread
+        self.read_error = None
         self.readthread = Thread(name=self.name, target=self.run)
         self.readthread.start()
 
@@ -315,12 +330,13 @@ class DutSerial(Dut):
     # close serial port connection
     def close_connection(self):  # pylint: disable=C0103
         """
-        Closes serial port connection.
+        Closes serial port connection. Data queued in chunk mode is written before closing.
 
         :return: Nothing
         """
         if self.port:
             self.stop()
+            self._stop_writer()
             self.logger.debug("Close port '%s'" % self.comport,
                               extra={'type': '<->'})
             self.port.close()
@@ -362,28 +378,129 @@ class DutSerial(Dut):
             return result
         return None
 
+    @property
+    def write_queue_depth(self):
+        """
+        Amount of chunks queued for writing in chunk mode.
+
+        :return: int
+        """
+        return self.writer.depth if self.writer is not None else 0
+
     # transfer data to the serial port
     def writeline(self, data):
         """
-        Writes data to serial port.
+        Writes data to serial port. In chunk mode the data is queued and written in chunks by
+        the writer thread of the port.
 
         :param data: Data to write
         :return: Nothing
-        :raises: IOError if SerialException occurs.
+        :raises: RuntimeError if SerialException occurs, in chunk mode also if writing
+        previously queued data failed.
         """
+        self.writelines([data])
+
+    def writelines(self, lines):
+        """
+        Writes several lines to serial port at once.
+
+        :param lines: list of str
+        :return: Nothing
+        :raises: RuntimeError if SerialException occurs, in chunk mode also if writing
+        previously queued data failed.
+        """
+        data = [(line + "\n").encode() for line in lines]
+        if self.ch_mode:
+            self._get_writer().writelines(data)
+            return
         try:
-            if self.ch_mode:
-                data += "\n"
-                parts = split_by_n(data, self.ch_mode_chunk_size)
-                for split_str in parts:
-                    self.port.write(split_str.encode())
-                    time.sleep(self.ch_mode_ch_delay)
-            else:
-                self.port.write((data + "\n").encode())
+            self.port.write(b"".join(data))
         except SerialException as err:
-            self.logger.exception("SerialError occured while trying to write data {}.".format(data))
+            self.logger.exception("SerialError occured while trying to write data {}.".format(
+                "\n".join(lines)))
             raise RuntimeError(str(err))
 
+    def write_raw(self, data):
+        """
+        Writes bytes to serial port as they are, in chunks in chunk mode.
+
+        :param data: bytes
+        :return: Nothing
+        :raises: RuntimeError if SerialException occurs, in chunk mode also if writing
+        previously queued data failed.
+        """
+        if self.ch_mode:
+            self._get_writer().writelines([data])
+            return
+        try:
+            self.port.write(data)
+        except SerialException as err:
+            self.logger.exception("SerialError occured while trying to write data.")
+            raise RuntimeError(str(err))
+
+    def flush_writes(self, timeout=None):
+        """
+        Wait until data queued in chunk mode has been written.
+
+        :param timeout: Seconds to wait, None to wait until everything is written.
+        :return: Boolean, True if everything was written.
+        """
+        if self.writer is None:
+            return True
+        return self.writer.flush(timeout)
+
+    def _get_writer(self):
+        """
+        Get the chunk writer of the port, starting it if needed.
+
+        :return: ChunkedWriter
+        """
+        if self.writer is None:
+            self.writer = ChunkedWriter(self._write_chunk, self.ch_mode_chunk_size,
+                                        self.ch_mode_ch_delay, on_error=self._write_failed,
+                                        name=str(self.name) + " writer")
+            self.writer.start()
+        else:
+            # Chunk mode parameters can be changed while the port is open.
+            self.writer.chunk_size = max(1, self.ch_mode_chunk_size)
+            self.writer.chunk_delay = self.ch_mode_ch_delay
+        return self.writer
+
+    def _write_chunk(self, chunk):
+        """
+        Write a chunk to the serial port. Called from the writer thread.
+
+        :param chunk: bytes
+        :return: Nothing
+        """
+        self.port.write(chunk)
+
+    def _write_failed(self, error):
+        """
+        Handle failure of the writer thread.
+
+        :param error: Exception
+        :return: Nothing
+        """
+        self.logger.error("SerialError occured while trying to write data: %s", error)
+        if isinstance(error, SerialException):
+            self._dut_died(str(error))
+
+    def _stop_writer(self):
+        """
+        Write queued data and stop the chunk writer.
+
+        :return: Nothing
+        """
+        if self.writer is None:
+            return
+        # Allow time for the queued chunks, with some margin.
+        timeout = self.writer.depth * self.ch_mode_ch_delay + 5
+        if not self.writer.stop(timeout):
+            self.logger.warning("Queued data was not written to '%s' before closing",
+                                self.comport)
+        self.writer = None
+
     # read line from serial port
     def _readline(self, timeout=1):
         """
@@ -393,7 +510,21 @@ class DutSerial(Dut):
         :return: stripped line or None
         """
         line = self.port.readline(timeout=timeout)
-        return strip_escape(line.strip()) if line is not None else line
+        if line is None or self.framed:
+            return line
+        return strip_escape(line.strip())
+
+    def _readlines(self, timeout=1):
+        """
+        Read all available lines from serial port.
+
+        :param timeout: timeout for waiting for the first line, default is 1
+        :return: list of stripped lines
+        """
+        lines = self.port.readlines(timeout=timeout)
+        if self.framed:
+            return lines
+        return [strip_escape(line.strip()) for line in lines]
 
     def peek(self):
         """
@@ -401,22 +532,34 @@ class DutSerial(Dut):
 
         :return: str
         """
+        if self.stream is not None:
+            return self.stream.peek()
         if self.port:
             return self.port.peek()
         return ""
 
     def run(self):
         """
-        Read lines while keep_reading is True. Calls process_dut for each received line.
+        Read lines while keep_reading is True. Calls process_received for each received line.
+        Reading stops if the port fails, for example when the device disappears.
 
         :return: Nothing
         """
         self.keep_reading = True
         while self.keep_reading:
-            line = self._readline()
-            if line:
-                self.input_queue.appendleft(line)
-                Dut.process_dut(self)
+            try:
+                lines = self._readlines()
+            except SerialException as error:
+                self.logger.error("SerialError occured while reading: %s", error)
+                self.read_error = str(error)
+                self.keep_reading = False
+                # Let processing notice the error after the lines received before it.
+                Dut.process_received(self)
+                return
+            for line in lines:
+                if line:
+                    self.input_queue.appendleft(line)
+                    Dut.process_received(self)
 
     def stop(self):
         """
@@ -425,23 +568,36 @@ class DutSerial(Dut):
         :return: Nothing
         """
         self.keep_reading = False
+        if self.stream is not None:
+            self.stream.stop()
+            self.stream = None
         if self.readthread is not None:
             self.readthread.join()
             self.readthread = None
 
     def readline(self, timeout=1):
         """
-        Pops from input_queue.
+        Pops from input_queue, or from the reactor stream if the reactor I/O engine is in use.
 
         :param timeout: Not used
         :return: first item in input_queue or None
+        :raises: RuntimeError if reading the port failed and all received lines have been read.
         """
+        if self.stream is not None:
+            return self.stream.readline()
         try:
             return self.input_queue.pop()
         except IndexError:
-            pass
+            if self.read_error is not None:
+                raise RuntimeError(self.read_error)
         return None
 
+    def _get_death_reason(self):
+        """
+        :return: Error that stopped reading the port, or None.
+        """
+        return self.read_error
+
     def print_info(self):
         """
         Prints Dut information nicely formatted into a table.
@@ -12,69 +12,354 @@ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 See the License for the specific language governing permissions and
 limitations under the License.
 
-DutTcp module. This is a prototype of a Dut-over-tcp implementation and is not used.
+DutTcp module. Contains DutTcp, a Dut connected over a TCP socket, for example a board behind a
+serial-to-Ethernet bridge or a networked simulator.
 """
 
 import socket
-from icetea_lib.tools import strip_escape
-from icetea_lib.tools import num
-from icetea_lib.DeviceConnectors.Dut import Dut
+from threading import Event, Lock, Thread
 
+from icetea_lib.DeviceConnectors.Dut import Dut, DutConnectionError
+from icetea_lib.DeviceConnectors.DutInformation import DutInformation
+from icetea_lib.TestStepError import TestStepError
+from icetea_lib.tools.GenericProcess import NonBlockingStreamReader
 
-class DutTcp(Dut):
-    '''
-    Draft version of TCP -dut type
-    '''
-    def __init__(self, name='tcp'):
-        Dut.__init__(self, name=name)
-        self.port = None
-        self.type = 'socket'
+
+def parse_address(address):
+    """
+    Split a TCP address to host and port.
+
+    :param address: "host:port" or "[ipv6 address]:port"
+    :return: tuple (host, port)
+    :raises: ValueError if address is not valid.
+    """
+    host, sep, port = str(address).rpartition(":")
+    if not sep or not host or not port.isdigit():
+        raise ValueError("Invalid TCP address {}, expected host:port".format(address))
+    if host.startswith("[") and host.endswith("]"):
+        host = host[1:-1]
+    return host, int(port)
+
+
+class DutTcp(Dut):  # pylint: disable=too-many-instance-attributes
+    """
+    DutTcp class, subclasses Dut. Received data is read by the same non-blocking readers as
+    process output, or by the reactor when the reactor I/O engine is in use. If the connection
+    drops, it can be reconnected in the background. Data written while reconnecting is sent
+    after the connection has been restored.
+    """
+    def __init__(self, name='tcp', address=None, config=None, params=None):
+        Dut.__init__(self, name=name, params=params)
+        self.port = None  # socket
+        self.stream = None  # NonBlockingStreamReader or ReactorStream
+        self.comport = address
+        self.type = 'tcp'
+        self.read_error = None  # Reason the connection was lost for good
+        self.reconnects = 0  # Amount of successful reconnections
+        self._lock = Lock()
+        self._closing = Event()
+        self._reconnect_thread = None
+        self._pending = []  # Data written while reconnecting
+
+        if config:
+            self.config.update(config)
+        app = self.config.get("application") or {}
+        self.nodelay = app.get("tcp_nodelay", True)
+        self.keepalive = app.get("tcp_keepalive", 0)
+        self.reconnect = app.get("tcp_reconnect", 0)
+        self.reconnect_delay = app.get("tcp_reconnect_delay", 1)
+        self.connect_timeout = app.get("tcp_connect_timeout", 10)
+        self.write_timeout = app.get("tcp_write_timeout", 10)
+        if app.get("init_cli_cmds") is not None:
+            self.set_init_cli_cmds(app.get("init_cli_cmds"))
+        if app.get("post_cli_cmds") is not None:
+            self.set_post_cli_cmds(app.get("post_cli_cmds"))
+        self.dutinformation = DutInformation("tcp", address if address else "",
+                                             index=None, build=None)
 
     def open_connection(self):
         """
         Open connection over TCP socket.
+
+        :return: Nothing
+        :raises: DutConnectionError if connection was already open or connecting fails.
+        """
+        if self.port is not None:
+            raise DutConnectionError("Trying to open TCP connection which was already open")
+        self.logger.info("Open connection for '%s' to '%s'", self.dut_name, self.comport,
+                         extra={'type': '<->'})
+        self._closing.clear()
+        self.read_error = None
+        try:
+            self._connect()
+        except (socket.error, ValueError) as error:
+            raise DutConnectionError("Couldn't connect to {}: {}".format(self.comport, error))
+
+    def _connect(self):
+        """
+        Connect the socket and start reading it.
+
+        :return: Nothing
+        :raises: socket.error if connecting fails, ValueError if address is not valid.
+        """
+        sock = socket.create_connection(parse_address(self.comport),
+                                        timeout=self.connect_timeout)
+        try:
+            if self.nodelay:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            if self.keepalive:
+                self._set_keepalive(sock)
+            # Socket timeout makes the descriptor non-blocking for the reader. Writes wait for
+            # room in the send buffer for at most write_timeout.
+            sock.settimeout(self.write_timeout)
+        except socket.error:
+            sock.close()
+            raise
+        callback = lambda: Dut.process_received(self)
+        reactor = Dut.get_reactor()
+        if reactor is not None:
+            stream = reactor.create_stream(sock, callback, self.create_framer())
+        else:
+            stream = NonBlockingStreamReader(sock, callback, label=self.comport,
+                                             framer=self.create_framer())
+        self.port = sock
+        self.stream = stream
+        stream.start()
+
+    def _set_keepalive(self, sock):
+        """
+        Enable TCP keepalive. A dead peer is noticed after keepalive seconds of silence and
+        three unanswered probes.
+
+        :param sock: socket
+        :return: Nothing
+        """
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        idle = max(1, int(self.keepalive))
+        for name, value in (("TCP_KEEPIDLE", idle), ("TCP_KEEPINTVL", max(1, idle // 3)),
+                            ("TCP_KEEPCNT", 3)):
+            option = getattr(socket, name, None)
+            if option is not None:
+                sock.setsockopt(socket.IPPROTO_TCP, option, value)
+
+    def _disconnect(self):
+        """
+        Stop reading and close the socket.
+
         :return: Nothing
         """
-        self.logger.debug("Open COM %s", self.comport)
-        self.port = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        (ip_addr, port) = self.comport.split(':')
-        self.port.connect(ip_addr, num(port))
+        stream, self.stream = self.stream, None
+        sock, self.port = self.port, None
+        if stream is not None:
+            stream.stop()
+        if sock is not None:
+            try:
+                sock.close()
+            except socket.error:
+                pass
 
     def close_connection(self):
         """
-        Close TCP port
+        Close TCP connection and stop reconnecting.
+
         :return: Nothing
         """
-        if self.port:
-            self.port.close()
-            self.logger.debug("Close TCP port")
+        self._closing.set()
+        thread = self._reconnect_thread
+        if thread is not None:
+            thread.join()
+        with self._lock:
+            self._pending = []
+            if self.port is not None:
+                self.logger.debug("Close TCP connection to '%s'", self.comport,
+                                  extra={'type': '<->'})
+            self._disconnect()
+
+    def _start_reconnect(self, data=None):
+        """
+        Start reconnecting in the background if reconnecting is enabled.
+
+        :param data: bytes to send after reconnecting, or None
+        :return: Boolean, True if the connection is being reconnected.
+        """
+        started = False
+        with self._lock:
+            if self.reconnect <= 0 or self._closing.is_set():
+                return False
+            if self._reconnect_thread is None:
+                self.logger.warning("Connection to %s lost, reconnecting", self.comport,
+                                    extra={'type': '<->'})
+                self._disconnect()
+                self._reconnect_thread = Thread(target=self._reconnect_loop,
+                                                name=str(self.name) + " reconnect")
+                self._reconnect_thread.daemon = True
+                self._reconnect_thread.start()
+                started = True
+                if self.pipelined:
+                    # Data of the failed write belongs to the commands failed below.
+                    data = None
+            if data is not None:
+                self._pending.append(data)
+        if started and self.pipelined:
+            # Responses to the outstanding commands were lost with the connection.
+            self._fail_pipeline(TestStepError("Connection to {} lost".format(self.comport)))
+        return True
+
+    def _reconnect_loop(self):
+        """
+        Try to reconnect reconnect times, reconnect_delay seconds apart. Data written while
+        reconnecting is sent when the connection is restored. If reconnecting fails, the dut is
+        signalled so it notices that the connection is lost. Closing the dut stops reconnecting
+        without signalling.
+
+        :return: Nothing
+        """
+        for attempt in range(1, self.reconnect + 1):
+            if self._closing.wait(self.reconnect_delay):
+                # Closed on purpose, the connection was not lost.
+                with self._lock:
+                    self._pending = []
+                    self._reconnect_thread = None
+                return
+            with self._lock:
+                try:
+                    self._connect()
+                    self.reconnects += 1
+                    if self._pending:
+                        self.port.sendall(b"".join(self._pending))
+                except (socket.error, ValueError) as error:
+                    self.logger.warning("Reconnect attempt %d to %s failed: %s", attempt,
+                                        self.comport, error, extra={'type': '<->'})
+                    self.read_error = "Connection to {} lost: {}".format(self.comport, error)
+                    self._disconnect()
+                    continue
+                self._pending = []
+                self._reconnect_thread = None
+            self.logger.info("Reconnected to %s", self.comport, extra={'type': '<->'})
+            return
+        with self._lock:
+            self._pending = []
+            if self.read_error is None:
+                self.read_error = "Connection to {} lost".format(self.comport)
+            self._reconnect_thread = None
+        Dut.process_received(self)
 
     def writeline(self, data):
         """
-        Write data to port
+        Write a line to the socket.
+
         :param data: data to write
         :return: Nothing
+        :raises: RuntimeError if the connection is lost.
+        """
+        self.writelines([data])
+
+    def writelines(self, lines):
+        """
+        Write several lines to the socket in a single send.
+
+        :param lines: list of str
+        :return: Nothing
+        :raises: RuntimeError if the connection is lost.
         """
-        self.port.send(data)
+        self.write_raw(b"".join([(line + "\n").encode() for line in lines]))
 
-    def readline(self, timeout=None):  # timeout is not in use
+    def write_raw(self, data):
         """
-        Read data from port and strip escape characters
-        :param timeout:
-        :return: Stripped line.
+        Write bytes to the socket.
+
+        :param data: bytes
+        :return: Nothing
+        :raises: RuntimeError if the connection is lost.
+        """
+        with self._lock:
+            if self._reconnect_thread is not None:
+                self._pending.append(data)
+                return
+            if self.port is None:
+                raise RuntimeError(self.read_error or "TCP connection is not open")
+            try:
+                self.port.sendall(data)
+                return
+            except socket.error as error:
+                self.read_error = "Writing to {} failed: {}".format(self.comport, error)
+        if not self._start_reconnect(data):
+            raise RuntimeError(self.read_error)
+
+    def readline(self, timeout=None):  # pylint: disable=unused-argument
+        """
+        Pop a received line.
+
+        :param timeout: Not used
+        :return: line or None if no lines are available.
+        :raises: RuntimeError if the connection is lost and all received lines have been read.
         """
-        fil = self.port.makefile()
-        line = fil.readline()
-        return strip_escape(line.strip())
+        stream = self.stream
+        if stream is None:
+            if self._reconnect_thread is None and self.read_error is not None:
+                raise RuntimeError(self.read_error)
+            return None
+        try:
+            return stream.readline()
+        except RuntimeError:
+            if stream is not self.stream:
+                # Reconnected while reading.
+                return None
+            if self._start_reconnect():
+                return None
+            if self.read_error is None:
+                self.read_error = "Connection closed by {}".format(self.comport)
+            raise RuntimeError(self.read_error)
+
+    def peek(self):
+        """
+        Peek into the incomplete received line.
+
+        :return: str
+        """
+        stream = self.stream
+        return stream.peek() if stream is not None else ""
+
+    def _get_death_reason(self):
+        """
+        :return: Reason the connection was lost, or None.
+        """
+        return self.read_error
 
     def print_info(self):
-        pass
+        """
+        Print information of this dut.
 
-    def _flash_needed(self, **kwargs):
-        pass
+        :return: Nothing
+        """
+        info_string = "DutTcp {}, address {}\n".format(self.name, self.comport)
+        if self.reconnects:
+            info_string += "Reconnected {} times\n".format(self.reconnects)
+        if self.config:
+            info_string += "Configuration for this DUT:\n {} \n".format(self.config)
+        self.logger.info(info_string)
 
     def get_info(self):
+        """
+        Get DutInformation object of this dut.
+
+        :return: DutInformation
+        """
+        return self.dutinformation
+
+    def get_config(self):
+        """
+        Get configuration of this dut.
+
+        :return: dictionary
+        """
+        return self.config
+
+    def _flash_needed(self, **kwargs):
         pass
 
     def reset(self, method=None):
-        pass
+        """
+        Not implemented
+        """
+        self.logger.info("Reset not implemented for TCP DUT")
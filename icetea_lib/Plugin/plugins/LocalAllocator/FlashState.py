@@ -0,0 +1,139 @@
+"""
+Copyright 2019 ARM Limited
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+FlashState module. Contains FlashStateStore, which remembers the image last flashed to each
+board across runs.
+"""
+
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Windows, the store is not locked between processes
+
+
+class FlashStateStore(object):
+    """
+    Persistent store of flashed images, keyed by target_id. The store is a json file that
+    several icetea processes can use at the same time: each read or update locks a lock file
+    next to it, and updates replace the file atomically.
+    """
+    def __init__(self, path):
+        """
+        :param path: Path of the json file. The directory is created if it doesn't exist.
+        """
+        self.path = path
+        self._lock_path = path + ".lock"
+
+    @contextmanager
+    def _locked(self, exclusive):
+        """
+        Hold the lock of the store.
+
+        :param exclusive: True for updating, False for reading
+        """
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                if not os.path.isdir(directory):
+                    raise
+        with open(self._lock_path, "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _read(self):
+        """
+        Read the store. A missing or corrupted file is an empty store.
+
+        :return: dict, target_id -> record
+        """
+        try:
+            with open(self.path, "r") as state_file:
+                data = json.load(state_file)
+        except (IOError, OSError, ValueError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _write(self, data):
+        """
+        Replace the store with data.
+
+        :param data: dict, target_id -> record
+        :return: Nothing
+        """
+        handle, tmp_path = tempfile.mkstemp(prefix=".flash_state",
+                                            dir=os.path.dirname(self.path) or ".")
+        try:
+            with os.fdopen(handle, "w") as state_file:
+                json.dump(data, state_file, indent=2, sort_keys=True)
+            if os.name == "nt" and os.path.exists(self.path):
+                os.remove(self.path)
+            os.rename(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def get(self, target_id):
+        """
+        Get the record of a board.
+
+        :param target_id: target_id of the board
+        :return: dict with keys sha1 and timestamp, or None if the board has no record.
+        """
+        if not target_id:
+            return None
+        with self._locked(exclusive=False):
+            return self._read().get(target_id)
+
+    def record(self, target_id, sha1):
+        """
+        Record that an image was flashed successfully.
+
+        :param target_id: target_id of the board
+        :param sha1: sha1 of the flashed image
+        :return: Nothing
+        """
+        if not target_id or not sha1:
+            return
+        with self._locked(exclusive=True):
+            data = self._read()
+            data[target_id] = {"sha1": sha1, "timestamp": time.time()}
+            self._write(data)
+
+    def invalidate(self, target_id):
+        """
+        Forget the image of a board, so it is flashed next time.
+
+        :param target_id: target_id of the board
+        :return: Nothing
+        """
+        if not target_id:
+            return
+        with self._locked(exclusive=True):
+            data = self._read()
+            if data.pop(target_id, None) is not None:
+                self._write(data)
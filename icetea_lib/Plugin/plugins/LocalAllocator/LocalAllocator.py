@@ -17,6 +17,7 @@ limitations under the License.
 LocalAllocator module. Implements allocating local resources using mbedls
 """
 
+import functools
 import logging
 
 from icetea_lib.LogManager import get_resourceprovider_logger, set_level
@@ -25,11 +26,16 @@ from icetea_lib.ResourceProvider.Allocators.BaseAllocator import BaseAllocator
 from icetea_lib.ResourceProvider.Allocators.exceptions import AllocationError
 from icetea_lib.ResourceProvider.exceptions import ResourceInitError
 
-from icetea_lib.Plugin.plugins.LocalAllocator.DutDetection import DutDetection
+from icetea_lib.Plugin.plugins.LocalAllocator.DeviceMatching import match_devices, platform_index
+from icetea_lib.Plugin.plugins.LocalAllocator.DeviceInventory import DeviceInventory
+from icetea_lib.Plugin.plugins.LocalAllocator.DeviceInventory import DEFAULT_MAX_AGE
+from icetea_lib.Plugin.plugins.LocalAllocator.DutDetection import DutDetection, StaticMbeds
 from icetea_lib.Plugin.plugins.LocalAllocator.DutConsole import DutConsole
 from icetea_lib.Plugin.plugins.LocalAllocator.DutProcess import DutProcess
 from icetea_lib.Plugin.plugins.LocalAllocator.DutSerial import DutSerial
 from icetea_lib.Plugin.plugins.LocalAllocator.DutMbed import DutMbed
+from icetea_lib.Plugin.plugins.LocalAllocator.DutTcp import DutTcp, parse_address
+from icetea_lib.Plugin.plugins.LocalAllocator.ProcessPool import ProcessPool
 
 
 def init_generic_serial_dut(contextlist, conf, index, args):
@@ -72,6 +78,23 @@ def init_generic_serial_dut(contextlist, conf, index, args):
     contextlist.dutinformations.append(dut.get_info())
 
 
+def init_tcp_dut(contextlist, conf, index, args):
+    """
+    Initializes a dut connected over TCP
+    """
+    address = conf['tcp_address']
+    dut = DutTcp(name="D%d" % index, address=address, config=conf, params=args)
+    dut.index = index
+
+    dut.platform = conf.get("platform_name", "tcp")
+
+    msg = 'Use device at TCP address {} as D{}'
+    contextlist.logger.info(msg.format(address, index))
+
+    contextlist.duts.append(dut)
+    contextlist.dutinformations.append(dut.get_info())
+
+
 def init_mbed_dut(contextlist, conf, index, args):
     """
     Initializes a local hardware dut
@@ -137,9 +160,12 @@ def init_mbed_dut(contextlist, conf, index, args):
     contextlist.dutinformations.append(dut.get_info())
 
 
-def init_process_dut(contextlist, conf, index, args):
+def init_process_dut(contextlist, conf, index, args, process_pool=None):
     """
     Initialize process type Dut as DutProcess or DutConsole.
+
+    :param process_pool: ProcessPool to reuse DutProcess processes from, None to start a new
+    process for every test case.
     """
     if "subtype" in conf and conf["subtype"]:
         if conf["subtype"] != "console":
@@ -162,6 +188,7 @@ def init_process_dut(contextlist, conf, index, args):
         dut = DutProcess(name="D%d" % index, config=conf, params=args)
         dut.index = index
         dut.command = binary
+        dut.process_pool = process_pool
         if args.valgrind:
             dut.use_valgrind(args.valgrind_tool,
                              not args.valgrind_text,
@@ -179,6 +206,8 @@ def init_process_dut(contextlist, conf, index, args):
             contextlist.logger.info("VGDB is activated for node %i" % index)
         if args.nobuf:
             dut.no_std_buf()
+        if app_config.get("use_pty"):
+            dut.use_pty()
 
         if init_cli_cmds is not None:
             dut.set_init_cli_cmds(init_cli_cmds)
@@ -201,6 +230,12 @@ class LocalAllocator(BaseAllocator):
             self.logger = get_resourceprovider_logger("LocalAllocator", "LAL")
             set_level("LAL", logging.DEBUG)
         self._available_devices = []
+        self._allocator_cfg = allocator_cfg or {}
+        self.inventory = None
+        self.process_pool = None
+        pool_size = getattr(args, "process_pool", 0) if args is not None else 0
+        if pool_size and pool_size > 0:
+            self.process_pool = ProcessPool(pool_size, self.logger)
 
     @property
     def share_allocations(self):
@@ -218,7 +253,7 @@ class LocalAllocator(BaseAllocator):
         :return: True if type is supported, False otherwise
         """
         try:
-            return dut_configuration["type"] in ["hardware", "process", "serial", "mbed"]
+            return dut_configuration["type"] in ["hardware", "process", "serial", "mbed", "tcp"]
         except KeyError:
             return False
 
@@ -237,16 +272,24 @@ class LocalAllocator(BaseAllocator):
             raise AllocationError("Invalid dut configuration format!")
 
         if next((item for item in dut_config_list if item.get("type") == "hardware"), False):
-            self._available_devices = DutDetection().get_available_devices()
+            self._available_devices = self._get_inventory().get_available_devices()
             if len(self._available_devices) < len(dut_config_list):
                 raise AllocationError("Required amount of devices not available.")
 
-        # Enumerate all required DUT's
+        # Enumerate all required DUT's. Devices are assigned to all hardware duts at once, so
+        # that the device taken for one dut doesn't leave another dut without a device.
+        hardware_configs = []
         try:
             for dut_config in dut_config_list:
                 if not self.can_allocate(dut_config.get_requirements()):
                     raise AllocationError("Resource type is not supported")
-                self._allocate(dut_config)
+                if dut_config["type"] in ["hardware", "mbed"]:
+                    dut_config.set("type", "mbed")
+                    hardware_configs.append(dut_config)
+                else:
+                    self._allocate(dut_config)
+            if hardware_configs:
+                self._allocate_devices(hardware_configs)
         except AllocationError:
             # Locally allocated don't need to be released any way for
             # now, so just re-raise the error
@@ -260,8 +303,11 @@ class LocalAllocator(BaseAllocator):
             alloc_list.append(context)
 
         alloc_list.set_dut_init_function("serial", init_generic_serial_dut)
-        alloc_list.set_dut_init_function("process", init_process_dut)
+        alloc_list.set_dut_init_function("process", functools.partial(
+            init_process_dut, process_pool=self.process_pool))
         alloc_list.set_dut_init_function("mbed", init_mbed_dut)
+        alloc_list.set_dut_init_function("tcp", init_tcp_dut)
+        alloc_list.set_connection_error_handler(self._connection_failed)
 
         return alloc_list
 
@@ -274,6 +320,48 @@ class LocalAllocator(BaseAllocator):
         """
         pass
 
+    def cleanup(self):
+        """
+        Stop the processes waiting in the process pool.
+
+        :return: Nothing
+        """
+        if self.process_pool is not None:
+            self.logger.info("Process pool statistics: %s", self.process_pool.stats())
+            self.process_pool.close()
+        if self.inventory is not None:
+            self.logger.info("Device inventory statistics: %s", self.inventory.stats())
+            self.inventory.close()
+            self.inventory = None
+
+    def _get_inventory(self):
+        """
+        Get the DeviceInventory of this allocator. Devices listed in "devices" of the allocator
+        configuration are used instead of detecting devices with mbedls.
+
+        :return: DeviceInventory
+        """
+        if self.inventory is None:
+            devices = self._allocator_cfg.get("devices")
+            self.inventory = DeviceInventory(
+                DutDetection, self.logger,
+                mbeds=StaticMbeds(devices) if devices is not None else None,
+                watch_paths=self._allocator_cfg.get("inventory_watch_paths"),
+                max_age=self._allocator_cfg.get("inventory_max_age", DEFAULT_MAX_AGE),
+                use_inotify=self._allocator_cfg.get("inventory_inotify", True))
+        return self.inventory
+
+    def _connection_failed(self, dut):
+        """
+        Make the inventory check the serial port of a dut again after opening the dut failed.
+
+        :param dut: Dut
+        :return: Nothing
+        """
+        port = getattr(dut, "comport", None)
+        if port and self.inventory is not None:
+            self.inventory.mark_port_failed(port)
+
     def _allocate(self, dut_configuration):  # pylint: disable=too-many-branches
         """
         Internal allocation function. Allocates a single resource based on dut_configuration.
@@ -286,46 +374,84 @@ class LocalAllocator(BaseAllocator):
         if dut_configuration["type"] == "hardware":
             dut_configuration.set("type", "mbed")
         if dut_configuration["type"] == "mbed":
-            if not self._available_devices:
-                raise AllocationError("No available devices to allocate from")
-            dut_reqs = dut_configuration.get_requirements()
-            platforms = None if 'allowed_platforms' not in dut_reqs else dut_reqs[
-                'allowed_platforms']
-            platform_name = None if 'platform_name' not in dut_reqs else dut_reqs[
-                "platform_name"]
-            if platform_name is None and platforms:
-                platform_name = platforms[0]
-            if platform_name and platforms:
-                if platform_name not in platforms:
-                    raise AllocationError("Platform name not in allowed platforms.")
-            # Enumerate through all available devices
-            for dev in self._available_devices:
-                if platform_name and dev["platform_name"] != platform_name:
-                    self.logger.debug("Skipping device %s because of mismatching platform. "
-                                      "Required %s but device was %s", dev['target_id'],
-                                      platform_name, dev['platform_name'])
-                    continue
-                if dev['state'] == 'allocated':
-                    self.logger.debug("Skipping device %s because it was "
-                                      "already allocated", dev['target_id'])
-                    continue
-
-                if DutDetection.is_port_usable(dev['serial_port']):
-                    dev['state'] = "allocated"
-                    dut_reqs['allocated'] = dev
-                    self.logger.info("Allocated device %s", dev['target_id'])
-                    return True
-                else:
-                    self.logger.info("Could not open serial port (%s) of "
-                                     "allocated device %s", dev['serial_port'], dev['target_id'])
-            # Didn't find a matching device to allocate so allocation failed
-            raise AllocationError("No suitable local device available")
+            self._allocate_devices([dut_configuration])
         elif dut_configuration["type"] == "serial":
             dut_reqs = dut_configuration.get_requirements()
             if not dut_reqs.get("serial_port"):
                 raise AllocationError("Serial port not defined for requirement {}".format(dut_reqs))
             if not DutDetection.is_port_usable(dut_reqs['serial_port']):
                 raise AllocationError("Serial port {} not usable".format(dut_reqs['serial_port']))
+        elif dut_configuration["type"] == "tcp":
+            dut_reqs = dut_configuration.get_requirements()
+            try:
+                parse_address(dut_reqs.get("tcp_address"))
+            except ValueError as error:
+                raise AllocationError("TCP address not valid for requirement {}: {}".format(
+                    dut_reqs, error))
         # Successful allocation, return True
 
         return True
+
+    @staticmethod
+    def _get_platform(dut_reqs):
+        """
+        Get the platform a hardware dut must be allocated from. Without platform_name, the
+        first item of allowed_platforms is used.
+
+        :param dut_reqs: requirements dictionary
+        :return: platform name, or None if any platform is allowed.
+        :raises: AllocationError if platform_name is not one of allowed_platforms.
+        """
+        platforms = dut_reqs.get("allowed_platforms")
+        platform_name = dut_reqs.get("platform_name")
+        if platform_name is None and platforms:
+            platform_name = platforms[0]
+        if platform_name and platforms:
+            if platform_name not in platforms:
+                raise AllocationError("Platform name not in allowed platforms.")
+        return platform_name or None
+
+    def _allocate_devices(self, dut_configurations):
+        """
+        Allocate a device for each hardware dut. Devices are assigned with a bipartite
+        matching, so allocation succeeds whenever the free devices can satisfy the platform
+        requirements of all duts.
+
+        :param dut_configurations: list of ResourceRequirements objects of type mbed
+        :return: Nothing
+        :raises: AllocationError if a device could not be allocated for every dut.
+        """
+        if not self._available_devices:
+            raise AllocationError("No available devices to allocate from")
+        free = [dev for dev in self._available_devices if dev['state'] != 'allocated']
+        by_platform = platform_index(free)
+        all_devices = list(range(len(free)))
+        candidates = []
+        for dut_configuration in dut_configurations:
+            platform_name = self._get_platform(dut_configuration.get_requirements())
+            if platform_name is None:
+                candidates.append(all_devices)
+            else:
+                candidates.append(by_platform.get(platform_name, []))
+
+        inventory = self._get_inventory()
+
+        def usable(ind):
+            if inventory.is_port_usable(free[ind]['serial_port']):
+                return True
+            self.logger.info("Could not open serial port (%s) of device %s",
+                             free[ind]['serial_port'], free[ind]['target_id'])
+            return False
+
+        assigned = match_devices(candidates, usable)
+        if None in assigned:
+            # Didn't find a matching device to allocate so allocation failed
+            missing = [dut_configuration.get_requirements()
+                       for dut_configuration, ind in zip(dut_configurations, assigned)
+                       if ind is None]
+            raise AllocationError("No suitable local device available for {}".format(missing))
+        for dut_configuration, ind in zip(dut_configurations, assigned):
+            dev = free[ind]
+            dev['state'] = "allocated"
+            dut_configuration.get_requirements()['allocated'] = dev
+            self.logger.info("Allocated device %s", dev['target_id'])
@@ -0,0 +1,175 @@
+"""
+Copyright 2019 ARM Limited
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+ProcessPool module. Contains ProcessPool, a pool of idle process DUT processes that are kept
+running between test cases.
+"""
+
+import os
+from collections import deque
+from threading import Lock
+
+from icetea_lib.tools.GenericProcess import GenericProcess
+
+
+class ProcessPool(object):
+    """
+    Pool of running processes waiting to be reused. Processes are stored with a key describing
+    how they were started and handed out only for an identical key.
+    """
+    def __init__(self, max_idle=4, logger=None, stop_timeout=5):
+        """
+        :param max_idle: Maximum amount of idle processes. The process idle longest is stopped
+        when the pool is full.
+        :param logger: logging.Logger
+        :param stop_timeout: Seconds processes are given to exit when they are stopped
+        """
+        self.max_idle = max_idle
+        self.logger = logger
+        self.stop_timeout = stop_timeout
+        self._idle = deque()
+        self._lock = Lock()
+        self._closed = False
+        self._stats = {"hits": 0, "misses": 0, "released": 0, "evicted": 0}
+
+    def __len__(self):
+        return len(self._idle)
+
+    def acquire(self, key):
+        """
+        Take an idle process started with key from the pool. Output the process has written
+        while idle is discarded.
+
+        :param key: hashable key of the process
+        :return: subprocess.Popen or None if no matching process is running.
+        """
+        dead = []
+        proc = None
+        with self._lock:
+            for item in list(self._idle):
+                if item[0] != key:
+                    continue
+                self._idle.remove(item)
+                if item[1].poll() is not None:
+                    dead.append(item[1])
+                    continue
+                proc = item[1]
+                break
+            self._stats["hits" if proc else "misses"] += 1
+        for dead_proc in dead:
+            self.logger.info("Discarding pooled process %d, it exited with %s",
+                             dead_proc.pid, dead_proc.returncode)
+            self._stop(dead_proc)
+        if proc:
+            self._drain(proc)
+        return proc
+
+    def release(self, key, proc):
+        """
+        Put a running process in the pool. If the pool is full, the process idle longest is
+        stopped.
+
+        :param key: hashable key of the process
+        :param proc: subprocess.Popen
+        :return: Boolean, True if the process was pooled. False if the pool is closed, in which
+        case the process is stopped.
+        """
+        evicted = []
+        with self._lock:
+            pooled = not self._closed and self.max_idle > 0
+            if pooled:
+                self._idle.append((key, proc))
+                self._stats["released"] += 1
+                while len(self._idle) > self.max_idle:
+                    evicted.append(self._idle.popleft()[1])
+                self._stats["evicted"] += len(evicted)
+        if not pooled:
+            evicted.append(proc)
+        for old in evicted:
+            self._stop(old)
+        return pooled
+
+    def discard(self, proc):
+        """
+        Stop a process that can not be reused.
+
+        :param proc: subprocess.Popen
+        :return: Nothing
+        """
+        self._stop(proc)
+
+    def close(self):
+        """
+        Stop all idle processes. Processes released after closing are stopped immediately.
+
+        :return: Nothing
+        """
+        with self._lock:
+            self._closed = True
+            procs = [item[1] for item in self._idle]
+            self._idle.clear()
+        for proc in procs:
+            self._stop(proc)
+
+    def stats(self):
+        """
+        Get statistics of the pool.
+
+        :return: dict with keys hits, misses, released, evicted and idle.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["idle"] = len(self._idle)
+        return stats
+
+    def _stop(self, proc):
+        """
+        Stop a process and close its pipes.
+
+        :param proc: subprocess.Popen
+        :return: Nothing
+        """
+        process = GenericProcess("pool", logger=self.logger)
+        process.proc = proc
+        process.ignore_return_code = True
+        try:
+            process.stop_process(timeout=self.stop_timeout)
+        except EnvironmentError as error:
+            self.logger.warning("Failed to stop pooled process %d: %s", proc.pid, error)
+        for stream in (proc.stdin, proc.stdout, proc.stderr):
+            if stream is not None:
+                try:
+                    stream.close()
+                except (IOError, OSError):
+                    pass
+
+    @staticmethod
+    def _drain(proc):
+        """
+        Read and discard everything waiting in the output pipes of a process. The pipes are
+        non-blocking.
+
+        :param proc: subprocess.Popen
+        :return: Nothing
+        """
+        for stream in (proc.stdout, proc.stderr):
+            if stream is None:
+                continue
+            while True:
+                try:
+                    if not os.read(stream.fileno(), 4096):
+                        break
+                except OSError:
+                    # EAGAIN when drained, EIO from a pseudo-terminal without a process.
+                    break
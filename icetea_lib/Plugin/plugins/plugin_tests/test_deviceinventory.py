@@ -0,0 +1,178 @@
+"""
+Copyright 2019 ARM Limited
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# pylint: disable=missing-docstring,protected-access,unused-argument
+
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import mock
+
+from icetea_lib.DeviceConnectors.Dut import DutConnectionError
+from icetea_lib.Plugin.plugins.LocalAllocator.DeviceInventory import DeviceInventory
+from icetea_lib.Plugin.plugins.LocalAllocator.DeviceInventory import InotifyWatcher
+from icetea_lib.Plugin.plugins.LocalAllocator.DeviceInventory import PollingWatcher
+from icetea_lib.Plugin.plugins.LocalAllocator.DutDetection import DutDetection, StaticMbeds
+from icetea_lib.Plugin.plugins.LocalAllocator.LocalAllocator import LocalAllocator
+from icetea_lib.ResourceProvider.ResourceRequirements import ResourceRequirements
+
+DEVICES = [{"platform_name": "K64F", "target_id": "1234", "serial_port": "/dev/ttyACM0"},
+           {"platform_name": "NRF52", "target_id": "5678", "serial_port": "/dev/ttyACM1"}]
+
+
+@mock.patch.object(DutDetection, "available_edbg_ports", return_value=[])
+@mock.patch.object(DutDetection, "is_port_usable", return_value=True)
+class DeviceInventoryTestcase(unittest.TestCase):
+    def setUp(self):
+        self.logger = logging.getLogger("test")
+        self.logger.addHandler(logging.NullHandler())
+        self.devdir = tempfile.mkdtemp()
+        self.mbeds = StaticMbeds(DEVICES)
+        self.mbeds.list_mbeds = mock.MagicMock(side_effect=self.mbeds.list_mbeds)
+        self.inventory = None
+
+    def tearDown(self):
+        if self.inventory is not None:
+            self.inventory.close()
+        shutil.rmtree(self.devdir)
+
+    def _create(self, **kwargs):
+        kwargs.setdefault("use_inotify", False)
+        self.inventory = DeviceInventory(DutDetection, self.logger, mbeds=self.mbeds,
+                                         watch_paths=[self.devdir], **kwargs)
+        return self.inventory
+
+    def _touch(self, name):
+        open(os.path.join(self.devdir, name), "w").close()
+
+    def test_static_mbeds(self, mock_usable, mock_edbg):
+        devices = DutDetection(mbeds=StaticMbeds(DEVICES)).get_available_devices()
+        self.assertListEqual([dev["target_id"] for dev in devices], ["1234", "5678"])
+        self.assertEqual(devices[0]["state"], "unknown")
+        self.assertNotIn("state", DEVICES[0])
+
+    def test_cached_until_change(self, mock_usable, mock_edbg):
+        inventory = self._create()
+        devices = inventory.get_available_devices()
+        devices[0]["state"] = "allocated"
+        self.assertEqual(inventory.get_available_devices()[0]["state"], "unknown")
+        self.assertEqual(self.mbeds.list_mbeds.call_count, 1)
+        self._touch("ttyACM2")
+        inventory.get_available_devices()
+        self.assertEqual(self.mbeds.list_mbeds.call_count, 2)
+        self.assertDictEqual(inventory.stats(), {"queries": 3, "scans": 2, "port_checks": 0,
+                                                 "port_hits": 0})
+
+    def test_max_age(self, mock_usable, mock_edbg):
+        inventory = self._create(max_age=0)
+        inventory.get_available_devices()
+        inventory.get_available_devices()
+        self.assertEqual(self.mbeds.list_mbeds.call_count, 2)
+
+    @unittest.skipIf(not sys.platform.startswith("linux"), "inotify is only available on Linux")
+    def test_inotify(self, mock_usable, mock_edbg):
+        inventory = self._create(use_inotify=True)
+        self.assertIsInstance(inventory._watcher, InotifyWatcher)
+        inventory.get_available_devices()
+        inventory.get_available_devices()
+        self.assertEqual(self.mbeds.list_mbeds.call_count, 1)
+        os.mkdir(os.path.join(self.devdir, "serial"))
+        self.assertSetEqual(inventory._watcher.changes(), set(["serial"]))
+        os.rmdir(os.path.join(self.devdir, "serial"))
+        inventory.get_available_devices()
+        self.assertEqual(self.mbeds.list_mbeds.call_count, 2)
+
+    def test_polling_watcher(self, mock_usable, mock_edbg):
+        watcher = PollingWatcher([self.devdir, os.path.join(self.devdir, "by-id")])
+        self.assertSetEqual(watcher.changes(), set())
+        self._touch("ttyACM0")
+        os.mkdir(os.path.join(self.devdir, "by-id"))
+        self.assertSetEqual(watcher.changes(), set(["ttyACM0", "by-id"]))
+        self.assertSetEqual(watcher.changes(), set())
+
+    def test_port_health(self, mock_usable, mock_edbg):
+        inventory = self._create()
+        port = os.path.join(self.devdir, "ttyACM0")
+        self._touch("ttyACM0")
+        inventory.get_available_devices()
+        self.assertTrue(inventory.is_port_usable(port))
+        self.assertTrue(inventory.is_port_usable(port))
+        self.assertEqual(mock_usable.call_count, 1)
+
+        # Device was plugged in again
+        os.remove(port)
+        inventory.get_available_devices()
+        mock_usable.return_value = False
+        self.assertFalse(inventory.is_port_usable(port))
+        self.assertFalse(inventory.is_port_usable(port))
+        self.assertEqual(mock_usable.call_count, 3)
+        self.assertDictEqual(inventory.port_health(), {port: 2})
+
+    def test_port_checked_again(self, mock_usable, mock_edbg):
+        inventory = self._create()
+        inventory.get_available_devices()
+        self.assertTrue(inventory.is_port_usable("/dev/ttyACM0"))
+        inventory.mark_port_failed("/dev/ttyACM0")
+        self.assertTrue(inventory.is_port_usable("/dev/ttyACM0"))
+        self.assertEqual(mock_usable.call_count, 2)
+
+        # Cached devices expired
+        inventory.max_age = 0
+        inventory.get_available_devices()
+        self.assertTrue(inventory.is_port_usable("/dev/ttyACM0"))
+        self.assertEqual(mock_usable.call_count, 3)
+
+    def test_allocator_connection_failed(self, mock_usable, mock_edbg):
+        alloc = LocalAllocator(logger=self.logger, allocator_cfg={
+            "devices": DEVICES, "inventory_watch_paths": [self.devdir]})
+        resources = mock.MagicMock()
+        resources.get_dut_configuration.side_effect = lambda: [
+            ResourceRequirements({"type": "hardware", "platform_name": "K64F"})]
+        alloc_list = alloc.allocate(resources)
+        dut = mock.MagicMock()
+        dut.comport = "/dev/ttyACM0"
+        dut.open_dut.side_effect = DutConnectionError("Busy")
+        del dut.command
+        alloc_list.set_logger(self.logger)
+        with self.assertRaises(DutConnectionError):
+            alloc_list.open_dut_connection(dut)
+        self.assertDictEqual(alloc.inventory.port_health(), {"/dev/ttyACM0": 1})
+        alloc.allocate(resources)
+        self.assertEqual(mock_usable.call_count, 2)
+        alloc.cleanup()
+
+    def test_allocator_devices_from_config(self, mock_usable, mock_edbg):
+        alloc = LocalAllocator(logger=self.logger, allocator_cfg={
+            "devices": DEVICES, "inventory_watch_paths": [self.devdir]})
+        for _ in range(2):
+            duts = [ResourceRequirements({"type": "hardware", "platform_name": "NRF52"}),
+                    ResourceRequirements({"type": "hardware"})]
+            resources = mock.MagicMock()
+            resources.get_dut_configuration.return_value = duts
+            self.assertEqual(len(alloc.allocate(resources)), 2)
+            self.assertEqual(duts[0].get("allocated")["target_id"], "5678")
+            self.assertEqual(duts[1].get("allocated")["target_id"], "1234")
+        self.assertEqual(mock_usable.call_count, 2)
+        self.assertEqual(alloc.inventory.stats()["scans"], 1)
+        alloc.cleanup()
+        self.assertIsNone(alloc.inventory)
+
+
+if __name__ == '__main__':
+    unittest.main()
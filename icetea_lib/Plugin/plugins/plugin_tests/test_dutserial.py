@@ -15,12 +15,13 @@ limitations under the License.
 
 # pylint: disable=unused-argument,invalid-name,missing-docstring,no-self-use
 
+import time
 import unittest
 import mock
 from serial import SerialException
 
 from icetea_lib.Plugin.plugins.LocalAllocator.DutSerial import DutSerial
-from icetea_lib.DeviceConnectors.Dut import DutConnectionError
+from icetea_lib.DeviceConnectors.Dut import Dut, DutConnectionError
 from icetea_lib.DeviceConnectors.DutInformation import DutInformation
 
 
@@ -134,10 +135,36 @@ class DutSerialTestcase(unittest.TestCase):
         ds.ch_mode = True
         ds.ch_mode_chunk_size = 2
         ds.writeline("data")
+        # Chunks are written by the writer thread of the port.
+        self.assertTrue(ds.flush_writes(timeout=5))
         mock_port.write.assert_has_calls([mock.call("da".encode()), mock.call("ta".encode()),
                                           mock.call("\n".encode())])
+        with mock.patch.object(ds, "_dut_died") as mock_died:
+            ds.writeline("data")
+            ds.flush_writes(timeout=5)
+            mock_died.assert_called_once()
         with self.assertRaises(RuntimeError):
             ds.writeline("data")
+        ds.close_connection()
+
+    def test_chunked_writes_do_not_block(self, mock_logger):
+        ds = DutSerial()
+        ds.port = mock.MagicMock()
+        ds.ch_mode = True
+        ds.ch_mode_chunk_size = 4
+        ds.ch_mode_ch_delay = 0.05
+        start = time.time()
+        ds.writelines(["line1", "line2"])
+        self.assertLess(time.time() - start, 0.05)
+        self.assertGreater(ds.write_queue_depth, 0)
+        self.assertTrue(ds.flush_writes(timeout=5))
+        # Four chunks, paced 0.05 seconds apart.
+        self.assertGreaterEqual(time.time() - start, 0.14)
+        self.assertEqual(ds.write_queue_depth, 0)
+        written = b"".join(call[0][0] for call in ds.port.write.call_args_list)
+        self.assertEqual(written, b"line1\nline2\n")
+        self.assertTrue(all(len(call[0][0]) <= 4 for call in ds.port.write.call_args_list))
+        ds.close_connection()
 
     def test_readline(self, mock_logger):
         ds = DutSerial()
@@ -146,6 +173,21 @@ class DutSerialTestcase(unittest.TestCase):
         self.assertEqual(read, "test1")
         self.assertIsNone(ds.readline())
 
+    def test_read_error(self, mock_logger):
+        ds = DutSerial()
+        ds.port = mock.MagicMock()
+        ds.port.readlines = mock.MagicMock(side_effect=[[b"line1"],
+                                                        SerialException("device disconnected")])
+        with mock.patch.object(Dut, "process_received") as mocked_process:
+            ds.run()
+        self.assertEqual(mocked_process.call_count, 2)
+        self.assertFalse(ds.keep_reading)
+        self.assertEqual(ds.readline(), "line1")
+        with self.assertRaises(RuntimeError):
+            ds.readline()
+        ds._dut_died()
+        self.assertEqual(ds.death_reason, "device disconnected")
+
     def test_peek(self, mock_logger):
         ds = DutSerial()
         mocked_port = mock.MagicMock()
@@ -0,0 +1,190 @@
+"""
+Copyright 2019 ARM Limited
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# pylint: disable=missing-docstring,protected-access,unused-argument
+
+import socket
+import sys
+import time
+import unittest
+from threading import Thread
+
+import mock
+
+from icetea_lib.DeviceConnectors.Dut import DutConnectionError
+from icetea_lib.Plugin.plugins.LocalAllocator.DutTcp import DutTcp, parse_address
+
+
+class EchoServer(object):
+    """
+    Echoes received data back. Closing the connection of a client makes it reconnect.
+    """
+    def __init__(self):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind(("127.0.0.1", 0))
+        self.server.listen(5)
+        self.address = "127.0.0.1:%d" % self.server.getsockname()[1]
+        self.connections = []
+        self.thread = Thread(target=self._accept)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except socket.error:
+                return
+            self.connections.append(conn)
+            thread = Thread(target=self._echo, args=(conn, ))
+            thread.daemon = True
+            thread.start()
+
+    @staticmethod
+    def _echo(conn):
+        try:
+            while True:
+                data = conn.recv(65536)
+                if not data:
+                    break
+                conn.sendall(data)
+        except socket.error:
+            pass
+        conn.close()
+
+    def drop(self):
+        for conn in self.connections:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass  # Client closed the connection
+        self.connections = []
+
+    def close(self):
+        self.drop()
+        try:
+            # Wakes up the accept thread, closing alone leaves the socket listening.
+            self.server.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass
+        self.server.close()
+
+
+def read_lines(dut, count, timeout=10):
+    lines = []
+    end = time.time() + timeout
+    while len(lines) < count and time.time() < end:
+        line = dut.readline()
+        if line is None:
+            time.sleep(0.001)
+        else:
+            lines.append(line)
+    return lines
+
+
+@unittest.skipIf(sys.platform == "win32", "TCP duts are not supported on Windows")
+@mock.patch("icetea_lib.DeviceConnectors.Dut.Dut.process_received")
+@mock.patch("icetea_lib.DeviceConnectors.Dut.LogManager")
+class DutTcpTestcase(unittest.TestCase):
+    def setUp(self):
+        self.server = EchoServer()
+        self.dut = None
+
+    def tearDown(self):
+        if self.dut is not None:
+            self.dut.close_connection()
+        self.server.close()
+
+    def _open(self, **application):
+        self.dut = DutTcp(address=self.server.address,
+                          config={"application": application})
+        self.dut.open_connection()
+        return self.dut
+
+    def test_parse_address(self, mock_log, mock_received):
+        self.assertEqual(parse_address("localhost:3000"), ("localhost", 3000))
+        self.assertEqual(parse_address("[::1]:3000"), ("::1", 3000))
+        for address in ("localhost", "localhost:port", ":3000", None):
+            with self.assertRaises(ValueError):
+                parse_address(address)
+
+    def test_connect_fails(self, mock_log, mock_received):
+        address = self.server.address
+        self.server.close()
+        dut = DutTcp(address=address, config={"application": {"tcp_connect_timeout": 1}})
+        with self.assertRaises(DutConnectionError):
+            dut.open_connection()
+
+    def test_lines_buffered_between_reads(self, mock_log, mock_received):
+        dut = self._open(tcp_keepalive=5)
+        self.assertEqual(dut.port.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY), 1)
+        self.assertEqual(dut.port.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE), 1)
+        dut.writelines(["first", "second", "third"])
+        self.assertListEqual(read_lines(dut, 3), ["first", "second", "third"])
+        self.assertIsNone(dut.readline())
+
+    def test_echo_throughput(self, mock_log, mock_received):
+        dut = self._open()
+        count = 20000
+        lines = ["line %d %s" % (index, "x" * 40) for index in range(count)]
+        start = time.time()
+        for index in range(0, count, 100):
+            dut.writelines(lines[index:index + 100])
+        received = read_lines(dut, count, timeout=30)
+        duration = time.time() - start
+        self.assertListEqual(received, lines)
+        self.assertGreater(count / duration, 1000)
+
+    def test_slip_frames(self, mock_log, mock_received):
+        dut = self._open(framing="slip")
+        payloads = [b"\x00\xc0\xdb binary", b"\n\r text \x1b[0m"]
+        for payload in payloads:
+            dut.write_raw(dut._get_frame_codec().encode(payload))
+        self.assertListEqual(read_lines(dut, 2), payloads)
+
+    def test_connection_lost(self, mock_log, mock_received):
+        dut = self._open()
+        self.server.drop()
+        with self.assertRaises(RuntimeError):
+            read_lines(dut, 1)
+        self.assertIn("127.0.0.1", dut._get_death_reason())
+
+    def test_reconnect(self, mock_log, mock_received):
+        dut = self._open(tcp_reconnect=3, tcp_reconnect_delay=0.5)
+        self.server.drop()
+        self.assertListEqual(read_lines(dut, 1, timeout=0.2), [])
+        self.assertIsNotNone(dut._reconnect_thread)
+        # Written while reconnecting and sent when the connection is back.
+        dut.writeline("after reconnect")
+        self.assertListEqual(read_lines(dut, 1), ["after reconnect"])
+        self.assertEqual(dut.reconnects, 1)
+
+    def test_close_while_reconnecting(self, mock_log, mock_received):
+        dut = self._open(tcp_reconnect=3, tcp_reconnect_delay=5)
+        self.server.drop()
+        read_lines(dut, 1, timeout=0.2)
+        self.assertIsNotNone(dut._reconnect_thread)
+        mock_received.reset_mock()
+        dut.read_error = None
+        start = time.time()
+        dut.close_connection()
+        self.assertLess(time.time() - start, 1)
+        self.assertIsNone(dut._reconnect_thread)
+        self.assertIsNone(dut.read_error)
+        mock_received.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+"""
+Copyright 2019 ARM Limited
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# pylint: disable=missing-docstring,unused-argument
+
+import os
+import shutil
+import tempfile
+import unittest
+from threading import Thread
+
+import mock
+
+from icetea_lib.Plugin.plugins.LocalAllocator.DutMbed import DutMbed
+from icetea_lib.Plugin.plugins.LocalAllocator.FlashState import FlashStateStore
+
+
+class FlashStateStoreTestcase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "state", "flash_state.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_record_and_invalidate(self):
+        store = FlashStateStore(self.path)
+        self.assertIsNone(store.get("1234"))
+        store.record("1234", "abc")
+        record = FlashStateStore(self.path).get("1234")
+        self.assertEqual(record["sha1"], "abc")
+        self.assertGreater(record["timestamp"], 0)
+        store.invalidate("1234")
+        self.assertIsNone(store.get("1234"))
+
+    def test_corrupted_file(self):
+        store = FlashStateStore(self.path)
+        store.record("1234", "abc")
+        with open(self.path, "w") as state_file:
+            state_file.write("{not json")
+        self.assertIsNone(store.get("1234"))
+        store.record("5678", "def")
+        self.assertEqual(store.get("5678")["sha1"], "def")
+
+    def test_concurrent_updates(self):
+        def record(index):
+            store = FlashStateStore(self.path)
+            for count in range(20):
+                store.record("%d_%d" % (index, count), "sha%d" % count)
+        threads = [Thread(target=record, args=(index, )) for index in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        store = FlashStateStore(self.path)
+        for index in range(6):
+            self.assertEqual(store.get("%d_19" % index)["sha1"], "sha19")
+        self.assertListEqual(sorted(os.listdir(os.path.dirname(self.path))),
+                             ["flash_state.json", "flash_state.json.lock"])
+
+
+@mock.patch("icetea_lib.DeviceConnectors.Dut.LogManager")
+@mock.patch("icetea_lib.Plugin.plugins.LocalAllocator.DutMbed.get_external_logger")
+@mock.patch("icetea_lib.Plugin.plugins.LocalAllocator.DutMbed.Flash")
+@mock.patch("icetea_lib.Plugin.plugins.LocalAllocator.DutMbed.Build")
+class DutMbedFlashStateTestcase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.mount_point = os.path.join(self.tmpdir, "MBED")
+        os.mkdir(self.mount_point)
+        self.params = mock.MagicMock(flash_state_db=os.path.join(self.tmpdir, "state.json"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _flash(self, mock_build, mock_flasher, sha1, retcode=0):
+        mock_build.init.return_value = mock.MagicMock(sha1=sha1)
+        mock_flasher.return_value.flash.return_value = retcode
+        # A new dut for every run, nothing is remembered in memory.
+        dut = DutMbed(port="test", params=self.params,
+                      config={"allocated": {"target_id": "1234",
+                                            "mount_point": self.mount_point},
+                              "application": {}})
+        dut.dutinformation.build_binary_sha1 = None
+        return dut.flash("image.bin")
+
+    def test_flash_skipped_in_next_run(self, mock_build, mock_flasher, mock_logger, mock_log):
+        self.assertTrue(self._flash(mock_build, mock_flasher, "abc"))
+        self.assertTrue(self._flash(mock_build, mock_flasher, "abc"))
+        self.assertEqual(mock_flasher.return_value.flash.call_count, 1)
+        self.assertTrue(self._flash(mock_build, mock_flasher, "def"))
+        self.assertEqual(mock_flasher.return_value.flash.call_count, 2)
+
+    def test_failed_flash_invalidates(self, mock_build, mock_flasher, mock_logger, mock_log):
+        self.assertTrue(self._flash(mock_build, mock_flasher, "abc"))
+        self.assertFalse(self._flash(mock_build, mock_flasher, "def", retcode=1))
+        self.assertIsNone(FlashStateStore(self.params.flash_state_db).get("1234"))
+        self.assertTrue(self._flash(mock_build, mock_flasher, "abc"))
+        self.assertEqual(mock_flasher.return_value.flash.call_count, 3)
+
+    def test_fail_file_invalidates(self, mock_build, mock_flasher, mock_logger, mock_log):
+        self.assertTrue(self._flash(mock_build, mock_flasher, "abc"))
+        open(os.path.join(self.mount_point, "FAIL.TXT"), "w").close()
+        self.assertTrue(self._flash(mock_build, mock_flasher, "abc"))
+        self.assertEqual(mock_flasher.return_value.flash.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -28,6 +28,8 @@ from icetea_lib.ResourceProvider.exceptions import ResourceInitError
 
 from icetea_lib.Plugin.plugins.LocalAllocator.LocalAllocator import LocalAllocator, init_process_dut
 from icetea_lib.Plugin.plugins.LocalAllocator.LocalAllocator import init_mbed_dut
+from icetea_lib.Plugin.plugins.LocalAllocator.LocalAllocator import init_tcp_dut
+from icetea_lib.Plugin.plugins.LocalAllocator.DeviceMatching import match_devices
 
 
 @mock.patch("icetea_lib.Plugin.plugins.LocalAllocator.LocalAllocator.DutDetection", create=False)
@@ -124,6 +126,26 @@ class TestVerify(unittest.TestCase):
         mfunc.get_dut_configuration.return_value = [dut]
         self.assertTrue(alloc.allocate(mfunc))
 
+    def test_internal_allocate_tcp(self, mock_logging, mock_dutdetection):
+        alloc = LocalAllocator()
+        self.assertTrue(alloc.can_allocate({"type": "tcp"}))
+        self.assertTrue(alloc._allocate(ResourceRequirements({"type": "tcp",
+                                                              "tcp_address": "localhost:3000"})))
+        with self.assertRaises(AllocationError):
+            alloc._allocate(ResourceRequirements({"type": "tcp"}))
+        mock_dutdetection.assert_not_called()
+
+    @mock.patch("icetea_lib.Plugin.plugins.LocalAllocator.LocalAllocator.DutTcp")
+    def test_init_tcp_dut(self, mock_dt, mock_logging, mock_dutdetection):
+        conf = {"tcp_address": "localhost:3000", "application": {}}
+        con_list = AllocationContextList(self.nulllogger)
+        args = mock.MagicMock()
+        init_tcp_dut(con_list, conf, 1, args)
+        mock_dt.assert_called_once_with(name="D1", address="localhost:3000", config=conf,
+                                        params=args)
+        self.assertEqual(con_list.duts, [mock_dt.return_value])
+        self.assertEqual(mock_dt.return_value.platform, "tcp")
+
     def test_internal_allocate_hardware_platform_no_devices_raises_error(self, mock_logging,
                                                                          mock_dutdetection):
         dutdetect = mock.Mock()
@@ -286,10 +308,77 @@ class TestVerify(unittest.TestCase):
         alloc = LocalAllocator()
         self.assertRaises(AllocationError, alloc.allocate, mfunc)
 
+    def test_alloc_moves_greedy_choice(self, mock_logging, mock_dutdetection):
+        # First dut can take any board, but the only K64F is needed by the second dut
+        dutdetect = mock.Mock()  # DutDetection instance mock
+        mock_dutdetection.return_value = dutdetect
+        mock_dutdetection.is_port_usable = mock.MagicMock(return_value=True)
+
+        devices = [{"state": "unknown",
+                    "platform_name": "K64F", "target_id": "1234", "serial_port": "/dev/serial1"},
+                   {"state": "unknown",
+                    "platform_name": "NRF52", "target_id": "5678", "serial_port": "/dev/serial2"}]
+        dutdetect.get_available_devices = mock.MagicMock(return_value=devices)
+
+        alloc = LocalAllocator()
+        duts = [ResourceRequirements({"type": "hardware"}),
+                ResourceRequirements({"type": "hardware", "allowed_platforms": ["K64F"]})]
+        mfunc = mock.MagicMock()
+        mfunc.get_dut_configuration = mock.MagicMock()
+        mfunc.get_dut_configuration.return_value = duts
+        self.assertEqual(len(alloc.allocate(mfunc)), 2)
+        self.assertEqual(duts[0].get("allocated")["target_id"], "5678")
+        self.assertEqual(duts[1].get("allocated")["target_id"], "1234")
+
+        devices[0]["state"] = devices[1]["state"] = "unknown"
+        duts = [ResourceRequirements({"type": "hardware", "platform_name": "K64F"}),
+                ResourceRequirements({"type": "hardware", "platform_name": "K64F"})]
+        mfunc.get_dut_configuration.return_value = duts
+        with self.assertRaises(AllocationError):
+            alloc.allocate(mfunc)
+        self.assertEqual(devices[0]["state"], "unknown")
+
+    def test_match_devices(self, mock_logging, mock_dutdetection):
+        # Every dut can take the first board of a big farm, greedy would fail the rest
+        size = 300
+        candidates = [[0, ind] for ind in range(1, size)] + [[0]]
+        assigned = match_devices(candidates)
+        self.assertEqual(assigned[-1], 0)
+        self.assertListEqual(assigned[:-1], list(range(1, size)))
+
+        unusable = set([2])
+        checked = []
+
+        def usable(dev):
+            checked.append(dev)
+            return dev not in unusable
+        assigned = match_devices([[1, 2], [2, 3], [3, 1]], usable)
+        self.assertEqual(sorted(assigned[i] for i in range(3) if assigned[i] is not None),
+                         [1, 3])
+        self.assertEqual(len(checked), len(set(checked)))
+
     def test_local_allocator_release(self, mock_logging, mock_dutdetection):
         alloc = LocalAllocator()
         alloc.release()
 
+    @mock.patch("icetea_lib.Plugin.plugins.LocalAllocator.LocalAllocator.ProcessPool")
+    def test_process_pool(self, mock_pool, mock_logging, mock_dutdetection):
+        alloc = LocalAllocator(args=mock.MagicMock(process_pool=0))
+        self.assertIsNone(alloc.process_pool)
+        alloc.cleanup()
+        alloc = LocalAllocator(args=mock.MagicMock(process_pool=3))
+        mock_pool.assert_called_once_with(3, alloc.logger)
+        alloc.cleanup()
+        mock_pool.return_value.close.assert_called_once_with()
+
+    @mock.patch("icetea_lib.Plugin.plugins.LocalAllocator.LocalAllocator.DutProcess")
+    def test_init_process_dut_pool(self, mock_dp, mock_logging, mock_dutdetection):
+        conf = {"application": {"bin": "binary"}}
+        con_list = AllocationContextList(self.nulllogger)
+        pool = mock.MagicMock()
+        init_process_dut(con_list, conf, 1, mock.MagicMock(), process_pool=pool)
+        self.assertIs(mock_dp.return_value.process_pool, pool)
+
     @mock.patch("icetea_lib.Plugin.plugins.LocalAllocator.LocalAllocator.DutConsole")
     def test_init_console_dut(self, mock_dc, mock_logging, mock_dutdetection):
         conf = {}
@@ -0,0 +1,153 @@
+"""
+Copyright 2019 ARM Limited
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# pylint: disable=missing-docstring,protected-access,unused-argument
+
+import logging
+import os
+import subprocess
+import sys
+import time
+import unittest
+
+import mock
+
+from icetea_lib.Plugin.plugins.LocalAllocator.DutProcess import DutProcess
+from icetea_lib.Plugin.plugins.LocalAllocator.ProcessPool import ProcessPool
+from icetea_lib.tools.GenericProcess import _set_nonblocking
+
+
+@unittest.skipIf(sys.platform == "win32", "Process pool is not supported on Windows")
+class ProcessPoolTestcase(unittest.TestCase):
+    def setUp(self):
+        logger = logging.getLogger("test")
+        logger.addHandler(logging.NullHandler())
+        self.pool = ProcessPool(2, logger, stop_timeout=1)
+        self.procs = []
+
+    def tearDown(self):
+        self.pool.close()
+        for proc in self.procs:
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+
+    def _start(self):
+        proc = subprocess.Popen(["cat"], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                preexec_fn=os.setsid)
+        _set_nonblocking(proc.stdout.fileno())
+        self.procs.append(proc)
+        return proc
+
+    def test_acquire_matching_key(self):
+        proc = self._start()
+        self.assertTrue(self.pool.release("a", proc))
+        self.assertIsNone(self.pool.acquire("b"))
+        self.assertIs(self.pool.acquire("a"), proc)
+        self.assertIsNone(self.pool.acquire("a"))
+        stats = self.pool.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 2)
+        self.assertEqual(stats["idle"], 0)
+
+    def test_output_drained(self):
+        proc = self._start()
+        proc.stdin.write(b"stale\n")
+        proc.stdin.flush()
+        time.sleep(0.1)
+        self.pool.release("a", proc)
+        self.assertIs(self.pool.acquire("a"), proc)
+        with self.assertRaises((IOError, OSError)):
+            os.read(proc.stdout.fileno(), 10)
+
+    def test_oldest_evicted(self):
+        procs = [self._start() for _ in range(3)]
+        for proc in procs:
+            self.pool.release("a", proc)
+        self.assertIsNotNone(procs[0].poll())
+        self.assertEqual(self.pool.stats()["evicted"], 1)
+        self.assertIs(self.pool.acquire("a"), procs[1])
+
+    def test_dead_process_discarded(self):
+        proc = self._start()
+        self.pool.release("a", proc)
+        proc.kill()
+        proc.wait()
+        self.assertIsNone(self.pool.acquire("a"))
+        self.assertEqual(len(self.pool), 0)
+
+    def test_close(self):
+        proc = self._start()
+        self.pool.release("a", proc)
+        self.pool.close()
+        self.assertIsNotNone(proc.poll())
+        proc = self._start()
+        self.assertFalse(self.pool.release("a", proc))
+        self.assertIsNotNone(proc.poll())
+
+
+@unittest.skipIf(sys.platform == "win32", "Process pool is not supported on Windows")
+@mock.patch("icetea_lib.DeviceConnectors.Dut.LogManager")
+class DutProcessPoolTestcase(unittest.TestCase):
+    def test_pool_key(self, mock_log):
+        dut = DutProcess(config={"application": {"bin": "cat"}})
+        self.assertIsNone(dut._pool_key(["cat"]))
+        dut.process_pool = mock.MagicMock()
+        self.assertEqual(dut._pool_key(["cat"]), (("cat", ), None, False))
+        dut.use_gdb()
+        self.assertIsNone(dut._pool_key(["cat"]))
+
+    def test_release_and_reuse(self, mock_log):
+        pool = mock.MagicMock()
+        proc = mock.MagicMock(pid=1)
+        proc.poll.return_value = None
+        dut = DutProcess(config={"application": {"bin": "cat", "pool_health_cmd": "ping"}})
+        dut.process_pool = pool
+        dut.cmd = ["cat"]
+        dut.cmd_arr = ["cat"]
+        dut.proc = proc
+        with mock.patch.object(dut, "stop_process") as mock_stop:
+            dut.close_connection()
+            mock_stop.assert_not_called()
+        pool.release.assert_called_once_with((("cat", ), None, False), proc)
+        self.assertIsNone(dut.proc)
+
+        pool.acquire.return_value = proc
+        with mock.patch.object(dut, "_start_readers"), \
+                mock.patch.object(dut, "execute_command") as mock_execute:
+            mock_execute.return_value = mock.MagicMock(retcode=0)
+            self.assertTrue(dut._open_pooled(None))
+            mock_execute.assert_called_once_with("ping")
+            self.assertIs(dut.proc, proc)
+
+            mock_execute.return_value = mock.MagicMock(retcode=1)
+            self.assertFalse(dut._open_pooled(None))
+            pool.discard.assert_called_once_with(proc)
+
+    def test_dead_process_not_released(self, mock_log):
+        pool = mock.MagicMock()
+        dut = DutProcess(config={"application": {"bin": "cat"}})
+        dut.process_pool = pool
+        dut.cmd_arr = ["cat"]
+        dut.proc = mock.MagicMock(pid=1)
+        dut.died = True
+        with mock.patch.object(dut, "stop_process") as mock_stop:
+            dut.close_connection()
+            mock_stop.assert_called_once()
+        pool.release.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+"""
+Copyright 2019 ARM Limited
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+DutSession module. Contains DutSession, which keeps the duts of a test case open for the next
+test case with the same resource requirements.
+"""
+
+import json
+
+
+class DutSession(object):
+    """
+    Holds the open duts of the previous test case. The duts are handed to the next test case
+    if its resource requirements are identical, otherwise they are closed and released before
+    new duts are allocated.
+    """
+    def __init__(self, logger, release=None):
+        """
+        :param logger: logging.Logger
+        :param release: callable, called with each dut after it has been closed to release it
+        to the allocator.
+        """
+        self.logger = logger
+        self._release = release
+        self._parked = None  # (key, allocations, duts)
+        self._stats = {"hits": 0, "misses": 0, "parked": 0}
+
+    @staticmethod
+    def get_key(resource_configuration):
+        """
+        Get the session key of resolved resource requirements.
+
+        :param resource_configuration: ResourceConfig
+        :return: str
+        """
+        requirements = [conf.get_requirements()
+                        for conf in resource_configuration.get_dut_configuration()]
+        return json.dumps(requirements, sort_keys=True, default=str)
+
+    def park(self, key, allocations, duts):
+        """
+        Keep open duts for the next test case. Duts parked earlier are closed.
+
+        :param key: session key of the requirements the duts were allocated with
+        :param allocations: AllocationContextList of the duts
+        :param duts: list of Duts
+        :return: Nothing
+        """
+        self.close()
+        self._parked = (key, allocations, duts)
+        self._stats["parked"] += 1
+        self.logger.debug("Keeping %d duts open for the next test case", len(duts))
+
+    def take(self, key):
+        """
+        Take the parked duts into use if they were allocated with key. Parked duts that don't
+        match are closed.
+
+        :param key: session key of the requirements of the test case
+        :return: tuple (AllocationContextList, list of Duts), or None if there are no
+        matching duts.
+        """
+        parked = self._parked
+        if parked is not None and parked[0] == key:
+            self._parked = None
+            self._stats["hits"] += 1
+            return parked[1], parked[2]
+        self._stats["misses"] += 1
+        self.close()
+        return None
+
+    def close_duts(self, duts):
+        """
+        Close and release duts.
+
+        :param duts: list of Duts
+        :return: Nothing
+        """
+        for dut in duts:
+            try:
+                dut.close_dut()
+                dut.close_connection()
+            except Exception:  # pylint: disable=broad-except
+                self.logger.error("Exception while closing dut %s!", dut.dut_name,
+                                  exc_info=True)
+            if self._release is not None:
+                self._release(dut)
+
+    def close(self):
+        """
+        Close and release the parked duts.
+
+        :return: Nothing
+        """
+        parked, self._parked = self._parked, None
+        if parked is not None:
+            self.logger.debug("Closing %d duts of the previous test case", len(parked[2]))
+            self.close_duts(parked[2])
+
+    def stats(self):
+        """
+        Get statistics of the session.
+
+        :return: dict with keys hits, misses and parked.
+        """
+        return dict(self._stats)
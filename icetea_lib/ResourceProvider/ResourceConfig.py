@@ -262,7 +262,8 @@ class ResourceConfig(object):  # pylint: disable=too-many-instance-attributes
         :return: Nothing, adds results to self._hardware_count
         """
         length = len([d for d in self._dut_requirements if d.get("type") in ["hardware",
-                                                                             "serial", "mbed"]])
+                                                                             "serial", "mbed",
+                                                                             "tcp"]])
         self._hardware_count = length
 
     def count_process(self):
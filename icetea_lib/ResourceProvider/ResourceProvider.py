@@ -20,6 +20,7 @@ import json
 import six
 
 import icetea_lib.LogManager as LogManager
+from icetea_lib.ResourceProvider.DutSession import DutSession
 from icetea_lib.ResourceProvider.exceptions import ResourceInitError
 from icetea_lib.ResourceProvider.Allocators.exceptions import AllocationError
 from icetea_lib.tools.tools import Singleton
@@ -43,6 +44,10 @@ class ResourceProvider(object):
         no_file = False if self.args.list or self.args.listsuites else True
         self.logger = LogManager.get_resourceprovider_logger("ResourceProvider", "RSP", no_file)
         self._pluginmanager = None
+        # Duts kept open between test cases, None if --dut_session is not used.
+        self.dut_session = None
+        if getattr(self.args, "dut_session", False) is True:
+            self.dut_session = DutSession(self.logger, self._release_dut)
 
     def set_pluginmanager(self, pluginmanager):
         """
@@ -102,10 +107,27 @@ class ResourceProvider(object):
         :return: Nothing
         """
         self.logger.debug("Cleaning up ResourceProvider.")
+        if self.dut_session is not None:
+            self.logger.info("Dut session statistics: %s", self.dut_session.stats())
+            self.dut_session.close()
         if self.allocator:
             self.logger.debug("Cleaning up allocator.")
             self.allocator.cleanup()
 
+    def _release_dut(self, dut):
+        """
+        Release a closed dut of the dut session to the allocator.
+
+        :param dut: Dut
+        :return: Nothing
+        """
+        if not self.allocator or getattr(self.allocator, "share_allocations", False):
+            return
+        try:
+            self.allocator.release(dut=dut)
+        except Exception as error:  # pylint: disable=broad-except
+            self.logger.error("Failed to release dut %s: %s", dut.index, error)
+
     def __get_allocator(self):
         """
         Internal method for determining which allocator is needed for this run.
@@ -16,6 +16,8 @@ limitations under the License.
 """
 
 import re
+from collections import OrderedDict, deque
+from threading import Lock
 # Python version compatibility fix
 try:
     basestring
@@ -64,19 +66,24 @@ def find_next(lines, find_str, start_index):
 
 def verify_message(lines, expected_response):
     """
-    Looks for expectedResponse in lines.
+    Looks for expectedResponse in lines. A list is searched in order, all items of a set are
+    searched in any order. If lines has a TraceSearcher (like dut traces), it is used to search
+    only the lines received after the previous search.
 
     :param lines: a list of strings to look through
-    :param expected_response: list or str to look for in lines.
+    :param expected_response: list, set or str to look for in lines.
     :return: True or False.
     :raises: TypeError if expectedResponse was not list or str.
     LookUpError through FindNext function.
     """
+    searcher = getattr(lines, "searcher", None)
+    if isinstance(searcher, TraceSearcher):
+        return searcher.verify(expected_response)
     position = 0
     if isinstance(expected_response, basestring):
         expected_response = [expected_response]
-    if isinstance(expected_response, set):
-        expected_response = list(expected_response)
+    if isinstance(expected_response, (set, frozenset)):
+        return TraceSearcher(lines).verify(expected_response)
     if not isinstance(expected_response, list):
         raise TypeError("verify_message: expectedResponse must be list, set or string")
     for message in expected_response:
@@ -90,3 +97,234 @@ def verify_message(lines, expected_response):
         except LookupError:
             return False
     return True
+
+
+def _is_literal(message):
+    """
+    Check if message matches the same lines as a regular expression and as a substring.
+
+    :param message: str
+    :return: Boolean
+    """
+    return not re.search(r"[.^$*+?{}\[\]\\|()]", message)
+
+
+class AhoCorasick(object):
+    """
+    Aho-Corasick automaton for finding several literal strings from a text in a single pass.
+    """
+    def __init__(self, words):
+        self.words = list(words)
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for index, word in enumerate(self.words):
+            state = 0
+            for char in word:
+                if char not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                    self._goto[state][char] = len(self._goto) - 1
+                state = self._goto[state][char]
+            self._out[state].append(index)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def search(self, text):
+        """
+        Find words that appear in text.
+
+        :param text: str
+        :return: set of indexes of found words
+        """
+        found = set()
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                found.update(out[state])
+        # Empty words are found also in empty text.
+        found.update(out[0])
+        return found
+
+
+class TraceSearcher(object):
+    """
+    Searches lines that keep growing, like dut traces. Compiled patterns are cached and every
+    search keeps a cursor, so repeating the same search only scans lines received after the
+    previous one. Results are the same as with find_next and verify_message.
+    """
+    max_searches = 256  # Amount of searches whose cursors are kept
+    aho_corasick_limit = 8  # Literal sets at least this big are searched with AhoCorasick
+
+    def __init__(self, lines):
+        """
+        :param lines: list or TraceStore
+        """
+        self.lines = lines
+        self._patterns = {}
+        self._searches = OrderedDict()
+        self._seen = 0
+        self._clears = 0
+        self._lock = Lock()
+
+    def _pattern(self, message):
+        """
+        Get compiled pattern for message.
+
+        :param message: str
+        :return: compiled regular expression
+        """
+        pattern = self._patterns.get(message)
+        if pattern is None:
+            pattern = re.compile(message)
+            self._patterns[message] = pattern
+        return pattern
+
+    def _matches(self, message, line):
+        """
+        Check if line matches message the same way as find_next.
+
+        :param message: str
+        :param line: str
+        :return: Boolean
+        """
+        return bool(self._pattern(message).search(line)) or message in line
+
+    def _check_cleared(self):
+        """
+        Forget all search states if lines have been cleared since the previous search.
+
+        :return: Nothing
+        """
+        dropped = getattr(self.lines, "dropped", 0)
+        clears = getattr(self.lines, "clears", 0)
+        total = dropped + len(self.lines)
+        if total < self._seen or clears != self._clears:
+            self._searches.clear()
+        self._seen = total
+        self._clears = clears
+
+    def _read_from(self, position):
+        """
+        Read lines starting from absolute position. Position counts also the lines dropped from
+        a TraceStore.
+
+        :param position: int
+        :return: tuple (absolute position of first returned line, list of lines)
+        """
+        dropped = getattr(self.lines, "dropped", 0)
+        start = max(position, dropped)
+        return start, list(self.lines[start - dropped:])
+
+    def _get_state(self, key, state):
+        """
+        Get search state for key, or store state as the initial state.
+
+        :param key: hashable search key
+        :param state: initial state
+        :return: state
+        """
+        if key in self._searches:
+            state = self._searches.pop(key)
+        elif len(self._searches) >= self.max_searches:
+            self._searches.popitem(last=False)
+        self._searches[key] = state
+        return state
+
+    def verify(self, expected):
+        """
+        Verify that expected lines are found, like verify_message.
+
+        :param expected: str, list of str and Invert, or set of str
+        :return: Boolean
+        :raises: TypeError if expected is not str, list or set.
+        """
+        if isinstance(expected, basestring):
+            expected = [expected]
+        if isinstance(expected, (set, frozenset)):
+            if not all(isinstance(message, basestring) for message in expected):
+                return False
+            with self._lock:
+                self._check_cleared()
+                return self._verify_set(expected)
+        if not isinstance(expected, list):
+            raise TypeError("verify_message: expectedResponse must be list, set or string")
+        if not all(isinstance(message, (basestring, Invert)) for message in expected):
+            return False
+        with self._lock:
+            self._check_cleared()
+            return self._verify_list(expected)
+
+    def _verify_list(self, expected):
+        """
+        Verify that messages are found in order. An inverted message must not be found after
+        the preceding messages.
+
+        :param expected: list of str and Invert
+        :return: Boolean
+        """
+        key = ("list", tuple((isinstance(msg, Invert), str(msg)) for msg in expected))
+        # state: [index of message searched, position to continue from, inverted message found]
+        state = self._get_state(key, [0, 0, False])
+        position, lines = self._read_from(state[1])
+        for line in lines:
+            if state[0] >= len(expected) or state[2]:
+                break
+            message = expected[state[0]]
+            if isinstance(message, Invert):
+                state[2] = self._matches(str(message), line)
+            elif self._matches(message, line):
+                state[0] += 1
+            position += 1
+        state[1] = position
+        if state[0] >= len(expected):
+            return True
+        if state[2] or not isinstance(expected[state[0]], Invert):
+            return False
+        # Messages after an inverted one are searched after the end of lines, so only
+        # inverted messages can succeed there.
+        return all(isinstance(message, Invert) for message in expected[state[0]:])
+
+    def _verify_set(self, expected):
+        """
+        Verify that all messages are found, in any order.
+
+        :param expected: set of str
+        :return: Boolean
+        """
+        messages = sorted(expected)
+        key = ("set", tuple(messages))
+        # state: [indexes of found messages, position to continue from, automaton]
+        state = self._get_state(key, [set(), 0, None])
+        literals = [i for i, msg in enumerate(messages) if _is_literal(msg)]
+        if len(literals) >= self.aho_corasick_limit and state[2] is None:
+            state[2] = AhoCorasick([messages[i] for i in literals])
+        automaton = state[2]
+        others = [i for i in range(len(messages)) if automaton is None or i not in literals]
+        position, lines = self._read_from(state[1])
+        found = state[0]
+        for line in lines:
+            if len(found) == len(messages):
+                break
+            if automaton is not None:
+                found.update(literals[i] for i in automaton.search(line))
+            for i in others:
+                if i not in found and self._matches(messages[i], line):
+                    found.add(i)
+            position += 1
+        state[1] = position
+        return len(found) == len(messages)
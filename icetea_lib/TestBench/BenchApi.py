@@ -688,6 +688,48 @@ class BenchApi(object):
                                               asynchronous,
                                               report_cmd_fail)
 
+    def execute_commands(self, commands, wait=True, timeout=50, expected_retcode=0,
+                         report_cmd_fail=True, total_timeout=None):
+        """
+        Send commands to several duts at once and wait for all responses in parallel.
+
+        :param commands: dict of dut index or nick to command, for example {1: "cmd a", 2: "cmd b"}
+        :param wait: For special cases when retcode is not wanted to wait.
+        :param timeout: Command timeout in seconds, or dict of dut index or nick to timeout.
+        :param expected_retcode: Expecting this retcode, default: 0, can be None when it is ignored.
+        :param report_cmd_fail: If True (default), exception is thrown on command execution error.
+        :param total_timeout: Timeout in seconds for all commands to complete.
+        :return: dict of dut index to CliResponse
+        """
+        return self._commands.execute_commands(commands, wait=wait, timeout=timeout,
+                                               expected_retcode=expected_retcode,
+                                               report_cmd_fail=report_cmd_fail,
+                                               total_timeout=total_timeout)
+
+    def wait_all(self, responses, timeout=None, report_cmd_fail=True):
+        """
+        Wait for several asynchronous responses, from one or more duts, at once.
+
+        :param responses: list of CliAsyncResponse returned by asynchronous commands.
+        :param timeout: Timeout in seconds for all responses, None to wait until the timeouts
+        of the commands.
+        :param report_cmd_fail: If True (default), exception is thrown on command execution error.
+        :return: list of CliResponse in the order of responses
+        """
+        return self._commands.wait_all(responses, timeout=timeout,
+                                       report_cmd_fail=report_cmd_fail)
+
+    def as_completed(self, responses, timeout=None):
+        """
+        Iterate asynchronous responses in the order they become ready.
+
+        :param responses: list of CliAsyncResponse returned by asynchronous commands.
+        :param timeout: Timeout in seconds for all responses, None to wait until the timeouts
+        of the commands.
+        :return: generator of CliAsyncResponse
+        """
+        return self._commands.as_completed(responses, timeout=timeout)
+
     def send_post_commands(self, cmds=""):
         """
         Send post commands to duts.
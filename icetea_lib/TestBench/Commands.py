@@ -20,8 +20,11 @@ import sys
 from threading import Event
 import uuid
 
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
 from icetea_lib.CliRequest import CliRequest
 from icetea_lib.CliAsyncResponse import CliAsyncResponse
+from icetea_lib.CliAsyncResponse import as_completed as responses_as_completed
 from icetea_lib.CliResponse import CliResponse
 from icetea_lib.Events.EventMatcher import EventMatcher
 from icetea_lib.Events.Generics import EventTypes
@@ -147,13 +150,198 @@ class Commands(object):
                                         report_cmd_fail=report_cmd_fail)
         return ret
 
+    def execute_commands(self, commands, wait=True, timeout=50, expected_retcode=0,
+                         report_cmd_fail=True, total_timeout=None):
+        """
+        Send commands to several duts at once and wait for all responses in parallel.
+        Commands are written to all duts before waiting for any response.
+
+        :param commands: dict of dut index or nick to command, for example {1: "cmd a", 2: "cmd b"}
+        :param wait: For special cases when retcode is not wanted to wait.
+        :param timeout: Command timeout in seconds, or dict of dut index or nick to timeout.
+        :param expected_retcode: Expecting this retcode, default: 0, can be None when it is ignored.
+        :param report_cmd_fail: If True (default), exception is thrown on command execution error.
+        The exception is raised after responses from all duts have been received.
+        :param total_timeout: Timeout in seconds for all commands to complete. Each command gets
+        at most the time remaining until the end of total_timeout when it is sent.
+        :return: dict of dut index to CliResponse
+        :raises: ValueError if dut index is invalid. TestStepFail, TestStepError and
+        TestStepTimeout if report_cmd_fail is True and any command fails.
+        """
+        if not report_cmd_fail:
+            expected_retcode = None
+        timeouts = timeout if isinstance(timeout, dict) else {}
+        timeouts = dict((self._get_dut_index(key), value) for key, value in timeouts.items())
+        deadline = None
+        if total_timeout is not None:
+            deadline = self._benchfunctions.get_time() + total_timeout
+        pending = []
+        responses = {}
+        try:
+            try:
+                for k, cmd in commands.items():
+                    k = self._get_dut_index(k)
+                    if not self._resources.is_my_dut_index(k):
+                        self._wait_for_exec_ext_dut_cmd(k, cmd)
+                        responses[k] = CliResponse()
+                        continue
+                    cmd_timeout = timeouts.get(k, 50) if isinstance(timeout, dict) else timeout
+                    if deadline is not None:
+                        # Responses are waited until their own deadlines, so limiting the
+                        # timeouts keeps all waits within total_timeout.
+                        cmd_timeout = max(0, min(cmd_timeout,
+                                                 deadline - self._benchfunctions.get_time()))
+                    dut = self._resources.get_dut(k)
+                    # Retcode is checked here when the response is available, not by the dut.
+                    req = CliRequest(cmd, timestamp=self._benchfunctions.get_time(), wait=wait,
+                                     expected_retcode=None, timeout=cmd_timeout,
+                                     asynchronous=wait, dut_index=k)
+                    req.response = dut.execute_command(req)
+                    req.expected_retcode = expected_retcode
+                    pending.append(req)
+            except Exception:
+                # Don't leave commands already sent pending on their duts.
+                self._wait_sent(pending)
+                raise
+            return self._wait_commands(pending, responses, wait, expected_retcode,
+                                       report_cmd_fail)
+        except (KeyboardInterrupt, SystemExit):
+            # shut down tc directly
+            self._logger.warning("Keyboard/SystemExit request - shut down TC")
+            self._command_fail(CliRequest(), "Aborted by user")
+
+    def _wait_sent(self, requests):
+        """
+        Wait for the responses of requests sent by execute_commands before sending the rest
+        failed. Errors of the commands are logged.
+
+        :param requests: list of CliRequest
+        :return: Nothing
+        """
+        for req in requests:
+            if not isinstance(req.response, CliAsyncResponse):
+                continue
+            try:
+                req.response.wait()
+                error = req.response.exception(0)
+            except Exception as err:  # pylint: disable=broad-except
+                error = err
+            if error is not None:
+                self._logger.error("Error from dut %s: %s", req.dut_index, error)
+
+    def _wait_commands(self, pending, responses, wait, expected_retcode, report_cmd_fail):
+        """
+        Wait for the responses of commands sent by execute_commands and check their retcodes.
+
+        :return: dict of dut index to CliResponse
+        """
+        error = None
+        for req in pending:
+            responses[req.dut_index] = req.response
+            if not wait:
+                continue
+            try:
+                req.response = self.wait_for_async_response(req.cmd, req.response)
+                if req.response is None:
+                    req.response = CliResponse()
+                responses[req.dut_index] = req.response
+                self._check_expected_retcode(expected_retcode, req)
+            except (TestStepFail, TestStepError, TestStepTimeout) as err:
+                responses[req.dut_index] = CliResponse()
+                if not report_cmd_fail:
+                    self._logger.error("Supressed error from dut %s: %s", req.dut_index, err)
+                elif error is None:
+                    error = err
+        if error is not None:
+            raise error  # pylint: disable=raising-bad-type
+        return responses
+
+    def wait_all(self, responses, timeout=None, report_cmd_fail=True):
+        """
+        Wait for several asynchronous responses, from one or more duts, at once.
+
+        :param responses: list of CliAsyncResponse returned by asynchronous commands.
+        :param timeout: Timeout in seconds for all responses, None to wait until the timeouts
+        of the commands.
+        :param report_cmd_fail: If True (default), exception is thrown on command execution error.
+        The exception is raised after all responses are ready.
+        :return: list of CliResponse in the order of responses
+        :raises: TestStepTimeout if all responses were not ready before timeout.
+        TestStepFail, TestStepError and TestStepTimeout if report_cmd_fail is True and any
+        command fails.
+        """
+        for _ in self.as_completed(responses, timeout):
+            pass
+        error = None
+        results = []
+        for async_resp in responses:
+            err = async_resp.exception(0)
+            if err is None:
+                req = async_resp.request
+                req.response = async_resp.response
+                try:
+                    self._check_expected_retcode(req.expected_retcode, req)
+                except (TestStepFail, TestStepError, TestStepTimeout) as retcode_error:
+                    err = retcode_error
+            if err is not None:
+                if not report_cmd_fail:
+                    self._logger.error("Supressed error: %s", err)
+                elif error is None:
+                    error = err
+            results.append(async_resp.response)
+        if error is not None:
+            raise error  # pylint: disable=raising-bad-type
+        return results
+
+    def as_completed(self, responses, timeout=None):
+        """
+        Iterate asynchronous responses in the order they become ready. Successful responses
+        are parsed before they are returned. Errors of the commands are not raised, use
+        result() or exception() of the response to get them.
+
+        :param responses: list of CliAsyncResponse returned by asynchronous commands.
+        :param timeout: Timeout in seconds for all responses, None to wait until the timeouts
+        of the commands.
+        :return: generator of CliAsyncResponse
+        :raises: TestStepTimeout if all responses were not ready before timeout.
+        """
+        try:
+            for async_resp in responses_as_completed(responses, timeout):
+                if async_resp.exception(0) is None:
+                    self.wait_for_async_response(async_resp.request.cmd, async_resp)
+                yield async_resp
+        except FutureTimeoutError as error:
+            self._logger.error("Responses not ready before timeout: %s", error)
+            raise TestStepTimeout("Responses not ready before timeout: {}".format(error))
+
     # private members
+    def _get_dut_index(self, k):
+        """
+        Get validated dut index.
+
+        :param k: dut index or nick
+        :return: dut index as integer
+        :raises: ValueError if index is not valid.
+        """
+        if isinstance(k, str):
+            k = self._resources.get_dut_index(k)
+        if not self._resources.is_allowed_dut_index(k):
+            self._logger.error("Invalid DUT number")
+            raise ValueError("Invalid DUT number when calling execute_command(%i)" % k)
+        return k
+
     def _send_cmd_to_all(self, cmd, wait=True, expected_retcode=0, timeout=50, asynchronous=False,
                          report_cmd_fail=True):
         """
-        Send command to all duts.
+        Send command to all duts. Synchronous commands are sent to all duts before waiting
+        for the responses.
         :return: list of CliResponses
         """
+        if not asynchronous and wait:
+            responses = self.execute_commands(
+                dict((i, cmd) for i in self._resources.dut_indexes), wait=wait, timeout=timeout,
+                expected_retcode=expected_retcode, report_cmd_fail=report_cmd_fail)
+            return [responses[i] for i in self._resources.dut_indexes]
         resps = []
         for i in self._resources.dut_indexes:
             resps.append(
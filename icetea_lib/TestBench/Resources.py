@@ -19,6 +19,7 @@ releasing Duts, handling resource configuration etc.
 """
 
 import time
+from concurrent.futures import ThreadPoolExecutor, wait as futures_wait
 
 from six import string_types
 
@@ -32,6 +33,9 @@ from icetea_lib.TestStepError import TestStepError
 from icetea_lib.build import Build
 from icetea_lib.tools.NodeEndPoint import NodeEndPoint
 
+CLOCK = getattr(time, "monotonic", time.time)
+DEFAULT_RELEASE_TIMEOUT = 15
+
 
 class ResourceFunctions(object):
     """
@@ -47,6 +51,7 @@ class ResourceFunctions(object):
         self._dutinformations = None
         self._commands = None
         self._duts = []
+        self._session_key = None  # Requirements of the duts, when they are kept open
         self._args = args
         self._logger = logger
         self._configuration = configuration
@@ -86,44 +91,97 @@ class ResourceFunctions(object):
             self._logger.debug("This TC doesn't use DUT's")
         self._starttime = time.time()
 
-    def duts_release(self):
+    def _close_dut(self, dut, end):
         """
-        Release Duts.
+        Close a dut and its connection.
 
-        :return: Nothing
+        :param dut: Dut
+        :param end: Deadline for closing, in CLOCK() time
+        :return: Seconds closing took
         """
+        start = CLOCK()
         try:
             # try to close node's by nicely by `exit` command
             # if it didn't work, kill it by OS process kill command
             # also close reading threads if any
+            dut.close_timeout = max(0, end - start)
+            dut.close_dut()
+            dut.close_connection()
+        except Exception:  # pylint: disable=broad-except
+            # We want to catch all uncaught Exceptions here.
+            self._logger.error("Exception while closing dut %s!",
+                               dut.dut_name,
+                               exc_info=True if not self._args.silent else False)
+        return CLOCK() - start
+
+    def _close_duts(self, duts, end):
+        """
+        Close duts in parallel.
+
+        :param duts: list of Duts
+        :param end: Deadline for closing, in CLOCK() time
+        :return: Nothing
+        """
+        if len(duts) == 1:
+            self._logger.debug("Dut %s closed in %.3f s", duts[0].dut_name,
+                               self._close_dut(duts[0], end))
+            return
+        executor = ThreadPoolExecutor(max_workers=min(len(duts), 32))
+        try:
+            futures = [executor.submit(self._close_dut, dut, end) for dut in duts]
+            # Killing a process after the deadline still takes a moment.
+            futures_wait(futures, timeout=max(0, end - CLOCK()) + 1)
+            for dut, future in zip(duts, futures):
+                if future.done():
+                    self._logger.debug("Dut %s closed in %.3f s", dut.dut_name, future.result())
+                else:
+                    self._logger.warning("Dut %s was not closed before the release deadline",
+                                         dut.dut_name)
+        finally:
+            executor.shutdown(wait=False)
+
+    def _release_dut(self, dut):
+        """
+        Release dut to the allocator.
+
+        :param dut: Dut
+        :return: Nothing
+        """
+        if hasattr(self._resource_provider.allocator, "share_allocations"):
+            if getattr(self._resource_provider.allocator, "share_allocations"):
+                return
+        self._logger.debug("Releasing dut {}".format(dut.index))
+        self.resource_provider.allocator.release(dut=dut)
+
+    def duts_release(self):
+        """
+        Release Duts. Duts are closed in parallel, the whole release takes at most
+        dut_release_timeout seconds.
+
+        :return: Nothing
+        """
+        if self._park_duts():
+            return
+        timeout = getattr(self._args, "dut_release_timeout", DEFAULT_RELEASE_TIMEOUT)
+        end = CLOCK() + timeout
+        try:
             self._logger.debug("Close dut connections")
-            # pylint: disable=unused-variable
-            for i, dut in self.duts_iterator():
-                try:
-                    dut.close_dut()
-                    dut.close_connection()
-                except Exception:  # pylint: disable=broad-except
-                    # We want to catch all uncaught Exceptions here.
-                    self._logger.error("Exception while closing dut %s!",
-                                       dut.dut_name,
-                                       exc_info=True if not self._args.silent else False)
-                finally:
-                    if hasattr(self._resource_provider.allocator, "share_allocations"):
-                        if getattr(self._resource_provider.allocator, "share_allocations"):
-                            pass
-                        else:
-                            self._logger.debug("Releasing dut {}".format(dut.index))
-                            self.resource_provider.allocator.release(dut=dut)
-                    else:
-                        self._logger.debug("Releasing dut {}".format(dut.index))
-                        self.resource_provider.allocator.release(dut=dut)
+            duts = [dut for _, dut in self.duts_iterator()]
+            try:
+                self._close_duts(duts, end)
+            finally:
+                for dut in duts:
+                    self._release_dut(dut)
 
             self._logger.debug("Close dut threads")
 
             # finalize dut thread
             for ind, dut in self.duts_iterator():
                 while not dut.finished():
-                    time.sleep(0.5)
+                    if CLOCK() >= end:
+                        self._logger.warning("Dut #%i did not finish", ind)
+                        break
+                    time.sleep(0.05)
                     self._logger.debug("Dut #%i is not finished yet..", ind)
         except KeyboardInterrupt:
             self._logger.debug("key interrupt")
@@ -131,6 +189,56 @@ class ResourceFunctions(object):
                 dut.kill_received = True
             self._duts_delete()
 
+    def _park_duts(self):
+        """
+        Keep the duts open for the next test case, if the dut session is in use and all duts
+        are still alive.
+
+        :return: Boolean, True if the duts were kept open.
+        """
+        key, self._session_key = self._session_key, None
+        if key is None or not self._duts:
+            return False
+        if any(dut.died or dut.finished() for dut in self._duts):
+            return False
+        self._logger.debug("Keeping dut connections open for the next test case")
+        self.resource_provider.dut_session.park(key, self._allocation_context, self._duts)
+        return True
+
+    def _resume_session(self, key):
+        """
+        Take the duts of the previous test case into use, if they were allocated with the
+        same requirements. Duts are reset with session_reset_cmds and checked with
+        session_health_cmd of their application configuration.
+
+        :param key: session key of the requirements of this test case
+        :return: Boolean, True if the duts of the previous test case are used.
+        """
+        session = self.resource_provider.dut_session
+        parked = session.take(key)
+        if parked is None:
+            return False
+        allocations, duts = parked
+        configurations = self.resource_configuration.get_dut_configuration()
+        for ind, (dut, conf) in enumerate(zip(duts, configurations)):
+            dut.prepare_reuse()
+            dut.Testcase = self._configuration.name
+            healthy = not dut.died and not dut.finished() and dut.check_health(
+                conf.get("application.session_reset_cmds"),
+                conf.get("application.session_health_cmd"))
+            if not healthy:
+                self._logger.warning("DUT[%i] failed the health check, allocating duts again",
+                                     ind)
+                session.close_duts(duts)
+                return False
+        self._allocation_context = allocations
+        allocations.set_logger(self._logger)
+        allocations.set_resconf(self.resource_configuration)
+        self._duts = duts
+        self._logger.info("Using %d open %s of the previous test case", len(duts),
+                          "dut" if len(duts) == 1 else "duts")
+        return True
+
     def get_start_time(self):
         """
         Get start time.
@@ -333,36 +441,110 @@ class ResourceFunctions(object):
 
     def _open_dut_connections(self, allocations):
         """
-        Internal helper. Registers waiting for cli initialization and handles the wait
-        as well as opens connections.
+        Internal helper. Opens connections to duts, then waits for their cli to initialize and
+        initializes the cli. Up to --parallel_init duts are handled at a time. If any dut fails,
+        all duts that are still open are closed.
+
+        :param allocations: AllocationContextList
+        :return: Nothing
+        :raises: The error of the first dut that failed.
         """
         for dut in self._duts:
             dut.init_wait_register()
+        # Starts the shared dut thread once, before duts are opened in parallel.
+        for dut in self._duts:
+            dut.start_dut_thread()
+
+        open_times = {}
+
+        def open_dut(ind, dut):
+            start = CLOCK()
+            allocations.open_dut_connection(dut)
+            open_times[ind] = CLOCK() - start
+
+        def init_dut(ind, dut):
+            start = CLOCK()
+            self._init_dut_cli(ind, dut)
+            self._logger.info("DUT[%i]: Opened in %.3f s, cli initialized in %.3f s", ind,
+                              open_times.get(ind, 0), CLOCK() - start)
+
+        failed = self._run_parallel(open_dut, list(enumerate(self._duts)))
+        if not failed:
+            failed = self._run_parallel(init_dut, list(self.duts_iterator()))
+        if failed:
+            self._logger.error("Initializing DUT[%i] failed, closing all duts", failed[0])
+            timeout = getattr(self._args, "dut_release_timeout", DEFAULT_RELEASE_TIMEOUT)
+            if not isinstance(timeout, (int, float)):
+                timeout = DEFAULT_RELEASE_TIMEOUT
+            # Duts that failed to open were already closed by the allocation context list.
+            duts = [dut for dut in self._duts if not dut.stopped]
+            if duts:
+                self._close_duts(duts, CLOCK() + timeout)
+            raise failed[1]
+
+    def _run_parallel(self, func, duts):
+        """
+        Call func for each dut, for up to --parallel_init duts at a time. After a dut fails,
+        func is not called for the remaining duts.
+
+        :param func: callable, called with the index of the dut and the dut
+        :param duts: list of tuples (index, Dut)
+        :return: tuple (index, error) of the first dut that failed, or None.
+        """
+        failed = []
+
+        def call(ind, dut):
+            if failed:
+                return
+            try:
+                func(ind, dut)
+            except Exception as error:  # pylint: disable=broad-except
+                # The traceback is lost when the error is raised again in the calling thread.
+                self._logger.debug("DUT[%i] failed: %s", ind, error, exc_info=True)
+                failed.append((ind, error))
+
+        workers = getattr(self._args, "parallel_init", 1)
+        if not isinstance(workers, int) or workers < 1:
+            workers = 1
+        workers = min(workers, len(duts))
+        if workers <= 1:
+            for ind, dut in duts:
+                call(ind, dut)
+        else:
+            executor = ThreadPoolExecutor(max_workers=workers)
+            try:
+                futures_wait([executor.submit(call, ind, dut) for ind, dut in duts])
+            finally:
+                executor.shutdown(wait=True)
+        return failed[0] if failed else None
 
-        try:
-            allocations.open_dut_connections()
-        except DutConnectionError:
-            self._logger.exception("Error while opening DUT connections!")
-            for dut in self._duts:
-                dut.close_dut()
-                dut.close_connection()
-            raise
+    def _init_dut_cli(self, ind, dut):
+        """
+        Wait for the cli of an opened dut to initialize and initialize the cli.
 
-        for ind, dut in self.duts_iterator():
-            self._logger.info("Waiting for dut %d to initialize.", ind + 1)
-            res = dut.wait_init()
-            if not res:
-                self._logger.warning("Cli initialization trigger not found. Maybe your application"
-                                     " started before we started reading? Try adding --reset"
-                                     " to your run command.")
-                raise DutConnectionError("Dut cli failed to initialize within set timeout!")
-            if self._args.sync_start:
-                self._logger.info("Synchronizing the command line interface.")
-                try:
-                    self._commands.sync_cli(dut.index)
-                except TestStepError:
-                    raise DutConnectionError("Synchronized start for dut {} failed!".format(
-                        dut.index))
+        :param ind: index of the dut
+        :param dut: Dut
+        :return: Nothing
+        :raises: DutConnectionError if the cli initialization trigger was not found or
+        synchronizing the cli failed.
+        """
+        self._logger.info("Waiting for dut %d to initialize.", ind + 1)
+        res = dut.wait_init()
+        if not res:
+            self._logger.warning("Cli initialization trigger not found. Maybe your application"
+                                 " started before we started reading? Try adding --reset"
+                                 " to your run command.")
+            raise DutConnectionError("Dut cli failed to initialize within set timeout!")
+        if self._args.sync_start:
+            self._logger.info("Synchronizing the command line interface.")
+            try:
+                self._commands.sync_cli(dut.index)
+            except TestStepError:
+                raise DutConnectionError("Synchronized start for dut {} failed!".format(
+                    dut.index))
+        dut.Testcase = self._configuration.name
+        dut.init_cli()
+        self._logger.debug("DUT[%i]: Cli initialized.", ind)
 
     def _alloc_error_helper(self):
         """
@@ -409,6 +591,14 @@ class ResourceFunctions(object):
         # Initialize command line interface
         self._logger.info("Initialize DUT's connections")
 
+        session = self.resource_provider.dut_session
+        if session is not None and not self._args.my_duts:
+            key = session.get_key(self.resource_configuration)
+            if self._resume_session(key):
+                self._session_key = key
+                return
+            self._session_key = key
+
         try:
             allocations = self.resource_provider.allocate_duts(self.resource_configuration)
         except (AllocationError, ResourceInitError):
@@ -429,11 +619,6 @@ class ResourceFunctions(object):
 
         self._open_dut_connections(allocations)
 
-        for ind, dut in self.duts_iterator():
-            dut.Testcase = self._configuration.name
-            dut.init_cli()
-            self._logger.debug("DUT[%i]: Cli initialized.", ind)
-
         for ind, dut in self.duts_iterator():
             self._logger.debug("DUT[%i]: %s", ind, dut.comport)
 
@@ -0,0 +1,234 @@
+"""
+Copyright 2019 ARM Limited
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+TraceStore module, contains the TraceStore class, which stores lines received from a dut.
+"""
+
+import os
+from array import array
+from threading import RLock
+
+from icetea_lib.Searcher import TraceSearcher
+from icetea_lib.tools.tools import IS_PYTHON3
+
+
+class TraceStore(object):
+    """
+    Bounded storage for received lines. Newest lines are kept in an in-memory ring. When the
+    ring is full, the oldest line is either dropped or, if a spill file is given, appended
+    to the spill file. Spilled lines are located with an index of file offsets, so the store
+    can be indexed and iterated like a list over the whole stored history.
+    """
+    read_block = 4096  # Amount of spilled lines read from file at once
+
+    def __init__(self, ring_size=0, spill_file=None):
+        """
+        :param ring_size: Maximum amount of lines kept in memory, 0 for unlimited.
+        :param spill_file: Path of the file for lines dropped from the ring. None to drop them.
+        """
+        self.ring_size = ring_size
+        self.spill_file = spill_file
+        self.dropped = 0
+        self.clears = 0
+        # Ring is a list with a moving head, evicted lines are removed from it in batches to
+        # keep both appending and indexing constant time.
+        self._ring = []
+        self._head = 0
+        self._offsets = array("Q") if IS_PYTHON3 else array("L")
+        self._spill_size = 0
+        self._spill = None
+        self._spill_path = None  # File of the lines already spilled
+        self._cache_start = 0
+        self._cache = []
+        self._lock = RLock()
+        self._searcher = None
+
+    @property
+    def searcher(self):
+        """
+        TraceSearcher for this store, used by verify_message to search only new lines.
+
+        :return: TraceSearcher
+        """
+        if self._searcher is None:
+            self._searcher = TraceSearcher(self)
+        return self._searcher
+
+    def append(self, line):
+        """
+        Store a line.
+
+        :param line: str
+        :return: Nothing
+        """
+        with self._lock:
+            if self.ring_size and len(self._ring) - self._head >= self.ring_size:
+                oldest = self._ring[self._head]
+                self._head += 1
+                if self._head >= self.ring_size:
+                    del self._ring[:self._head]
+                    self._head = 0
+                if self.spill_file:
+                    self._write_spilled(oldest)
+                else:
+                    self.dropped += 1
+            self._ring.append(line)
+
+    def extend(self, lines):
+        """
+        Store lines.
+
+        :param lines: iterable of str
+        :return: Nothing
+        """
+        for line in lines:
+            self.append(line)
+
+    def clear(self):
+        """
+        Remove all stored lines, including spilled lines.
+
+        :return: Nothing
+        """
+        with self._lock:
+            self._ring = []
+            self._head = 0
+            del self._offsets[:]
+            self._spill_size = 0
+            self._cache = []
+            self.dropped = 0
+            self.clears += 1
+            self.close()
+            if self._spill_path and os.path.exists(self._spill_path):
+                os.remove(self._spill_path)
+            self._spill_path = None
+
+    def close(self):
+        """
+        Close the spill file. Spilled lines can still be read, the file is reopened when needed.
+
+        :return: Nothing
+        """
+        with self._lock:
+            if self._spill is not None:
+                self._spill.close()
+                self._spill = None
+
+    def _open_spill(self):
+        """
+        Open the spill file for appending and reading.
+
+        :return: file object
+        """
+        if self._spill is None:
+            # Offsets are relative to the beginning of the file, start from an empty file.
+            self._spill = open(self._spill_path, "a+b" if self._spill_size else "w+b")
+        return self._spill
+
+    def _write_spilled(self, line):
+        """
+        Append line to the spill file and record its offset.
+
+        :param line: str
+        :return: Nothing
+        """
+        data = line.encode("utf-8") if IS_PYTHON3 or not isinstance(line, str) else line
+        if self._spill_path != self.spill_file:
+            # Lines spilled to a previous file can't be indexed anymore.
+            self.close()
+            if self._offsets:
+                self.dropped += len(self._offsets)
+                del self._offsets[:]
+                self._spill_size = 0
+                self._cache = []
+            self._spill_path = self.spill_file
+        spill = self._open_spill()
+        spill.write(data + b"\n")
+        self._offsets.append(self._spill_size)
+        self._spill_size += len(data) + 1
+
+    def _read_spilled(self, index):
+        """
+        Read a spilled line. A block of following lines is cached to make sequential scans
+        fast.
+
+        :param index: index of line in spill file
+        :return: str
+        """
+        if not self._cache_start <= index < self._cache_start + len(self._cache):
+            stop = min(index + self.read_block, len(self._offsets))
+            start_offset = int(self._offsets[index])
+            end_offset = int(self._offsets[stop]) if stop < len(self._offsets) else \
+                self._spill_size
+            spill = self._open_spill()
+            spill.flush()
+            spill.seek(start_offset)
+            data = spill.read(end_offset - start_offset)
+            lines = []
+            for i in range(index, stop):
+                begin = int(self._offsets[i]) - start_offset
+                end = (int(self._offsets[i + 1]) if i + 1 < len(self._offsets) else
+                       self._spill_size) - start_offset - 1
+                lines.append(data[begin:end].decode("utf-8", "replace") if IS_PYTHON3
+                             else data[begin:end])
+            self._cache_start = index
+            self._cache = lines
+        return self._cache[index - self._cache_start]
+
+    def _get(self, index):
+        """
+        Get line by index over the whole stored history.
+
+        :param index: non-negative int
+        :return: str
+        """
+        spilled = len(self._offsets)
+        if index < spilled:
+            return self._read_spilled(index)
+        return self._ring[self._head + index - spilled]
+
+    def __len__(self):
+        return len(self._offsets) + len(self._ring) - self._head
+
+    def __getitem__(self, item):
+        with self._lock:
+            length = len(self)
+            if isinstance(item, slice):
+                return [self._get(i) for i in range(*item.indices(length))]
+            if item < 0:
+                item += length
+            if not 0 <= item < length:
+                raise IndexError("TraceStore index out of range")
+            return self._get(item)
+
+    def __iter__(self):
+        index = 0
+        while True:
+            with self._lock:
+                if index >= len(self):
+                    return
+                line = self._get(index)
+            yield line
+            index += 1
+
+    def __eq__(self, other):
+        try:
+            return list(self) == list(other)
+        except TypeError:
+            return False
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    __hash__ = None
@@ -148,6 +148,17 @@ def get_base_arguments(parser):
     alloc_group.add_argument("--allocator_cfg",
                              help="File that contains configuration for used allocator.",
                              default=None)
+    alloc_group.add_argument("--process_pool",
+                             type=int,
+                             default=0,
+                             help="Keep up to N process duts running between test cases and "
+                                  "reuse them in test cases with an identical command. "
+                                  "Supported by LocalAllocator. Default is 0, no reuse.")
+    alloc_group.add_argument("--dut_session",
+                             action="store_true",
+                             default=False,
+                             help="Keep duts open between test cases and reuse them in the "
+                                  "next test case with identical dut requirements.")
 
     # Other arguments
     parser.add_argument('--env_cfg',
@@ -195,6 +206,11 @@ def get_base_arguments(parser):
                         default=False,
                         action="store_true",
                         help="Enables parallel flash.")
+    parser.add_argument('--parallel_init',
+                        type=int,
+                        default=8,
+                        help="Maximum amount of duts opened and initialized at the same time. "
+                             "1 initializes duts one at a time. Default is 8.")
     parser.add_argument('--disable_log_truncate',
                         default=False,
                         action="store_true",
@@ -211,6 +227,33 @@ def get_base_arguments(parser):
     parser.add_argument("--sync_start", default=False, action="store_true",
                         help="Use echo-command to try and make sure duts have "
                              "started before proceeding with test.")
+    parser.add_argument("--io_engine", default="thread", choices=["thread", "direct", "reactor"],
+                        help="I/O engine for dut communication. 'thread' uses a dut thread "
+                             "and read threads per connection, 'direct' processes received "
+                             "lines in the read threads, 'reactor' uses a single "
+                             "selector loop for all duts (not supported in Windows).")
+    parser.add_argument("--trace_policy", default="ring", choices=["off", "ring", "spill"],
+                        help="Storing of received dut lines. 'off' doesn't store lines, 'ring' "
+                             "keeps --trace_ring_size newest lines in memory, 'spill' also "
+                             "writes older lines to a file in the test case log directory.")
+    parser.add_argument("--trace_ring_size", default=0, type=int,
+                        help="Amount of received lines stored in memory for each dut. "
+                             "0 is unlimited.")
+    parser.add_argument("--event_delivery", default="sync", choices=["sync", "async"],
+                        help="Delivery of dut events to observers. 'sync' calls observers in "
+                             "the dut thread, 'async' queues events to worker threads.")
+    parser.add_argument("--event_workers", default=2, type=int,
+                        help="Amount of worker threads for async event delivery.")
+    parser.add_argument("--event_queue_size", default=1000, type=int,
+                        help="Maximum amount of queued events per worker for async event "
+                             "delivery.")
+    parser.add_argument("--event_queue_policy", default="block", choices=["block", "drop"],
+                        help="What to do when the async event queue is full. 'block' waits "
+                             "for space, 'drop' drops the event.")
+    parser.add_argument("--dut_release_timeout", default=15, type=float,
+                        help="Seconds all duts together may take to close after the test "
+                             "case. Duts are closed in parallel, processes still running "
+                             "at the deadline are killed.")
     return parser
 
 
@@ -400,6 +443,12 @@ def get_tc_arguments(parser):
                                   default=False,
                                   action="store_true",
                                   help="Skip flashing hardware devices during this run.")
+    parser.add_argument("--flash_state_db",
+                        default=None,
+                        action=Abspathify,
+                        help="File where the images flashed to hardware devices are "
+                             "recorded. Flashing is skipped if the image was flashed to the "
+                             "device in an earlier run. Defaults to None, not recorded.")
     group2.add_argument('--interface',
                         dest='interface',
                         default='eth0',
@@ -14,16 +14,21 @@ This is totally based on the example found in pyserial examples.
 """
 
 import re
+from collections import deque
 from threading import Lock
 
 import pkg_resources
 from serial import Serial, SerialException, SerialTimeoutException
 
+from icetea_lib.tools.Framers import LineFramer
+
 
 class EnhancedSerial(Serial):  # pylint: disable=too-many-ancestors
     """
     EnhancedSerial class, based on the examples in pyserial project.
     """
+    read_size = 4096
+
     def __init__(self, *args, **kwargs):
         # ensure that a reasonable timeout is set
         timeout = kwargs.get('timeout', 0.1)
@@ -32,7 +37,10 @@ class EnhancedSerial(Serial):  # pylint: disable=too-many-ancestors
         kwargs['timeout'] = timeout
         Serial.__init__(self, *args, **kwargs)
         self.buffer_lock = Lock()
-        self.buf = ''
+        self._framer = LineFramer(keepends=True)
+        self._lines = deque()
+        self._rx_buf = bytearray(self.read_size)
+        self._rx_view = memoryview(self._rx_buf)
         self.re_float = re.compile(r"^\d+\.\d+")
         self.pyserial_version = self.get_pyserial_version()
         self.is_pyserial_v3 = self.pyserial_version >= 3.0
@@ -94,6 +102,71 @@ class EnhancedSerial(Serial):  # pylint: disable=too-many-ancestors
             self.break_condition = False
         return result
 
+    @property
+    def framer(self):
+        """
+        Framer splitting received data to lines or frames, LineFramer keeping line
+        terminators by default.
+
+        :return: framer object
+        """
+        return self._framer
+
+    @framer.setter
+    def framer(self, value):
+        """
+        Replace the framer. Buffered data is dropped.
+
+        :param value: framer object
+        :return: Nothing
+        """
+        with self.buffer_lock:
+            self._framer = value
+            self._lines.clear()
+
+    @property
+    def buf(self):
+        """
+        Incomplete line in the receive buffer.
+
+        :return: str
+        """
+        return self.peek()
+
+    @buf.setter
+    def buf(self, value):
+        """
+        Replace the contents of the receive buffer.
+
+        :param value: str
+        :return: Nothing
+        """
+        with self.buffer_lock:
+            self._framer.reset()
+            self._framer.feed(value.encode("utf-8") if not isinstance(value, bytes) else value)
+
+    def _read_block(self):
+        """
+        Read one block from the port into the receive buffer and frame complete lines from it.
+
+        :return: Nothing
+        """
+        try:
+            size = self.readinto(self._rx_view)
+        except SerialTimeoutException:
+            # Exception that is raised on write timeouts.
+            return
+        except SerialException:
+            # In case the device can not be found or can not be configured.
+            return
+        except ValueError:
+            # Will be raised when parameter are out of range, e.g. baud rate, data bits.
+            return
+        if size:
+            with self.buffer_lock:
+                # Let's lock, just in case
+                self._lines.extend(self._framer.feed(self._rx_view[:size]))
+
     def readline(self, timeout=1):
         """
         maxsize is ignored, timeout in seconds is the max time that is way for a complete line
@@ -101,31 +174,12 @@ class EnhancedSerial(Serial):  # pylint: disable=too-many-ancestors
         tries = 0
         while 1:
             try:
-                block = self.read(512)
-                if isinstance(block, bytes):
-                    block = block.decode()
-                elif isinstance(block, str):
-                    block = block.decode()
-                else:
-                    raise ValueError("Unknown data")
-            except SerialTimeoutException:
-                # Exception that is raised on write timeouts.
-                block = ''
-            except SerialException:
-                # In case the device can not be found or can not be configured.
-                block = ''
-            except ValueError:
-                # Will be raised when parameter are out of range, e.g. baud rate, data bits.
-                # UnicodeError-Raised when a Unicode-related encoding or
-                # decoding error occurs. It is a subclass of ValueError.
-                block = ''
-            with self.buffer_lock:
-                # Let's lock, just in case
-                self.buf += block
-                pos = self.buf.find('\n')
-                if pos >= 0:
-                    line, self.buf = self.buf[:pos+1], self.buf[pos+1:]
-                    return line
+                return self._lines.popleft()
+            except IndexError:
+                pass
+            self._read_block()
+            if self._lines:
+                continue
             tries += 1
             if tries * self.timeout > timeout:
                 break
@@ -139,18 +193,19 @@ class EnhancedSerial(Serial):  # pylint: disable=too-many-ancestors
         """
         with self.buffer_lock:
             # Let's lock, just in case.
-            return self.buf
+            return self._framer.peek()
 
     def readlines(self, timeout=1):
         """
-        read all lines that are available. abort after timeout
-        when no more data arrives.
+        Read all complete lines that are available. If none are available, wait for at most
+        timeout seconds for a line.
+
+        :return: list of lines
         """
-        lines = []
-        while 1:
-            line = self.readline(timeout=timeout)
-            if line:
-                lines.append(line)
-            if not line or line[-1:] != '\n':
-                break
+        line = self.readline(timeout=timeout)
+        if line is None:
+            return []
+        lines = [line]
+        while self._lines:
+            lines.append(self._lines.popleft())
         return lines
@@ -0,0 +1,166 @@
+"""
+Copyright 2019 ARM Limited
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+ChunkedWriter module. Contains ChunkedWriter, a write queue that writes data in paced chunks
+in its own thread.
+"""
+
+import time
+from collections import deque
+from threading import Condition, Thread
+
+CLOCK = getattr(time, "monotonic", time.time)
+
+
+class ChunkedWriter(object):
+    """
+    Queue of data to write in chunks of chunk_size bytes, at most one chunk per chunk_delay.
+    Data is split into chunks when it is queued, and written in a writer thread, so queueing
+    never blocks the caller.
+    """
+    def __init__(self, write, chunk_size=1, chunk_delay=0.01, on_error=None, name="writer"):
+        """
+        :param write: callable writing bytes
+        :param chunk_size: Size of written chunks in bytes
+        :param chunk_delay: Seconds between starting to write consecutive chunks
+        :param on_error: callable called with the exception if write fails. Queued data is
+        dropped after a failure.
+        :param name: Name of the writer thread
+        """
+        self._write = write
+        self.chunk_size = max(1, chunk_size)
+        self.chunk_delay = chunk_delay
+        self.on_error = on_error
+        self.name = name
+        self.error = None
+        self._chunks = deque()
+        self._writing = False
+        self._cond = Condition()
+        self._running = False
+        self._thread = None
+
+    @property
+    def depth(self):
+        """
+        :return: Amount of chunks waiting to be written
+        """
+        return len(self._chunks)
+
+    def start(self):
+        """
+        Start the writer thread.
+
+        :return: Nothing
+        """
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = Thread(target=self._run, name=self.name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """
+        Write queued data and stop the writer thread.
+
+        :param timeout: Seconds to wait for queued data to be written, None to wait until
+        everything has been written. Data still queued after timeout is dropped.
+        :return: Boolean, True if all data was written.
+        """
+        flushed = self.flush(timeout)
+        with self._cond:
+            self._running = False
+            self._chunks.clear()
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        return flushed
+
+    def write(self, data):
+        """
+        Queue data for writing.
+
+        :param data: bytes
+        :return: Nothing
+        :raises: RuntimeError if a previous write failed.
+        """
+        self.writelines([data])
+
+    def writelines(self, lines):
+        """
+        Queue several blocks of data for writing at once.
+
+        :param lines: iterable of bytes
+        :return: Nothing
+        :raises: RuntimeError if a previous write failed.
+        """
+        size = self.chunk_size
+        chunks = []
+        for data in lines:
+            chunks.extend(data[i:i + size] for i in range(0, len(data), size))
+        with self._cond:
+            if self.error is not None:
+                raise RuntimeError(str(self.error))
+            self._chunks.extend(chunks)
+            self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """
+        Wait until queued data has been written.
+
+        :param timeout: Seconds to wait, None to wait until everything has been written.
+        :return: Boolean, True if everything was written.
+        """
+        end = None if timeout is None else CLOCK() + timeout
+        with self._cond:
+            while self._chunks or self._writing:
+                if not self._running:
+                    return False
+                remaining = None if end is None else end - CLOCK()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def _run(self):
+        """
+        Writer thread loop.
+
+        :return: Nothing
+        """
+        next_write = CLOCK()
+        while True:
+            with self._cond:
+                while self._running and (not self._chunks or CLOCK() < next_write):
+                    # Pace chunks with timed waits, so stop() interrupts the delay.
+                    self._cond.wait(None if not self._chunks else max(0, next_write - CLOCK()))
+                if not self._running:
+                    return
+                chunk = self._chunks.popleft()
+                self._writing = True
+            try:
+                self._write(chunk)
+            except Exception as error:  # pylint: disable=broad-except
+                with self._cond:
+                    self.error = error
+                    self._chunks.clear()
+                if self.on_error is not None:
+                    self.on_error(error)
+            finally:
+                next_write = CLOCK() + self.chunk_delay
+                with self._cond:
+                    self._writing = False
+                    self._cond.notify_all()
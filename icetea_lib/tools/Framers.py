@@ -0,0 +1,357 @@
+"""
+Copyright 2019 ARM Limited
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Framers module. Framers split a stream of bytes received from a dut connection into
+separate messages. LineFramer produces text lines, the binary framers (SLIP, COBS and
+length-prefixed) produce decoded frames as bytes.
+"""
+
+import struct
+
+from six import string_types
+
+from icetea_lib.tools.tools import IS_PYTHON3
+
+
+class LineFramer(object):
+    """
+    Splits a byte stream into newline terminated lines. Received bytes are stored in a single
+    bytearray and all complete lines are extracted from it in one pass, so data arriving in
+    small blocks is not repeatedly copied. Lines are decoded only when complete, so multi-byte
+    characters split between reads are decoded correctly.
+    """
+    binary = False
+
+    def __init__(self, encoding="utf-8", keepends=False):
+        self.encoding = encoding
+        self.keepends = keepends
+        self._buf = bytearray()
+
+    def _decode(self, data):
+        """
+        Decode a single line. Undecodable bytes are replaced instead of dropping the line.
+
+        :param data: bytearray
+        :return: str
+        """
+        if IS_PYTHON3:
+            return data.decode(self.encoding, "replace")
+        return str(data)
+
+    def feed(self, data):
+        """
+        Add received bytes to the buffer and extract complete lines from it.
+
+        :param data: bytes, bytearray or memoryview
+        :return: list of lines (str), line terminators are included if keepends is True
+        """
+        buf = self._buf
+        buf += data
+        lines = []
+        start = 0
+        find = buf.find
+        end_offset = 1 if self.keepends else 0
+        while True:
+            pos = find(b"\n", start)
+            if pos < 0:
+                break
+            lines.append(self._decode(buf[start:pos + end_offset]))
+            start = pos + 1
+        if start:
+            del buf[:start]
+        return lines
+
+    def encode(self, line):
+        """
+        Encode a line for writing.
+
+        :param line: str without line terminator
+        :return: bytes
+        """
+        return (line + "\n").encode(self.encoding)
+
+    def peek(self):
+        """
+        Get the incomplete line currently in the buffer.
+
+        :return: str
+        """
+        return self._decode(self._buf)
+
+    def reset(self):
+        """
+        Drop buffered data.
+
+        :return: Nothing
+        """
+        del self._buf[:]
+
+    def __len__(self):
+        """
+        :return: Amount of buffered bytes
+        """
+        return len(self._buf)
+
+
+class _BinaryFramer(object):
+    """
+    Base class for framers of binary protocols. Subclasses implement feed and encode.
+    Frames that can not be decoded are dropped and counted in errors.
+    """
+    binary = True
+
+    def __init__(self):
+        self._buf = bytearray()
+        self.errors = 0
+
+    def feed(self, data):
+        """
+        Add received bytes to the buffer and extract complete frames from it.
+
+        :param data: bytes, bytearray or memoryview
+        :return: list of decoded frames (bytes)
+        """
+        raise NotImplementedError("feed is not implemented")
+
+    def encode(self, payload):
+        """
+        Encode a frame for writing.
+
+        :param payload: bytes
+        :return: bytes
+        """
+        raise NotImplementedError("encode is not implemented")
+
+    def peek(self):
+        """
+        Get the incomplete frame currently in the buffer, undecoded.
+
+        :return: bytes
+        """
+        return bytes(self._buf)
+
+    def reset(self):
+        """
+        Drop buffered data.
+
+        :return: Nothing
+        """
+        del self._buf[:]
+
+    def __len__(self):
+        """
+        :return: Amount of buffered bytes
+        """
+        return len(self._buf)
+
+    def _split(self, data, delimiter, decode):
+        """
+        Add data to the buffer and decode all frames terminated by delimiter. Empty frames
+        are skipped.
+
+        :param data: received bytes
+        :param delimiter: frame delimiter, bytes
+        :param decode: callable decoding a single frame, raises ValueError on invalid frames.
+        :return: list of decoded frames (bytes)
+        """
+        buf = self._buf
+        buf += data
+        frames = []
+        start = 0
+        find = buf.find
+        while True:
+            pos = find(delimiter, start)
+            if pos < 0:
+                break
+            if pos > start:
+                try:
+                    frames.append(decode(buf[start:pos]))
+                except ValueError:
+                    self.errors += 1
+            start = pos + 1
+        if start:
+            del buf[:start]
+        return frames
+
+
+class SlipFramer(_BinaryFramer):
+    """
+    Frames delimited with SLIP (RFC 1055). Encoded frames start and end with END, so line
+    noise received before a frame is dropped as a separate frame.
+    """
+    END = b"\xc0"
+    ESC = b"\xdb"
+    ESC_END = b"\xdb\xdc"
+    ESC_ESC = b"\xdb\xdd"
+
+    def feed(self, data):
+        return self._split(data, SlipFramer.END, SlipFramer._decode)
+
+    @staticmethod
+    def _decode(frame):
+        """
+        Unescape a SLIP frame.
+
+        :param frame: bytearray without END bytes
+        :return: bytes
+        :raises: ValueError if the frame contains an invalid escape sequence.
+        """
+        if SlipFramer.ESC not in frame:
+            return bytes(frame)
+        if frame.count(SlipFramer.ESC) != (frame.count(SlipFramer.ESC_END) +
+                                           frame.count(SlipFramer.ESC_ESC)):
+            raise ValueError("Invalid SLIP escape sequence")
+        # ESC is never the second byte of an escape sequence, so the order is safe.
+        return bytes(frame.replace(SlipFramer.ESC_END, SlipFramer.END).replace(
+            SlipFramer.ESC_ESC, SlipFramer.ESC))
+
+    def encode(self, payload):
+        payload = bytes(payload).replace(SlipFramer.ESC, SlipFramer.ESC_ESC).replace(
+            SlipFramer.END, SlipFramer.ESC_END)
+        return SlipFramer.END + payload + SlipFramer.END
+
+
+class CobsFramer(_BinaryFramer):
+    """
+    Frames encoded with Consistent Overhead Byte Stuffing and delimited with a zero byte.
+    """
+    def feed(self, data):
+        return self._split(data, b"\x00", CobsFramer._decode)
+
+    @staticmethod
+    def _decode(frame):
+        """
+        Decode a COBS frame.
+
+        :param frame: bytearray without the zero delimiter
+        :return: bytes
+        :raises: ValueError if the frame is not valid COBS.
+        """
+        decoded = bytearray()
+        size = len(frame)
+        index = 0
+        while index < size:
+            code = frame[index]
+            end = index + code
+            if end > size:
+                raise ValueError("Truncated COBS frame")
+            decoded += frame[index + 1:end]
+            index = end
+            if code < 0xFF and index < size:
+                decoded.append(0)
+        return bytes(decoded)
+
+    def encode(self, payload):
+        encoded = bytearray()
+        for block in bytes(payload).split(b"\x00"):
+            while len(block) >= 0xFE:
+                encoded.append(0xFF)
+                encoded += block[:0xFE]
+                block = block[0xFE:]
+            encoded.append(len(block) + 1)
+            encoded += block
+        encoded.append(0)
+        return bytes(encoded)
+
+
+class LengthPrefixFramer(_BinaryFramer):
+    """
+    Frames preceded by their length as an unsigned integer of header_size bytes.
+    A length larger than max_size means that framing was lost, the buffer is dropped
+    and framing starts again from the next received data.
+    """
+    _formats = {1: "B", 2: "H", 4: "I"}
+
+    def __init__(self, header_size=2, byteorder="big", max_size=1024 * 1024):
+        """
+        :param header_size: Size of the length header in bytes, 1, 2 or 4.
+        :param byteorder: Byte order of the length header, "big" or "little".
+        :param max_size: Largest accepted frame in bytes.
+        :raises: ValueError if header_size or byteorder is invalid.
+        """
+        super(LengthPrefixFramer, self).__init__()
+        if header_size not in LengthPrefixFramer._formats:
+            raise ValueError("Invalid header_size {}, expected 1, 2 or 4".format(header_size))
+        if byteorder not in ("big", "little"):
+            raise ValueError("Invalid byteorder {}, expected big or little".format(byteorder))
+        self._header = struct.Struct((">" if byteorder == "big" else "<") +
+                                     LengthPrefixFramer._formats[header_size])
+        self.max_size = min(max_size, 2 ** (8 * header_size) - 1)
+
+    def feed(self, data):
+        buf = self._buf
+        buf += data
+        frames = []
+        start = 0
+        header_size = self._header.size
+        while len(buf) - start >= header_size:
+            size = self._header.unpack_from(buf, start)[0]
+            if size > self.max_size:
+                self.errors += 1
+                start = len(buf)
+                break
+            end = start + header_size + size
+            if end > len(buf):
+                break
+            frames.append(bytes(buf[start + header_size:end]))
+            start = end
+        if start:
+            del buf[:start]
+        return frames
+
+    def encode(self, payload):
+        """
+        Encode a frame for writing.
+
+        :param payload: bytes
+        :return: bytes
+        :raises: ValueError if payload is larger than max_size.
+        """
+        if len(payload) > self.max_size:
+            raise ValueError("Frame of {} bytes is larger than {} bytes".format(
+                len(payload), self.max_size))
+        return self._header.pack(len(payload)) + bytes(payload)
+
+
+FRAMERS = {
+    "line": LineFramer,
+    "slip": SlipFramer,
+    "cobs": CobsFramer,
+    "length": LengthPrefixFramer,
+}
+
+
+def create_framer(framing=None):
+    """
+    Create a framer from the "framing" value of a dut configuration.
+
+    :param framing: None or "line" for text lines, "slip", "cobs" or "length", or a dict with
+    the name in key "type" and the keyword arguments of the framer in other keys, for example
+    {"type": "length", "header_size": 4, "byteorder": "little"}.
+    :return: framer object
+    :raises: ValueError if framing is not valid.
+    """
+    if framing is None:
+        return LineFramer()
+    options = {}
+    if isinstance(framing, dict):
+        options = dict(framing)
+        framing = options.pop("type", "line")
+    if not isinstance(framing, string_types) or framing not in FRAMERS:
+        raise ValueError("Unknown framing {}, expected one of {}".format(
+            framing, ", ".join(sorted(FRAMERS))))
+    try:
+        return FRAMERS[framing](**options)
+    except TypeError as error:
+        raise ValueError("Invalid options for {} framing: {}".format(framing, error))
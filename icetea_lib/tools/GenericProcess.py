@@ -15,228 +15,298 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
+import errno
 import os
 import platform
 import signal
 import subprocess
 import time
 import select
-from threading import Thread, Lock
-from collections import deque
+from threading import Condition, Thread, Lock, current_thread
+from collections import deque, namedtuple
+
+try:
+    import pty
+    import termios
+except ImportError:
+    pty = None  # pylint: disable=invalid-name
+    termios = None  # pylint: disable=invalid-name
+
+try:
+    import selectors
+    READ_EVENT = selectors.EVENT_READ
+except ImportError:
+    selectors = None  # pylint: disable=invalid-name
+    READ_EVENT = 1
+
 from icetea_lib.TestStepError import TestStepError
+from icetea_lib.tools.Framers import LineFramer, create_framer
 from icetea_lib.tools.tools import strip_escape, is_pid_running, UNIXPLATFORM, IS_PYTHON3
 import icetea_lib.LogManager as LogManager
 
+CLOCK = getattr(time, "monotonic", time.time)
+
 
 class StreamDescriptor(object):  # pylint: disable=too-few-public-methods
     """
     StreamDescriptor class, container for stream components.
     """
-    def __init__(self, stream, callback):
+    def __init__(self, stream, callback, label=None, framer=None):
         self.stream = stream
-        self.buf = ""
+        self.fd = stream if isinstance(stream, int) else stream.fileno()  # pylint: disable=invalid-name
+        self.label = label
+        self.framer = framer if framer is not None else LineFramer()
         self.read_queue = deque()  # pylint: disable=invalid-name
         self.has_error = False
         self.callback = callback
 
 
+class _PollSelector(object):
+    """
+    Minimal selector built on select.poll(), for Pythons without the selectors module.
+    Implements the part of the selectors.BaseSelector interface NonBlockingStreamReader uses.
+    """
+    _Key = namedtuple("_Key", ["fd", "data"])
+
+    def __init__(self):
+        self._poll = select.poll()
+        self._keys = {}
+
+    def register(self, file_descr, events, data=None):  # pylint: disable=unused-argument
+        """
+        Register file descriptor for reading.
+        """
+        self._keys[file_descr] = _PollSelector._Key(file_descr, data)
+        self._poll.register(file_descr, select.POLLIN | select.POLLERR | select.POLLHUP)
+
+    def unregister(self, file_descr):
+        """
+        Unregister file descriptor.
+        """
+        del self._keys[file_descr]
+        self._poll.unregister(file_descr)
+
+    def select(self):
+        """
+        Wait for registered file descriptors to become readable.
+
+        :return: list of (key, events) tuples
+        """
+        ready = []
+        for file_descr, event in self._poll.poll():
+            key = self._keys.get(file_descr)
+            if key is not None:
+                ready.append((key, event))
+        return ready
+
+
+def _create_selector():
+    """
+    Create the best available selector for this platform, epoll on Linux.
+
+    :return: selector object
+    :raises: RuntimeError if the platform supports no polling method.
+    """
+    if selectors is not None:
+        return selectors.DefaultSelector()
+    if hasattr(select, "poll"):
+        return _PollSelector()
+    raise RuntimeError('This OS is not supporting select.poll() or select.kqueue()')
+
+
 class NonBlockingStreamReader(object):
     """
-    Implementation for a non-blocking stream reader.
+    Implementation for a non-blocking stream reader. All readers share a single reader thread,
+    which waits for data with a selector (epoll on Linux). Streams are registered to and
+    unregistered from the selector one at a time, and a wake up pipe is used to stop the
+    thread, so it doesn't wake up until there is something to do. The reader thread exits when
+    it finds no streams registered, the check and the exit are done with _stream_mtx held.
     """
-    _instance = None
-    _streams = None
-    _stream_mtx = None
+    read_size = 1024 * 1024
+    _descriptors = {}  # file descriptor -> StreamDescriptor
+    _stream_mtx = Lock()
+    _stream_cond = Condition(_stream_mtx)  # Notified when the reader thread exits
+    _selector = None
+    _wake_r = None
+    _wake_w = None
     _rt = None
-    _run_flag = False
-
-    def __init__(self, stream, callback=None):
-        # Global class variables
-        if NonBlockingStreamReader._rt is None:
-            NonBlockingStreamReader._streams = []
-            NonBlockingStreamReader._stream_mtx = Lock()
-            NonBlockingStreamReader._run_flag = True
-            NonBlockingStreamReader._rt = Thread(target=NonBlockingStreamReader.run)
-            NonBlockingStreamReader._rt.setDaemon(True)
-            NonBlockingStreamReader._rt.start()
-        # Instance variables
-        self._descriptor = StreamDescriptor(stream, callback)
 
-    def start(self):
+    def __init__(self, stream, callback=None, label=None, framer=None):
         """
-        Start the reader, acquires the global lock before appending the descriptor on the stream.
-        Releases the lock afterwards.
-        :return: Nothing
+        :param stream: file object with fileno() or a file descriptor
+        :param callback: callable, called once for every received line and when reading fails
+        :param label: Name of the stream, for example "stdout" or "stderr"
+        :param framer: framer object, LineFramer by default. Lines are stripped, frames of
+        binary framers are queued as bytes.
+        """
+        self._descriptor = StreamDescriptor(stream, callback, label, framer)
+
+    @property
+    def label(self):
         """
-        NonBlockingStreamReader._stream_mtx.acquire()
-        NonBlockingStreamReader._streams.append(self._descriptor)
-        NonBlockingStreamReader._stream_mtx.release()
+        :return: label of the stream
+        """
+        return self._descriptor.label
 
     @staticmethod
-    def _get_sd(file_descr):
+    def _init_selector():
         """
-        Get streamdescriptor matching file_descr fileno.
+        Create the shared selector and the wake up pipe. Called with _stream_mtx held.
 
-        :param file_descr: file object
-        :return: StreamDescriptor or None
+        :return: Nothing
         """
-        for stream_descr in NonBlockingStreamReader._streams:
-            if file_descr == stream_descr.stream.fileno():
-                return stream_descr
-        return None
+        if NonBlockingStreamReader._selector is not None:
+            return
+        wake_r, wake_w = os.pipe()
+        if UNIXPLATFORM:
+            for file_descr in (wake_r, wake_w):
+                _set_nonblocking(file_descr)
+        selector = _create_selector()
+        selector.register(wake_r, READ_EVENT, None)
+        NonBlockingStreamReader._wake_r = wake_r
+        NonBlockingStreamReader._wake_w = wake_w
+        NonBlockingStreamReader._selector = selector
 
     @staticmethod
-    def _read_fd(file_descr):
+    def _wake():
         """
-        Read incoming data from file handle.
-        Then find the matching StreamDescriptor by file_descr value.
+        Wake the reader thread from select.
 
-        :param file_descr: file object
-        :return: Return number of bytes read
+        :return: Nothing
         """
         try:
-            line = os.read(file_descr, 1024 * 1024)
+            os.write(NonBlockingStreamReader._wake_w, b"\0")
         except OSError:
-            stream_desc = NonBlockingStreamReader._get_sd(file_descr)
-            if stream_desc is not None:
-                stream_desc.has_error = True
-                if stream_desc.callback is not None:
-                    stream_desc.callback()
-            return 0
-
-        if line:
-            stream_desc = NonBlockingStreamReader._get_sd(file_descr)
-            if stream_desc is None:
-                return 0 # Process closing
-
-            if IS_PYTHON3:
-                try:
-                    # @TODO: further develop for not ascii/unicode binary content
-                    line = line.decode("ascii")
-                except UnicodeDecodeError:
-                    line = repr(line)
-            stream_desc.buf += line
-            # Break lines
-            split = stream_desc.buf.split(os.linesep)
-            for line in split[:-1]:
-                stream_desc.read_queue.appendleft(strip_escape(line.strip()))
-                if stream_desc.callback is not None:
-                    stream_desc.callback()
-            # Store the remainded, its either '' if last char was '\n'
-            # or remaining buffer before line end
-            stream_desc.buf = split[-1]
-            return len(line)
-        return 0
+            # Pipe is full, a wake up is already pending.
+            pass
 
-    @staticmethod
-    def _read_select_poll(poll):
+    def start(self):
         """
-        Read PIPEs using select.poll() method
-        Available on Linux and some Unixes
+        Start reading the stream. Starts the shared reader thread if it isn't running.
+
+        :return: Nothing
         """
-        npipes = len(NonBlockingStreamReader._streams)
-        for stream_descr in NonBlockingStreamReader._streams:
-            if not stream_descr.has_error:
-                poll.register(stream_descr.stream,
-                              select.POLLIN | select.POLLERR | select.POLLHUP | select.POLLNVAL)
+        descriptor = self._descriptor
+        with NonBlockingStreamReader._stream_mtx:
+            NonBlockingStreamReader._init_selector()
+            NonBlockingStreamReader._descriptors[descriptor.fd] = descriptor
+            NonBlockingStreamReader._selector.register(descriptor.fd, READ_EVENT, descriptor)
+            if NonBlockingStreamReader._rt is None:
+                NonBlockingStreamReader._rt = Thread(target=NonBlockingStreamReader.run,
+                                                     name="NonBlockingStreamReader")
+                NonBlockingStreamReader._rt.daemon = True
+                NonBlockingStreamReader._rt.start()
+            else:
+                # Selectors other than epoll only see the new stream on the next select.
+                NonBlockingStreamReader._wake()
+                # A stop() waiting for the thread to exit doesn't need to wait anymore.
+                NonBlockingStreamReader._stream_cond.notify_all()
 
-        while NonBlockingStreamReader._run_flag:
-            for (file_descr, event) in poll.poll(500):
-                if event == select.POLLIN:
-                    NonBlockingStreamReader._read_fd(file_descr)
-                else:
-                    # Because event != select.POLLIN, the pipe is closed
-                    # but we still want to read all bytes
-                    while NonBlockingStreamReader._read_fd(file_descr) != 0:
-                        pass
-                    # Dut died, signal the processing thread so it notices that no lines coming in
-                    stream_descr = NonBlockingStreamReader._get_sd(file_descr)
-                    if stream_descr is None:
-                        return # PIPE closed but DUT already disappeared
-                    stream_descr.has_error = True
-                    if stream_descr.callback is not None:
-                        stream_descr.callback()
-                        return # Force poll object to reregister only alive descriptors
-
-            # Check if new pipes added, don't need mutext just for reading the size
-            # If we will not get it right now, we will at next time
-            if npipes != len(NonBlockingStreamReader._streams):
-                return
+    @staticmethod
+    def _unregister(descriptor):
+        """
+        Unregister a descriptor from the selector. Called with _stream_mtx held.
+
+        :param descriptor: StreamDescriptor
+        :return: Boolean, True if the descriptor was registered.
+        """
+        if NonBlockingStreamReader._descriptors.get(descriptor.fd) is not descriptor:
+            return False
+        del NonBlockingStreamReader._descriptors[descriptor.fd]
+        try:
+            NonBlockingStreamReader._selector.unregister(descriptor.fd)
+        except (KeyError, ValueError, OSError, IOError):
+            pass
+        return True
 
     @staticmethod
-    def _read_select_kqueue(k_queue):
-        """
-        Read PIPES using BSD Kqueue
-        """
-        npipes = len(NonBlockingStreamReader._streams)
-        # Create list of kevent objects
-        # pylint: disable=no-member
-        kevents = [select.kevent(s.stream.fileno(),
-                                 filter=select.KQ_FILTER_READ,
-                                 flags=select.KQ_EV_ADD | select.KQ_EV_ENABLE)
-                   for s in NonBlockingStreamReader._streams]
-        while NonBlockingStreamReader._run_flag:
-            events = k_queue.control(kevents, npipes, 0.5)  # Wake up twice in second
-            for event in events:
-                if event.filter == select.KQ_FILTER_READ:  # pylint: disable=no-member
-                    NonBlockingStreamReader._read_fd(event.ident)
-            # Check if new pipes added.
-            if npipes != len(NonBlockingStreamReader._streams):
-                return
+    def _read_fd(descriptor):
+        """
+        Read incoming data from the stream of descriptor and queue the complete lines.
+        A stream that reached end of file or failed is unregistered and marked broken.
+
+        :param descriptor: StreamDescriptor
+        :return: Return number of bytes read
+        """
+        try:
+            data = os.read(descriptor.fd, NonBlockingStreamReader.read_size)
+        except OSError as error:
+            if error.errno in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                return 0
+            data = b""
+
+        if data:
+            framer = descriptor.framer
+            for line in framer.feed(data):
+                descriptor.read_queue.appendleft(line if framer.binary else
+                                                 strip_escape(line.strip()))
+                if descriptor.callback is not None:
+                    descriptor.callback()
+            return len(data)
+
+        # Process closed the pipe, signal the owner so it notices that no lines are coming in.
+        with NonBlockingStreamReader._stream_mtx:
+            if not NonBlockingStreamReader._unregister(descriptor):
+                return 0  # Process closing
+        if descriptor.framer and not descriptor.framer.binary:
+            # Last line was not terminated. An incomplete binary frame is dropped.
+            descriptor.read_queue.appendleft(strip_escape(descriptor.framer.peek().strip()))
+            descriptor.framer.reset()
+            if descriptor.callback is not None:
+                descriptor.callback()
+        descriptor.has_error = True
+        if descriptor.callback is not None:
+            descriptor.callback()
+        return 0
 
     @staticmethod
-    def run():
+    def _drain_wake():
         """
-        Run loop
+        Empty the wake up pipe.
+
+        :return: Nothing
         """
-        while NonBlockingStreamReader._run_flag:
-            # Wait for streams to appear
-            if not NonBlockingStreamReader._streams:
-                time.sleep(0.2)
-                continue
-            # Try to get correct select/poll method for this OS
-            # Try if select.poll() is supported (Linux/UNIX)
-            try:
-                poll = select.poll()
-            except AttributeError:
-                pass
-            else:
-                NonBlockingStreamReader._read_select_poll(poll)
-                del poll
-                continue
-            # Try is select.kqueue is supported (BSD/OS X)
-            try:
-                k_queue = select.kqueue()  # pylint: disable=no-member
-            except AttributeError:
+        try:
+            while os.read(NonBlockingStreamReader._wake_r, 4096):
                 pass
-            else:
-                NonBlockingStreamReader._read_select_kqueue(k_queue)
-                k_queue.close()
-                continue
-            # Not workable polling method found
-            raise RuntimeError('This OS is not supporting select.poll() or select.kqueue()')
+        except OSError:
+            pass
+
+    @staticmethod
+    def run():
+        """
+        Run loop. Runs until no streams are registered.
+        """
+        selector = NonBlockingStreamReader._selector
+        while True:
+            with NonBlockingStreamReader._stream_mtx:
+                if not NonBlockingStreamReader._descriptors:
+                    NonBlockingStreamReader._rt = None
+                    NonBlockingStreamReader._stream_cond.notify_all()
+                    return
+            for key, _ in selector.select():
+                if key.data is None:
+                    NonBlockingStreamReader._drain_wake()
+                elif NonBlockingStreamReader._descriptors.get(key.fd) is key.data:
+                    NonBlockingStreamReader._read_fd(key.data)
 
     def stop(self):
         """
-        Stop the reader
-        """
-        # print('stopping NonBlockingStreamReader..')
-        # print('acquire..')
-        NonBlockingStreamReader._stream_mtx.acquire()
-        # print('acquire..ok')
-        NonBlockingStreamReader._streams.remove(self._descriptor)
-        if not NonBlockingStreamReader._streams:
-            NonBlockingStreamReader._run_flag = False
-        # print('release..')
-        NonBlockingStreamReader._stream_mtx.release()
-        # print('release..ok')
-        if NonBlockingStreamReader._run_flag is False:
-            # print('join..')
-            NonBlockingStreamReader._rt.join()
-            # print('join..ok')
-            del NonBlockingStreamReader._rt
-            NonBlockingStreamReader._rt = None
-            # print('stopping NonBlockingStreamReader..ok')
+        Stop reading the stream. If this was the last stream, waits for the reader thread to
+        exit, unless another stream is started meanwhile.
+        """
+        with NonBlockingStreamReader._stream_mtx:
+            NonBlockingStreamReader._unregister(self._descriptor)
+            thread = NonBlockingStreamReader._rt
+            if NonBlockingStreamReader._descriptors or thread is None:
+                return
+            NonBlockingStreamReader._wake()
+            if thread is current_thread():
+                # Called from a callback, the thread exits after the callback returns.
+                return
+            while NonBlockingStreamReader._rt is thread and \
+                    not NonBlockingStreamReader._descriptors:
+                NonBlockingStreamReader._stream_cond.wait()
 
     def has_error(self):
         """
@@ -259,11 +329,69 @@ class NonBlockingStreamReader(object):
                 raise RuntimeError("Errors reading PIPE")
         return None
 
+    def peek(self):
+        """
+        Peek into the incomplete line.
+
+        :return: str, bytes of the incomplete frame for binary framers.
+        """
+        return self._descriptor.framer.peek()
+
+
+def _set_nonblocking(file_descr):
+    """
+    Set O_NONBLOCK flag for a file descriptor.
+
+    :param file_descr: int
+    :return: Nothing
+    """
+    import fcntl
+    flags = fcntl.fcntl(file_descr, fcntl.F_GETFL)
+    fcntl.fcntl(file_descr, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+
+
+def _set_controlling_tty():
+    """
+    Make stdin, a pseudo-terminal, the controlling terminal of a new session. Called in the
+    child process before exec.
+
+    :return: Nothing
+    """
+    import fcntl
+    os.setsid()
+    fcntl.ioctl(0, termios.TIOCSCTTY, 0)
+
+
+def _write_all(file_descr, data, timeout):
+    """
+    Write all data to a non-blocking file descriptor.
+
+    :param file_descr: file descriptor
+    :param data: bytearray
+    :param timeout: Seconds to wait for the reader to make room for the data
+    :return: Nothing
+    :raises: RuntimeError if data could not be written within timeout.
+    """
+    view = memoryview(data)
+    end = CLOCK() + timeout
+    while view:
+        try:
+            view = view[os.write(file_descr, view):]
+        except OSError as error:
+            if error.errno not in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                raise RuntimeError("Error writing to pseudo-terminal: {}".format(error))
+            remaining = end - CLOCK()
+            if remaining <= 0:
+                raise RuntimeError("Timeout writing to pseudo-terminal")
+            select.select([], [file_descr], [], remaining)
+
 
 class GenericProcess(object):
     """
     Generic process implementation for use with Dut.
     """
+    signal_timeout = 5  # Seconds to wait for the process to exit after each stop signal
+    pty_write_timeout = 10  # Seconds to wait for the process to read written data from its pty
     # Contstruct GenericProcess instance
     def __init__(self, name, cmd=None, path=None, logger=None):
         self.name = name
@@ -277,6 +405,8 @@ class GenericProcess(object):
         self.vgdb = False
         self.gdbs_port = None
         self.nobuf = False
+        self.pty = False
+        self.framing = None  # Framing of stdout, see Framers.create_framer
         self.valgrind = None
         self.valgrind_xml = None
         self.valgrind_console = None
@@ -285,6 +415,9 @@ class GenericProcess(object):
         self.__print_io = True
         self.__valgrind_log_basename = None
         self.read_thread = None
+        self.stderr_thread = None
+        self.capture_stderr = True
+        self.exit_status = None  # returncode of the process once it has been noticed to exit
         self.__ignore_return_code = False
         self.default_retcode = 0
 
@@ -355,6 +488,16 @@ class GenericProcess(object):
         """
         self.nobuf = nobuf
 
+    def use_pty(self, use=True):
+        """
+        Connect stdin and stdout of the process to a pseudo-terminal instead of pipes. The
+        process sees a terminal, so its stdout is line buffered without stdbuf. Not supported
+        in Windows.
+
+        :param use: Boolean, defaults to True
+        """
+        self.pty = use
+
     # pylint: disable=too-many-arguments
     def use_valgrind(self, tool, xml, console, track_origins, valgrind_extra_params):
         """
@@ -437,13 +580,15 @@ class GenericProcess(object):
 
         return valgrind
 
-    def start_process(self, cmd=None, path="", processing_callback=None):
+    def start_process(self, cmd=None, path="", processing_callback=None, reactor=None):
         """
         Start the process.
 
         :param cmd: Command to run
         :param path: cwd
         :param processing_callback: Callback for processing lines
+        :param reactor: DutReactor to read the process output with. If None, the shared
+        NonBlockingStreamReader thread is used.
         :return: Nothing
         :raises: NameError if Connection fails
         """
@@ -451,27 +596,8 @@ class GenericProcess(object):
         self.path = self.path if not path else path
         if self.path:
             self.path = os.path.abspath(self.path)
-        self.cmd_arr = []
-
-        # set stdbuf in/out/err to zero size = no buffers in use
-        if self.nobuf:
-            self.cmd_arr.extend(['stdbuf', '-i0', '-o0', '-e0'])
-
-        # check if user want to debug this process
-        if self.gdb:
-            # add gdb parameters, run program immediately
-            self.cmd_arr.extend(['gdb', '-ex=run', '--args'])
-        elif self.gdbs:
-            # add gdbserver parameters, run program immediately
-            self.cmd_arr.extend(['gdbserver', 'localhost:' + str(self.gdbs_port)])
-        elif self.vgdb:
-            # add valgrind vgdb parameters, run program but wait for remote gdb connection
-            self.cmd_arr.extend(['valgrind', '--vgdb=yes', '--vgdb-error=0'])
-
-        if self.valgrind:
-            self.cmd_arr.extend(self.__get_valgrind_params())
-
-        self.cmd_arr.extend(self.cmd)
+        self.cmd_arr = self._build_command()
+        self.exit_status = None
         prefn = None
         if not platform.system() == "Windows":
             prefn = os.setsid
@@ -480,19 +606,20 @@ class GenericProcess(object):
                           "%s at %s with command %s"
                           % (self.name, self.path, " ".join(self.cmd_arr)),
                           extra={"type": "   "})
-        self.proc = subprocess.Popen(self.cmd_arr, cwd=self.path, stdout=subprocess.PIPE,
-                                     stdin=subprocess.PIPE, preexec_fn=prefn)
+        stderr = subprocess.PIPE if self.capture_stderr else None
+        if self.pty:
+            self.proc = self._popen_pty(stderr)
+        else:
+            self.proc = subprocess.Popen(self.cmd_arr, cwd=self.path, stdout=subprocess.PIPE,
+                                         stdin=subprocess.PIPE, stderr=stderr, preexec_fn=prefn)
 
         if UNIXPLATFORM:
-            import fcntl
-            file_descr = self.proc.stdout.fileno()
-            fcntl_var = fcntl.fcntl(file_descr, fcntl.F_GETFL)
-            fcntl.fcntl(file_descr, fcntl.F_SETFL, fcntl_var | os.O_NONBLOCK)
+            _set_nonblocking(self.proc.stdout.fileno())
+            if self.proc.stderr is not None:
+                _set_nonblocking(self.proc.stderr.fileno())
 
         if self.proc.pid:
-            # Start stream reader thread
-            self.read_thread = NonBlockingStreamReader(self.proc.stdout, processing_callback)
-            self.read_thread.start()
+            self._start_readers(processing_callback, reactor)
             self.logger.info("Process '%s' running with pid: %i" % (' '.join(self.cmd_arr),
                                                                     self.proc.pid),
                              extra={'type': '<->'})
@@ -500,23 +627,227 @@ class GenericProcess(object):
             self.logger.warning("Process start fails", extra={'type': '<->'})
             raise NameError('Connection Fails')
 
-    def stop_process(self):
+    def _popen_pty(self, stderr):
         """
-        Stop the process.
+        Start the process with a pseudo-terminal as its stdin, stdout and controlling terminal.
+        The terminal doesn't echo input or translate line endings, so the output is framed
+        just like output read from a pipe. stdin and stdout of the returned Popen are file
+        objects of the master side of the terminal.
 
-        :raises: EnvironmentError if stopping fails due to unknown environment
-        TestStepError if process stops with non-default returncode and return code is not ignored.
+        :param stderr: stderr argument for subprocess.Popen
+        :return: subprocess.Popen
+        :raises: EnvironmentError if pseudo-terminals are not supported.
+        """
+        if pty is None:
+            raise EnvironmentError("Pseudo-terminals are not supported on this platform")
+        master, slave = pty.openpty()
+        try:
+            attrs = termios.tcgetattr(slave)
+            attrs[0] &= ~termios.ICRNL
+            attrs[1] &= ~termios.ONLCR
+            attrs[3] &= ~(termios.ECHO | termios.ECHONL)
+            termios.tcsetattr(slave, termios.TCSANOW, attrs)
+            proc = subprocess.Popen(self.cmd_arr, cwd=self.path, stdin=slave, stdout=slave,
+                                    stderr=stderr, preexec_fn=_set_controlling_tty)
+        except Exception:
+            os.close(master)
+            raise
+        finally:
+            os.close(slave)
+        proc.stdin = os.fdopen(os.dup(master), "wb", 0)
+        proc.stdout = os.fdopen(master, "rb", 0)
+        return proc
+
+    def _build_command(self):
+        """
+        Build the command line of the process, including stdbuf, debugger and valgrind wrappers.
+
+        :return: list
+        """
+        cmd_arr = []
+
+        # set stdbuf in/out/err to zero size = no buffers in use
+        if self.nobuf:
+            cmd_arr.extend(['stdbuf', '-i0', '-o0', '-e0'])
+
+        # check if user want to debug this process
+        if self.gdb:
+            # add gdb parameters, run program immediately
+            cmd_arr.extend(['gdb', '-ex=run', '--args'])
+        elif self.gdbs:
+            # add gdbserver parameters, run program immediately
+            cmd_arr.extend(['gdbserver', 'localhost:' + str(self.gdbs_port)])
+        elif self.vgdb:
+            # add valgrind vgdb parameters, run program but wait for remote gdb connection
+            cmd_arr.extend(['valgrind', '--vgdb=yes', '--vgdb-error=0'])
+
+        if self.valgrind:
+            cmd_arr.extend(self.__get_valgrind_params())
+
+        cmd_arr.extend(self.cmd)
+        return cmd_arr
+
+    def _start_readers(self, processing_callback, reactor):
+        """
+        Start reading stdout and stderr of self.proc.
+
+        :param processing_callback: Callback for processing lines
+        :param reactor: DutReactor or None to use NonBlockingStreamReader.
+        :return: Nothing
+        """
+        self.read_thread = self._create_reader(self.proc.stdout, processing_callback,
+                                               "stdout", reactor, create_framer(self.framing))
+        self.read_thread.start()
+        if self.proc.stderr is not None:
+            self.stderr_thread = self._create_reader(self.proc.stderr, self._read_stderr,
+                                                     "stderr", reactor)
+            self.stderr_thread.start()
+
+    def _stop_readers(self):
+        """
+        Stop reading stdout and stderr of the process.
+
+        :return: Nothing
         """
         if self.read_thread is not None:
             self.logger.debug("stop_process::readThread.stop()-in")
             self.read_thread.stop()
             self.logger.debug("stop_process::readThread.stop()-out")
+        if self.stderr_thread is not None:
+            self.stderr_thread.stop()
+            self.stderr_thread = None
+
+    def attach_process(self, proc, processing_callback=None, reactor=None):
+        """
+        Take a running process, for example one detached from another GenericProcess, into use
+        and start reading its output.
+
+        :param proc: subprocess.Popen started with stdin and stdout pipes
+        :param processing_callback: Callback for processing lines
+        :param reactor: DutReactor to read the process output with. If None, the shared
+        NonBlockingStreamReader thread is used.
+        :return: Nothing
+        """
+        self.proc = proc
+        self.exit_status = None
+        self._start_readers(processing_callback, reactor)
+        self.logger.info("Process '%s' reused with pid: %i" % (' '.join(self.cmd_arr), proc.pid),
+                         extra={'type': '<->'})
+
+    def detach_process(self):
+        """
+        Stop reading the output of the process and give it up without stopping it.
+
+        :return: subprocess.Popen or None if there is no process.
+        """
+        self._stop_readers()
+        self.read_thread = None
+        proc, self.proc = self.proc, None
+        return proc or None
+
+    @staticmethod
+    def _create_reader(stream, callback, label, reactor=None, framer=None):
+        """
+        Create a reader for an output stream of the process.
+
+        :param stream: file object
+        :param callback: callable, called for every received line
+        :param label: name of the stream
+        :param reactor: DutReactor or None to use NonBlockingStreamReader.
+        :param framer: framer object, LineFramer by default.
+        :return: ReactorStream or NonBlockingStreamReader
+        """
+        if reactor is not None:
+            return reactor.create_stream(stream, callback, framer)
+        return NonBlockingStreamReader(stream, callback, label, framer)
+
+    def _read_stderr(self):
+        """
+        Log the lines the process has written to stderr. Called by the stderr reader.
+
+        :return: Nothing
+        """
+        reader = self.stderr_thread
+        if reader is None:
+            return
+        while True:
+            try:
+                line = reader.readline()
+            except RuntimeError:
+                return
+            if line is None:
+                return
+            if line:
+                self.logger.info(line, extra={'type': 'E<-'})
+
+    def _wait_pidfd(self, timeout):
+        """
+        Wait for the process to exit with a process file descriptor (Linux 5.3+, Python 3.9+).
+
+        :param timeout: Seconds to wait
+        :return: Boolean, False if process file descriptors are not supported.
+        """
+        pidfd_open = getattr(os, "pidfd_open", None)
+        if pidfd_open is None or not hasattr(select, "poll"):
+            return False
+        try:
+            pidfd = pidfd_open(self.proc.pid)
+        except OSError:
+            return False
+        try:
+            poll = select.poll()
+            poll.register(pidfd, select.POLLIN)
+            poll.poll(int(timeout * 1000))
+        finally:
+            os.close(pidfd)
+        return True
+
+    def _wait_exit(self, timeout):
+        """
+        Wait for the process to exit. Returns as soon as the process has exited.
+
+        :param timeout: Seconds to wait
+        :return: returncode of the process or None if it is still running after timeout.
+        """
+        returncode = self.proc.poll()
+        if returncode is None and timeout > 0:
+            if self._wait_pidfd(timeout):
+                returncode = self.proc.poll()
+            elif IS_PYTHON3:
+                try:
+                    returncode = self.proc.wait(timeout)
+                except subprocess.TimeoutExpired:  # pylint: disable=no-member
+                    pass
+            else:
+                end = CLOCK() + timeout
+                delay = 0.001
+                while returncode is None and CLOCK() < end:
+                    time.sleep(min(delay, max(0, end - CLOCK())))
+                    delay = min(delay * 2, 0.05)
+                    returncode = self.proc.poll()
+        if returncode is not None:
+            self.exit_status = returncode
+        return returncode
+
+    def stop_process(self, timeout=None):
+        """
+        Stop the process. Sends SIGINT, SIGTERM and SIGKILL in turn until the process exits.
+
+        :param timeout: Seconds the process may take to exit after SIGINT and SIGTERM in total.
+        None to wait signal_timeout seconds after each signal.
+        :raises: EnvironmentError if stopping fails due to unknown environment
+        TestStepError if process stops with non-default returncode and return code is not ignored.
+        """
+        self._stop_readers()
         returncode = None
+        end = None if timeout is None else CLOCK() + timeout
         if self.proc:
             self.logger.debug("os.killpg(%d)", self.proc.pid)
 
             for sig in (signal.SIGINT, signal.SIGTERM, signal.SIGKILL):
-                timeout = 5
+                wait = self.signal_timeout
+                if end is not None and sig != signal.SIGKILL:
+                    wait = max(0, min(wait, end - CLOCK()))
                 try:
                     try:
                         self.logger.debug("Trying signal %s", sig)
@@ -531,14 +862,14 @@ class GenericProcess(object):
                             self.logger.debug("os.killpg::unknown env")
                             raise EnvironmentError("Unknown platform, "
                                                    "don't know how to terminate process")
-                    while self.proc.poll() is None and timeout > 0:
-                        time.sleep(1)
-                        timeout -= 1
-                    returncode = self.proc.poll()
+                    returncode = self._wait_exit(wait)
                     if returncode is not None:
                         break
                 except OSError as error:
                     self.logger.info("os.killpg::OSError: %s", error)
+            if returncode is None:
+                # Process may have exited and been waited for before stopping.
+                returncode = self.exit_status
             self.proc = None
 
         if returncode is not None:
@@ -578,15 +909,29 @@ class GenericProcess(object):
         :return: Nothing
         :raises: RuntimeError if errors happen while writing to PIPE or process stops.
         """
+        if self.__print_io:
+            self.logger.info(data, extra={'type': '-->'})
+        self.write_raw(bytearray(data + crlf, 'ascii'))
+
+    def write_raw(self, data):
+        """
+        Write bytes to the process as they are.
+
+        :param data: bytes
+        :return: Nothing
+        :raises: RuntimeError if errors happen while writing to PIPE or process stops.
+        """
         if self.read_thread:
             if self.read_thread.has_error():
                 raise RuntimeError("Error writing PIPE")
         # Check if process still alive
         if self.proc.poll() is not None:
             raise RuntimeError("Process stopped")
-        if self.__print_io:
-            self.logger.info(data, extra={'type': '-->'})
-        self.proc.stdin.write(bytearray(data + crlf, 'ascii'))
+        if self.pty:
+            # The master side of the terminal is non-blocking, it is shared with the reader.
+            _write_all(self.proc.stdin.fileno(), data, self.pty_write_timeout)
+            return
+        self.proc.stdin.write(data)
         self.proc.stdin.flush()
 
     def is_alive(self):
@@ -172,7 +172,6 @@ def strip_escape(string='', encoding="utf-8"):  # pylint: disable=redefined-oute
     :param encoding: string name of the encoding used.
     :return: stripped string
     """
-    matches = []
     try:
         if hasattr(string, "decode"):
             string = string.decode(encoding)
@@ -181,17 +180,11 @@ def strip_escape(string='', encoding="utf-8"):  # pylint: disable=redefined-oute
         # move on.
         pass
     try:
-        for match in ansi_eng.finditer(string):
-            matches.append(match)
+        # All escape sequences are removed in one pass, a line without them is returned as is.
+        return ansi_eng.sub("", string)
     except TypeError as error:
         raise TypeError("Unable to strip escape characters from data {}: {}".format(
             string, error))
-    matches.reverse()
-    for match in matches:
-        start = match.start()
-        end = match.end()
-        string = string[0:start] + string[end:]
-    return string
 
 
 def load_class(full_class_string, verbose=False, silent=False):
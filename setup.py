@@ -49,7 +49,8 @@ INSTALL_REQUIRES = [
     "mbed-flasher>=0.10.1,<0.11",
     "six>=1.0,<2.0",
     "pydash>=4.0,<5.0",
-    "transitions<1.0"
+    "transitions<1.0",
+    "futures;python_version<'3.2'"
 ]
 TEST_REQUIRES = [
     "coverage>=4.0,<5.0",
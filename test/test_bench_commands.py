@@ -15,12 +15,15 @@ limitations under the License.
 """
 
 import time
+import threading
 import unittest
 import logging
 import mock
 
 from icetea_lib.TestBench.Commands import Commands
 from icetea_lib.CliAsyncResponse import CliAsyncResponse
+from icetea_lib.CliRequest import CliRequest
+from icetea_lib.CliResponse import CliResponse
 from icetea_lib.TestStepError import TestStepFail, TestStepTimeout, TestStepError
 
 
@@ -161,6 +164,129 @@ class CommandMixerTestcase(unittest.TestCase):
             with mock.patch.object(cmds, "execute_command"):
                 cmds.sync_cli("1", mock_gen, retries=1)
 
+    def _mock_duts(self, retcodes, calls, clock=None):
+        clock = clock if clock is not None else [0]
+        duts = {}
+        for index, retcode in retcodes.items():
+            dut = mock.MagicMock()
+
+            def execute(req, index=index, retcode=retcode, dut=dut):
+                calls.append(("send", index))
+                if isinstance(retcode, BaseException):
+                    raise retcode
+                # Sending each command takes a second.
+                clock[0] += 1
+                async_resp = CliAsyncResponse(dut, request=req)
+
+                def wait():
+                    calls.append(("wait", index))
+                    response = CliResponse()
+                    response.retcode = retcode
+                    async_resp.set_response(response)
+                dut._wait_for_exec_ready = mock.MagicMock(side_effect=wait)
+                return async_resp
+            dut.execute_command = mock.MagicMock(side_effect=execute)
+            duts[index] = dut
+        resources = mock.MagicMock()
+        resources.get_dut = mock.MagicMock(side_effect=lambda k: duts[k])
+        resources.dut_indexes = sorted(duts.keys())
+        benchfunctions = mock.MagicMock()
+        benchfunctions.get_time = mock.MagicMock(side_effect=lambda: clock[0])
+        cmixer = Commands(mock.MagicMock(), mock.MagicMock(), resources,
+                          mock.MagicMock(), benchfunctions)
+        cmixer._plugins.parse_response = mock.MagicMock(return_value=None)
+        cmixer._logger = MockLogger()
+        return cmixer, duts
+
+    def test_execute_commands_parallel(self):
+        calls = []
+        cmixer, duts = self._mock_duts({1: 0, 2: 0, 3: 0}, calls)
+        responses = cmixer.execute_commands({1: "cmd a", 2: "cmd b", 3: "cmd c"},
+                                            timeout={2: 5}, total_timeout=3)
+        self.assertListEqual([call[0] for call in calls], ["send"] * 3 + ["wait"] * 3)
+        self.assertListEqual(sorted(responses.keys()), [1, 2, 3])
+        self.assertEqual(responses[2].retcode, 0)
+        self.assertEqual(duts[1].execute_command.call_args[0][0].timeout, 3)
+        self.assertEqual(duts[2].execute_command.call_args[0][0].cmd, "cmd b")
+        # One deadline for all commands, later commands get the time that is left.
+        self.assertEqual(duts[2].execute_command.call_args[0][0].timeout, 2)
+        self.assertEqual(duts[3].execute_command.call_args[0][0].timeout, 1)
+
+    def test_execute_commands_send_fails(self):
+        calls = []
+        cmixer, duts = self._mock_duts({1: 0, 2: TestStepError("dead"), 3: 0}, calls)
+        with self.assertRaises(TestStepError):
+            cmixer.execute_commands({1: "cmd", 2: "cmd", 3: "cmd"})
+        # The command already sent was waited for, nothing was sent after the failure.
+        self.assertListEqual(calls, [("send", 1), ("send", 2), ("wait", 1)])
+        self.assertEqual(duts[3].execute_command.call_count, 0)
+
+    def test_execute_commands_interrupted(self):
+        cmixer, _ = self._mock_duts({1: 0, 2: KeyboardInterrupt()}, [])
+        with self.assertRaises(NameError):
+            cmixer.execute_commands({1: "cmd", 2: "cmd"})
+
+    def test_execute_commands_failure_after_all_responses(self):
+        calls = []
+        cmixer, _ = self._mock_duts({1: 1, 2: 0}, calls)
+        with self.assertRaises(TestStepFail):
+            cmixer.execute_commands({1: "cmd", 2: "cmd"})
+        self.assertEqual(len(calls), 4)
+        calls = []
+        cmixer, _ = self._mock_duts({1: 1, 2: 0}, calls)
+        responses = cmixer.execute_commands({1: "cmd", 2: "cmd"}, report_cmd_fail=False)
+        self.assertEqual(responses[1].retcode, 1)
+
+    def test_send_cmd_to_all(self):
+        calls = []
+        cmixer, _ = self._mock_duts({1: 0, 2: 0}, calls)
+        responses = cmixer.execute_command("*", "cmd")
+        self.assertListEqual(calls, [("send", 1), ("send", 2), ("wait", 1), ("wait", 2)])
+        self.assertEqual(len(responses), 2)
+
+    def _async_responses(self, retcodes):
+        responses = []
+        for delay, retcode in retcodes:
+            dut = mock.MagicMock()
+            dut.get_time = mock.MagicMock(return_value=0)
+            async_resp = CliAsyncResponse(dut, request=CliRequest("cmd", expected_retcode=0),
+                                          deadline=10)
+            response = CliResponse()
+            response.retcode = retcode
+            timer = threading.Timer(delay, async_resp.set_response, args=(response, ))
+            timer.start()
+            self.addCleanup(timer.cancel)
+            responses.append(async_resp)
+        return responses
+
+    def test_as_completed(self):
+        cmixer, _ = self._mock_duts({}, [])
+        responses = self._async_responses([(0.2, 0), (0.0, 0), (0.1, 0)])
+        completed = list(cmixer.as_completed(responses, timeout=5))
+        self.assertListEqual(completed, [responses[1], responses[2], responses[0]])
+        self.assertEqual(cmixer._plugins.parse_response.call_count, 3)
+
+    def test_as_completed_timeout(self):
+        cmixer, _ = self._mock_duts({}, [])
+        responses = self._async_responses([(0.0, 0), (2, 0)])
+        completed = []
+        with self.assertRaises(TestStepTimeout):
+            for async_resp in cmixer.as_completed(responses, timeout=0.2):
+                completed.append(async_resp)
+        self.assertListEqual(completed, responses[:1])
+
+    def test_wait_all(self):
+        cmixer, _ = self._mock_duts({}, [])
+        start = time.time()
+        results = cmixer.wait_all(self._async_responses([(0.2, 0), (0.2, 0), (0.1, 0)]))
+        self.assertLess(time.time() - start, 1)
+        self.assertListEqual([result.retcode for result in results], [0, 0, 0])
+        with self.assertRaises(TestStepFail):
+            cmixer.wait_all(self._async_responses([(0.0, 1), (0.1, 0)]))
+        results = cmixer.wait_all(self._async_responses([(0.0, 1), (0.1, 0)]),
+                                  report_cmd_fail=False)
+        self.assertListEqual([result.retcode for result in results], [1, 0])
+
     @mock.patch("icetea_lib.TestBench.Commands.uuid")
     def test_echo_uuid_generator(self, mock_uuid):
         mock_uuid.uuid1 = mock.MagicMock(return_value="uuid")
@@ -15,10 +15,13 @@ limitations under the License.
 """
 
 
+import time
 import unittest
 import mock
 
+from icetea_lib.DeviceConnectors.Dut import DutConnectionError
 from icetea_lib.TestBench.Resources import ResourceFunctions
+from icetea_lib.ResourceProvider.DutSession import DutSession
 from icetea_lib.ResourceProvider.ResourceConfig import ResourceConfig
 
 TEST_REQS = {
@@ -96,6 +99,183 @@ class ResourceMixerTests(unittest.TestCase):
         mocked_dut.close_connection.assert_called_once()
         resmixer._resource_provider.allocator.release.assert_called_once()
 
+    def test_dut_release_parallel(self):
+        duts = []
+        for index in range(5):
+            dut = mock.MagicMock()
+            dut.dut_name = "D%d" % index
+            dut.close_connection = mock.MagicMock(side_effect=lambda: time.sleep(0.3))
+            dut.finished = mock.MagicMock(return_value=True)
+            duts.append(dut)
+        resmixer = ResourceFunctions(mock.MagicMock(), mock.MagicMock(), mock.MagicMock())
+        resmixer.duts = duts
+        resmixer._args = MockArgs()
+        resmixer._args.dut_release_timeout = 10
+        resmixer._logger = MockLogger()
+        resmixer._resource_provider = mock.MagicMock()
+        resmixer._resource_provider.allocator = mock.MagicMock(spec=["release"])
+        resmixer.is_my_dut_index = mock.MagicMock(return_value=True)
+        start = time.time()
+        resmixer.duts_release()
+        self.assertLess(time.time() - start, 1.2)
+        for dut in duts:
+            dut.close_connection.assert_called_once()
+            self.assertLessEqual(dut.close_timeout, 10)
+        self.assertEqual(resmixer._resource_provider.allocator.release.call_count, 5)
+
+    def test_dut_release_deadline(self):
+        duts = []
+        for index in range(2):
+            dut = mock.MagicMock()
+            dut.dut_name = "D%d" % index
+            dut.finished = mock.MagicMock(return_value=True)
+            duts.append(dut)
+        duts[0].close_connection = mock.MagicMock(side_effect=lambda: time.sleep(3))
+        resmixer = ResourceFunctions(mock.MagicMock(), mock.MagicMock(), mock.MagicMock())
+        resmixer.duts = duts
+        resmixer._args = MockArgs()
+        resmixer._args.dut_release_timeout = 0.2
+        resmixer._logger = mock.MagicMock()
+        resmixer._resource_provider = mock.MagicMock()
+        resmixer.is_my_dut_index = mock.MagicMock(return_value=True)
+        start = time.time()
+        resmixer.duts_release()
+        self.assertLess(time.time() - start, 2.5)
+        resmixer._logger.warning.assert_called_once_with(
+            "Dut %s was not closed before the release deadline", "D0")
+
+    def _create_session_resources(self, session):
+        resmixer = ResourceFunctions(mock.MagicMock(), mock.MagicMock(), mock.MagicMock())
+        resmixer._args = MockArgs()
+        resmixer._args.my_duts = None
+        resmixer._logger = mock.MagicMock()
+        resmixer._resource_provider = mock.MagicMock()
+        resmixer._resource_provider.dut_session = session
+        resmixer.resource_configuration = ResourceConfig()
+        resmixer.resource_configuration.resolve_configuration(TEST_REQS)
+        return resmixer
+
+    def test_dut_session_resume(self):
+        session = DutSession(mock.MagicMock())
+        duts = [mock.MagicMock(died=False), mock.MagicMock(died=False)]
+        allocations = mock.MagicMock()
+        for dut in duts:
+            dut.finished.return_value = False
+            dut.check_health.return_value = True
+        resmixer = self._create_session_resources(session)
+        key = session.get_key(resmixer.resource_configuration)
+        session.park(key, allocations, duts)
+
+        resmixer._initialize_duts()
+        resmixer._resource_provider.allocate_duts.assert_not_called()
+        self.assertListEqual(resmixer.duts, duts)
+        self.assertIs(resmixer._allocation_context, allocations)
+        for dut in duts:
+            dut.prepare_reuse.assert_called_once()
+            dut.check_health.assert_called_once_with(None, None)
+            dut.init_cli.assert_not_called()
+
+        resmixer.duts_release()
+        for dut in duts:
+            dut.close_dut.assert_not_called()
+        self.assertEqual(session.take(key), (allocations, duts))
+
+    def test_dut_session_health_check_fails(self):
+        session = DutSession(mock.MagicMock(), mock.MagicMock())
+        duts = [mock.MagicMock(died=False), mock.MagicMock(died=False)]
+        for dut in duts:
+            dut.finished.return_value = False
+        duts[1].check_health.return_value = False
+        resmixer = self._create_session_resources(session)
+        key = session.get_key(resmixer.resource_configuration)
+        session.park(key, mock.MagicMock(), duts)
+
+        self.assertFalse(resmixer._resume_session(key))
+        for dut in duts:
+            dut.close_dut.assert_called_once()
+            dut.close_connection.assert_called_once()
+        self.assertEqual(session._release.call_count, 2)
+        self.assertIsNone(session.take(key))
+
+    def test_dut_session_dead_dut_not_parked(self):
+        session = mock.MagicMock()
+        dut = mock.MagicMock(died=True)
+        dut.finished = mock.MagicMock(return_value=True)
+        resmixer = self._create_session_resources(session)
+        resmixer.duts = [dut]
+        resmixer._session_key = "key"
+        resmixer.duts_release()
+        session.park.assert_not_called()
+        dut.close_dut.assert_called_once()
+        self.assertIsNone(resmixer._session_key)
+
+    def _create_init_resources(self, count, parallel_init):
+        duts = []
+        for index in range(count):
+            dut = mock.MagicMock(index=index + 1, dut_name="D%d" % (index + 1), stopped=False)
+            dut.wait_init.return_value = True
+            dut.init_cli = mock.MagicMock(side_effect=lambda: time.sleep(0.3))
+            duts.append(dut)
+        resmixer = ResourceFunctions(mock.MagicMock(), mock.MagicMock(), mock.MagicMock())
+        resmixer.duts = duts
+        resmixer._args = MockArgs()
+        resmixer._args.my_duts = None
+        resmixer._args.sync_start = False
+        resmixer._args.parallel_init = parallel_init
+        resmixer._args.dut_release_timeout = 5
+        resmixer._logger = mock.MagicMock()
+        allocations = mock.MagicMock()
+        allocations.open_dut_connection = mock.MagicMock(side_effect=lambda dut: time.sleep(0.3))
+        return resmixer, duts, allocations
+
+    def test_open_dut_connections_parallel(self):
+        resmixer, duts, allocations = self._create_init_resources(6, 3)
+        start = time.time()
+        resmixer._open_dut_connections(allocations)
+        # Two rounds of opening and two rounds of initializing
+        self.assertLess(time.time() - start, 2.2)
+        self.assertEqual(allocations.open_dut_connection.call_count, 6)
+        for dut in duts:
+            dut.start_dut_thread.assert_called_once()
+            dut.init_cli.assert_called_once()
+            dut.close_dut.assert_not_called()
+            self.assertEqual(dut.Testcase, resmixer._configuration.name)
+
+    def test_open_dut_connections_failure_closes_duts(self):
+        resmixer, duts, allocations = self._create_init_resources(4, 1)
+        duts[1].wait_init.return_value = False
+        with self.assertRaises(DutConnectionError):
+            resmixer._open_dut_connections(allocations)
+        duts[0].init_cli.assert_called_once()
+        for dut in duts[1:]:
+            dut.init_cli.assert_not_called()
+        duts[2].wait_init.assert_not_called()
+        for dut in duts:
+            dut.close_dut.assert_called_once()
+            dut.close_connection.assert_called_once()
+
+        resmixer, duts, allocations = self._create_init_resources(4, 4)
+        allocations.open_dut_connection.side_effect = [None, None, ValueError("fail"), None]
+        with self.assertRaises(ValueError):
+            resmixer._open_dut_connections(allocations)
+        for dut in duts:
+            dut.wait_init.assert_not_called()
+            dut.close_dut.assert_called_once()
+
+        # A dut that failed to open was closed when opening it failed.
+        resmixer, duts, allocations = self._create_init_resources(2, 1)
+
+        def open_fails(dut):
+            if dut is duts[1]:
+                dut.stopped = True
+                raise DutConnectionError("fail")
+        allocations.open_dut_connection.side_effect = open_fails
+        with self.assertRaises(DutConnectionError):
+            resmixer._open_dut_connections(allocations)
+        duts[0].close_dut.assert_called_once()
+        duts[1].close_dut.assert_not_called()
+        duts[1].close_connection.assert_not_called()
+
     def test_dut_count(self):
         resmixer = ResourceFunctions(mock.MagicMock(), mock.MagicMock(), mock.MagicMock())
         resmixer.resource_configuration.count_duts = mock.MagicMock(return_value=1)
@@ -0,0 +1,64 @@
+# pylint: disable=missing-docstring
+
+"""
+Copyright 2019 ARM Limited
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import time
+import unittest
+
+import mock
+
+from icetea_lib.tools.ChunkedWriter import ChunkedWriter
+
+
+class ChunkedWriterTestcase(unittest.TestCase):
+    def test_chunks_in_order(self):
+        written = []
+        writer = ChunkedWriter(written.append, chunk_size=3, chunk_delay=0)
+        writer.start()
+        writer.writelines([b"abcdefg", b"hi"])
+        writer.write(b"jkl")
+        self.assertTrue(writer.stop(timeout=5))
+        self.assertListEqual(written, [b"abc", b"def", b"g", b"hi", b"jkl"])
+
+    def test_stop_interrupts_delay(self):
+        written = []
+        writer = ChunkedWriter(written.append, chunk_size=1, chunk_delay=10)
+        writer.start()
+        writer.write(b"abc")
+        start = time.time()
+        self.assertFalse(writer.flush(timeout=0.1))
+        self.assertFalse(writer.stop(timeout=0))
+        self.assertLess(time.time() - start, 1)
+        self.assertListEqual(written, [b"a"])
+        self.assertEqual(writer.depth, 0)
+
+    def test_write_error(self):
+        on_error = mock.MagicMock()
+        error = IOError("port closed")
+        writer = ChunkedWriter(mock.MagicMock(side_effect=error), chunk_delay=0,
+                               on_error=on_error)
+        writer.start()
+        writer.write(b"abc")
+        self.assertTrue(writer.flush(timeout=5))
+        on_error.assert_called_once_with(error)
+        self.assertEqual(writer.depth, 0)
+        with self.assertRaises(RuntimeError):
+            writer.write(b"abc")
+        writer.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
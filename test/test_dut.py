@@ -15,15 +15,62 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
+import threading
+import time
 import unittest
+from argparse import Namespace
+from collections import deque
 
 import mock
 
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from icetea_lib.CliAsyncResponse import CliAsyncResponse, as_completed, wait_all
 from icetea_lib.CliResponse import CliResponse
 from icetea_lib.DeviceConnectors.Dut import Dut
+from icetea_lib.Events.Generics import EventTypes, Observer
 from icetea_lib.TestStepError import TestStepError, TestStepTimeout
 
 
+class LoopbackDut(Dut):
+    """
+    Dut which records written commands. Lines are received with receive().
+    """
+    def __init__(self, name):
+        super(LoopbackDut, self).__init__(name)
+        self.written = []
+        self.lines = deque()
+        self.hung_up = False
+        self.exited = True  # False when the exit status is known only after a moment
+
+    def writeline(self, data):
+        self.written.append(data)
+
+    def readline(self, timeout=1):
+        try:
+            return self.lines.popleft()
+        except IndexError:
+            if self.hung_up:
+                raise RuntimeError("Errors reading PIPE")
+            return None
+
+    def receive(self, line):
+        self.lines.append(line)
+        Dut.process_dut(self)
+
+    def hang_up(self):
+        self.hung_up = True
+        Dut.process_dut(self)
+
+    def _get_death_reason(self):
+        return "exit status 134" if self.hung_up and self.exited else None
+
+    def _complete_death_reason(self):
+        if self.death_reason is None:
+            self.exited = True
+            self.death_reason = self._get_death_reason()
+
+
 @mock.patch("icetea_lib.DeviceConnectors.Dut.LogManager")
 class DutTestcase(unittest.TestCase):
 
@@ -55,6 +102,267 @@ class DutTestcase(unittest.TestCase):
                 with self.assertRaises(TestStepTimeout):
                     dut._wait_for_exec_ready()  # pylint: disable=protected-access
 
+    def test_execready_deadline(self, mock_log):  # pylint: disable=unused-argument
+        dut = Dut("test_dut")
+        dut.response_received.clear()
+        dut.query_timeout = dut.get_time() + 0.05
+        start = time.time()
+        with self.assertRaises(TestStepTimeout):
+            dut._wait_for_exec_ready()  # pylint: disable=protected-access
+        self.assertLess(time.time() - start, 0.5)
+        self.assertEqual(dut.query_timeout, 0)
+
+    def test_execready_dut_died(self, mock_log):  # pylint: disable=unused-argument
+        dut = Dut("test_dut")
+        dut.response_received.clear()
+        dut.query_timeout = dut.get_time() + 10
+        timer = threading.Timer(0.05, dut._dut_died)  # pylint: disable=protected-access
+        timer.start()
+        start = time.time()
+        with self.assertRaises(TestStepError):
+            dut._wait_for_exec_ready()  # pylint: disable=protected-access
+        self.assertLess(time.time() - start, 0.5)
+        timer.join()
+
+    def _start_loopback_dut(self, pipelined=True, name="D1"):
+        dut = LoopbackDut(name)
+        dut.pipelined = pipelined
+        dut.start_dut_thread()
+        self.addCleanup(dut.close_dut, False)
+        return dut
+
+    def _wait_written(self, dut, count):
+        for _ in range(100):
+            if len(dut.written) >= count:
+                return
+            time.sleep(0.01)
+        self.fail("Commands were not written")
+
+    def test_pipelined_responses_in_order(self, mock_log):  # pylint: disable=unused-argument
+        dut = self._start_loopback_dut()
+        responses = [dut.execute_command(cmd, asynchronous=True, timeout=5)
+                     for cmd in ["first", "second", "third"]]
+        self._wait_written(dut, 3)
+        self.assertListEqual(dut.written, ["first", "second", "third"])
+        for line in ["line1", "retcode: 0", "line2", "retcode: 1", "retcode: 2"]:
+            dut.receive(line)
+        self.assertListEqual([response.retcode for response in responses], [0, 1, 2])
+        self.assertListEqual(responses[0].lines, ["line1", "retcode: 0"])
+        self.assertListEqual(responses[1].lines, ["line2", "retcode: 1"])
+
+    def test_pipelined_sync_command(self, mock_log):  # pylint: disable=unused-argument
+        dut = self._start_loopback_dut()
+        threading.Timer(0.05, dut.receive, args=("retcode: 0", )).start()
+        response = dut.execute_command("cmd", timeout=5)
+        self.assertEqual(response.retcode, 0)
+        self.assertListEqual(dut.written, ["cmd"])
+
+    def test_pipelined_timeout_fails_pipeline(self, mock_log):  # pylint: disable=unused-argument
+        dut = self._start_loopback_dut()
+        first = dut.execute_command("first", asynchronous=True, timeout=0.1)
+        second = dut.execute_command("second", asynchronous=True, timeout=5)
+        start = time.time()
+        with self.assertRaises(TestStepTimeout):
+            first.retcode  # pylint: disable=pointless-statement
+        self.assertLess(time.time() - start, 1)
+        self.assertTrue(second.ready.is_set())
+        self.assertTrue(second.response.timeout)
+        with self.assertRaises(TestStepTimeout):
+            second.retcode  # pylint: disable=pointless-statement
+
+    def test_pipelined_with_command_not_waited(self, mock_log):  # pylint: disable=unused-argument
+        dut = self._start_loopback_dut()
+        first = dut.execute_command("first", asynchronous=True, timeout=5)
+        self._wait_written(dut, 1)
+        # Not waited for, sent after the outstanding command has its response.
+        threading.Timer(0.1, dut.receive, args=("retcode: 0", )).start()
+        self.assertEqual(dut.execute_command("nowait", wait=False).retcode, None)
+        self.assertEqual(first.retcode, 0)
+        self._wait_written(dut, 2)
+        # Response of the command not waited for doesn't go to the next command.
+        threading.Timer(0.1, dut.receive, args=("retcode: 5", )).start()
+        second = dut.execute_command("second", asynchronous=True, timeout=5)
+        self._wait_written(dut, 3)
+        dut.receive("retcode: 0")
+        self.assertEqual(second.retcode, 0)
+        self.assertListEqual(dut.written, ["first", "nowait", "second"])
+
+        # Without a response, the next command is sent after a second.
+        dut.execute_command("silent", wait=False)
+        start = time.time()
+        third = dut.execute_command("third", asynchronous=True, timeout=5)
+        self.assertGreater(time.time() - start, 0.8)
+        self._wait_written(dut, 5)
+        dut.receive("retcode: 0")
+        self.assertEqual(third.retcode, 0)
+
+    def test_pipelined_dut_died(self, mock_log):  # pylint: disable=unused-argument
+        dut = self._start_loopback_dut()
+        threading.Timer(0.05, dut._dut_died).start()  # pylint: disable=protected-access
+        with self.assertRaises(TestStepError):
+            dut.execute_command("cmd", timeout=5)
+
+    def test_dut_died_event(self, mock_log):  # pylint: disable=unused-argument
+        dut = self._start_loopback_dut(pipelined=False)
+        observer = Observer()
+        callback = mock.MagicMock()
+        observer.observe(EventTypes.DUT_DIED, callback, source=dut)
+        self.addCleanup(observer.forget)
+        async_response = dut.execute_command("cmd", asynchronous=True, timeout=50)
+        self._wait_written(dut, 1)
+        dut.receive("last words")
+        start = time.time()
+        dut.hang_up()
+        error = async_response.exception(5)
+        self.assertLess(time.time() - start, 1)
+        self.assertIsInstance(error, TestStepError)
+        self.assertIn("exit status 134", str(error))
+        # Lines received before the hang up are processed first.
+        self.assertIn("last words", dut.traces)
+        dut._dut_died()  # pylint: disable=protected-access
+        callback.assert_called_once_with(dut, "exit status 134")
+        self.assertTrue(dut.died)
+        with self.assertRaises(TestStepError):
+            dut.execute_command("cmd", timeout=50)
+
+    def test_async_response_after_death(self, mock_log):  # pylint: disable=unused-argument
+        for pipelined in (False, True):
+            dut = self._start_loopback_dut(pipelined=pipelined)
+            dut.exited = False
+            async_response = dut.execute_command("cmd", asynchronous=True, timeout=50)
+            self._wait_written(dut, 1)
+            dut.hang_up()
+            self.assertTrue(async_response.wait(5))
+            with self.assertRaises(TestStepError):
+                async_response.retcode  # pylint: disable=pointless-statement
+            with self.assertRaises(TestStepError):
+                str(async_response)
+            self.assertEqual(dut.death_reason, "exit status 134")
+
+    def test_death_reason_completed_by_waiter(self, mock_log):  # pylint: disable=unused-argument
+        dut = self._start_loopback_dut(pipelined=False)
+        dut.exited = False
+        threading.Timer(0.1, dut.hang_up).start()
+        with self.assertRaises(TestStepError) as context:
+            dut.execute_command("cmd", timeout=50)
+        self.assertIn("exit status 134", str(context.exception))
+
+    def test_binary_frames(self, mock_log):  # pylint: disable=unused-argument
+        dut = LoopbackDut("D1")
+        dut.config = {"application": {"framing": "cobs"}}
+        dut.start_dut_thread()
+        self.addCleanup(dut.close_dut, False)
+        observer = Observer()
+        callback = mock.MagicMock()
+        observer.observe(EventTypes.DUT_FRAME_RECEIVED, callback, source=dut)
+        self.addCleanup(observer.forget)
+        self.assertTrue(dut.framed)
+        dut.receive(b"retcode: 0")
+        self.assertEqual(dut.wait_frame(5), b"retcode: 0")
+        callback.assert_called_once_with(dut, b"retcode: 0")
+        self.assertEqual(len(dut.traces), 0)
+
+        respond = lambda data: dut.receive(b"\x00response")
+        with mock.patch.object(dut, "write_raw", side_effect=respond) as mock_write:
+            self.assertEqual(dut.request_frame(b"\x00request"), b"\x00response")
+            mock_write.assert_called_once_with(b"\x01\x08request\x00")
+        with self.assertRaises(TestStepTimeout):
+            dut.wait_frame(0.05)
+        dut.init_cli()
+        self.assertListEqual(dut.written, [])
+        text_dut = Dut("text")
+        self.addCleanup(text_dut.close_dut, False)
+        with self.assertRaises(TestStepError):
+            text_dut.send_frame(b"frame")
+
+    def test_async_response_future(self, mock_log):  # pylint: disable=unused-argument
+        dut = self._start_loopback_dut(pipelined=False)
+        callback = mock.MagicMock()
+        async_response = dut.execute_command("cmd", asynchronous=True, timeout=5)
+        async_response.add_done_callback(callback)
+        self.assertFalse(async_response.done())
+        with self.assertRaises(FutureTimeoutError):
+            async_response.result(0.01)
+        self._wait_written(dut, 1)
+        dut.receive("retcode: 0")
+        # Response is fulfilled by the dut thread, without waiting for it.
+        for _ in range(100):
+            if async_response.done():
+                break
+            time.sleep(0.01)
+        callback.assert_called_once_with(async_response)
+        self.assertEqual(async_response.result(0).retcode, 0)
+        self.assertIsNone(async_response.exception())
+        self.assertFalse(async_response.cancel())
+
+    def test_async_response_timeout(self, mock_log):  # pylint: disable=unused-argument
+        dut = self._start_loopback_dut(pipelined=False)
+        async_response = dut.execute_command("cmd", asynchronous=True, timeout=0.1)
+        self.assertIsInstance(async_response.exception(), TestStepTimeout)
+        with self.assertRaises(TestStepTimeout):
+            async_response.result()
+        self.assertTrue(async_response.response.timeout)
+
+    def test_async_response_set_concurrently(self, mock_log):  # pylint: disable=unused-argument
+        async_response = CliAsyncResponse(mock.MagicMock())
+        start = threading.Event()
+        errors = []
+
+        def complete(error):
+            start.wait()
+            try:
+                async_response.set_response(CliResponse(), error=error)
+            except Exception as exc:  # pylint: disable=broad-except
+                errors.append(exc)
+        threads = [threading.Thread(target=complete, args=(None if i % 2 else TestStepTimeout(),))
+                   for i in range(8)]
+        for thread in threads:
+            thread.start()
+        start.set()
+        for thread in threads:
+            thread.join()
+        self.assertListEqual(errors, [])
+        self.assertTrue(async_response.done())
+        self.assertIs(async_response.future.exception(0), async_response.error)
+
+    def test_as_completed_duts(self, mock_log):  # pylint: disable=unused-argument
+        duts = [self._start_loopback_dut(pipelined=pipelined, name="D%d" % i)
+                for i, pipelined in enumerate([False, True, False])]
+        responses = [dut.execute_command("cmd", asynchronous=True, timeout=5) for dut in duts]
+        for dut in duts:
+            self._wait_written(dut, 1)
+        for index in (2, 0, 1):
+            threading.Timer(0.05 * index, duts[index].receive, args=("retcode: 0", )).start()
+        completed = list(as_completed(responses, timeout=5))
+        self.assertListEqual(completed, [responses[0], responses[1], responses[2]])
+        self.assertTrue(wait_all(responses, timeout=0))
+        slow = duts[0].execute_command("cmd", asynchronous=True, timeout=0.2)
+        self.assertFalse(wait_all([slow], timeout=0.05))
+        self.assertTrue(wait_all([slow]))
+        self.assertIsInstance(slow.exception(0), TestStepTimeout)
+
+    def test_direct_io_engine(self, mock_log):  # pylint: disable=unused-argument
+        dut = LoopbackDut("D1")
+        dut.params = Namespace(io_engine="direct")
+        dut.start_dut_thread()
+        self.addCleanup(dut.close_dut, False)
+        threads = []
+        observer = Observer()
+        observer.observe(EventTypes.DUT_LINE_RECEIVED,
+                         lambda ref, line: threads.append(threading.current_thread()))
+        self.addCleanup(observer.forget)
+        dut.lines.append("unrequested line")
+        Dut.process_received(dut)
+        # Line was processed in the calling thread, without the dut thread.
+        self.assertListEqual(list(dut.traces), ["unrequested line"])
+        self.assertListEqual(threads, [threading.current_thread()])
+        async_response = dut.execute_command("cmd", asynchronous=True, timeout=5)
+        self._wait_written(dut, 1)
+        dut.lines.append("retcode: 0")
+        Dut.process_received(dut)
+        self.assertTrue(async_response.done())
+        self.assertEqual(async_response.retcode, 0)
+
     def test_initclihuman(self, mock_log):  # pylint: disable=unused-argument
         dut = Dut("test_Dut")
         with mock.patch.object(dut, "execute_command") as m_com:
@@ -121,6 +429,34 @@ class DutTestcase(unittest.TestCase):
             self.assertEqual(len(dut.traces), prior_len + 1)
             self.assertIsNone(resp)
 
+    def test_line_classifier(self, mock_log):
+        dut = Dut("test")
+        dut.config = {"application": {"line_classifier": {"retcode": r"^(?:OK|ERR) (-?\d+)$",
+                                                          "prompt": r"^> $"}}}
+        with mock.patch.object(dut, "readline") as mocked_readline:
+            mocked_readline.side_effect = ["> ", "output", "retcode: 0", "ERR -3"]
+            responses = [dut._read_response() for _ in range(4)]
+        self.assertListEqual(responses[:3], [None, None, None])
+        self.assertEqual(responses[3].retcode, -3)
+        self.assertListEqual(responses[3].lines, ["output", "retcode: 0", "ERR -3"])
+        self.assertEqual(dut.check_retcode("cmd tasklet init"), -1)
+
+    def test_prepare_reuse(self, mock_log):
+        dut = Dut("test")
+        dut.trace_ring_size = 5
+        dut.traces.append("previous test case")
+        dut.response_traces = ["partial response"]
+        dut.prepare_reuse()
+        self.assertEqual(len(dut.traces), 0)
+        self.assertEqual(dut.trace_ring_size, 5)
+        self.assertListEqual(dut.response_traces, [])
+        with mock.patch.object(dut, "execute_command") as mocked_execute:
+            mocked_execute.return_value = mock.MagicMock(retcode=0)
+            self.assertTrue(dut.check_health(["reset"], "ping"))
+            mocked_execute.assert_has_calls([mock.call("reset"), mock.call("ping")])
+            mocked_execute.side_effect = TestStepTimeout("timeout")
+            self.assertFalse(dut.check_health(None, "ping"))
+
     def test_wait_for_exec_ready(self, mock_log):
         dut_obj = Dut("test")
         dut_obj.get_time = mock.MagicMock(return_value=10)
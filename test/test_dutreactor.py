@@ -0,0 +1,188 @@
+# pylint: disable=missing-docstring,protected-access
+
+"""
+Copyright 2019 ARM Limited
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import unittest
+from threading import Event, Thread
+
+from icetea_lib.DeviceConnectors.DutReactor import DutReactor, reactor_available
+from icetea_lib.tools.Framers import LineFramer
+
+
+class FakeDut(object):
+    def __init__(self, name, expected):
+        self.name = name
+        self.stream = None
+        self.lines = []
+        self.expected = expected
+        self.done = Event()
+
+    def process_signal(self):
+        line = self.stream.readline()
+        if line is not None:
+            self.lines.append(line)
+        if len(self.lines) >= self.expected:
+            self.done.set()
+
+
+class LineFramerTestcase(unittest.TestCase):
+    def test_partial_lines(self):
+        framer = LineFramer()
+        self.assertListEqual(framer.feed(b"foo"), [])
+        self.assertEqual(framer.peek(), "foo")
+        self.assertListEqual(framer.feed(b"bar\nbaz\r\nqu"), ["foobar", "baz\r"])
+        self.assertEqual(len(framer), 2)
+        framer.reset()
+        self.assertEqual(len(framer), 0)
+
+    def test_invalid_bytes_replaced(self):
+        framer = LineFramer()
+        lines = framer.feed(b"a\xffb\n")
+        self.assertEqual(len(lines), 1)
+        self.assertTrue(lines[0].startswith("a"))
+
+
+@unittest.skipIf(not reactor_available(), "Reactor not supported on this platform")
+class DutReactorTestcase(unittest.TestCase):
+    def setUp(self):
+        self.reactor = DutReactor()
+        self.reactor.start()
+        self.fds = []
+
+    def tearDown(self):
+        self.reactor.stop()
+        for file_descr in self.fds:
+            try:
+                os.close(file_descr)
+            except OSError:
+                pass
+
+    def _pipe(self):
+        read_fd, write_fd = os.pipe()
+        self.fds.extend([read_fd, write_fd])
+        return read_fd, write_fd
+
+    def test_lines_dispatched_to_duts(self):
+        duts = []
+        for index in range(5):
+            read_fd, write_fd = self._pipe()
+            dut = FakeDut("D%d" % index, 3)
+            dut.stream = self.reactor.create_stream(
+                read_fd, callback=lambda dut=dut: self.reactor.signal(dut))
+            dut.stream.start()
+            duts.append((dut, write_fd))
+        for dut, write_fd in duts:
+            os.write(write_fd, b"one\ntw")
+            os.write(write_fd, b"o\nthree\n")
+        for dut, _ in duts:
+            self.assertTrue(dut.done.wait(5))
+            self.assertListEqual(dut.lines, ["one", "two", "three"])
+
+    def test_eof_marks_stream_broken(self):
+        read_fd, write_fd = self._pipe()
+        broken = Event()
+        stream = self.reactor.create_stream(read_fd, callback=broken.set)
+        stream.start()
+        os.close(write_fd)
+        self.assertTrue(broken.wait(5))
+        self.assertTrue(stream.has_error())
+        self.assertTrue(stream.closed)
+        with self.assertRaises(RuntimeError):
+            stream.readline()
+
+    def test_queued_lines_readable_before_error(self):
+        read_fd, write_fd = self._pipe()
+        broken = Event()
+        stream = self.reactor.create_stream(read_fd, callback=None)
+        stream.set_error = lambda: (setattr(stream, "_has_error", True), broken.set())
+        stream.start()
+        os.write(write_fd, b"last\n")
+        os.close(write_fd)
+        self.assertTrue(broken.wait(5))
+        self.assertEqual(stream.readline(), "last")
+        with self.assertRaises(RuntimeError):
+            stream.readline()
+
+    def test_failing_dut_does_not_stop_reactor(self):
+        class BrokenDut(object):
+            name = "broken"
+
+            def process_signal(self):
+                raise ValueError("broken")
+
+        read_fd, write_fd = self._pipe()
+        dut = FakeDut("D1", 1)
+        dut.stream = self.reactor.create_stream(read_fd,
+                                                callback=lambda: self.reactor.signal(dut))
+        self.reactor.signal(BrokenDut())
+        dut.stream.start()
+        os.write(write_fd, b"alive\n")
+        self.assertTrue(dut.done.wait(5))
+        self.assertListEqual(dut.lines, ["alive"])
+
+    def test_remove_stream_waits_for_reactor(self):
+        entered = Event()
+        release = Event()
+
+        class BusyDut(object):
+            name = "busy"
+
+            def process_signal(self):
+                entered.set()
+                release.wait(5)
+
+        read_fd, write_fd = self._pipe()
+        stream = self.reactor.create_stream(read_fd)
+        stream.start()
+        self.reactor.signal(BusyDut())
+        self.assertTrue(entered.wait(5))
+        remover = Thread(target=stream.stop)
+        remover.start()
+        remover.join(0.2)
+        # The reactor is busy, so the stream is still registered and stop() waits.
+        self.assertTrue(remover.is_alive())
+        self.assertFalse(stream.unregistered.is_set())
+        os.write(write_fd, b"ignored\n")
+        release.set()
+        remover.join(5)
+        self.assertFalse(remover.is_alive())
+        self.assertTrue(stream.unregistered.is_set())
+        self.assertNotIn(read_fd, self.reactor._selector.get_map())  # pylint: disable=protected-access
+        self.assertIsNone(stream.readline())
+
+    def test_stop_from_reactor_thread(self):
+        stopped = Event()
+        reactor = self.reactor
+
+        class LastDut(object):
+            name = "last"
+
+            def process_signal(self):
+                # Closing the last dut stops the reactor from its own thread.
+                reactor.stop()
+                stopped.set()
+
+        reactor.signal(LastDut())
+        self.assertTrue(stopped.wait(5))
+        thread = reactor._thread  # pylint: disable=protected-access
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertTrue(reactor._closed)  # pylint: disable=protected-access
+
+
+if __name__ == '__main__':
+    unittest.main()
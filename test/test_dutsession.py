@@ -0,0 +1,75 @@
+# pylint: disable=missing-docstring,protected-access
+"""
+Copyright 2019 ARM Limited
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import unittest
+
+import mock
+
+from icetea_lib.ResourceProvider.DutSession import DutSession
+from icetea_lib.ResourceProvider.ResourceConfig import ResourceConfig
+
+
+def resolve(requirements):
+    config = ResourceConfig()
+    config.resolve_configuration({"requirements": {"duts": requirements}})
+    return config
+
+
+class DutSessionTestcase(unittest.TestCase):
+    def setUp(self):
+        self.release = mock.MagicMock()
+        self.session = DutSession(mock.MagicMock(), self.release)
+
+    def test_key_from_requirements(self):
+        key = DutSession.get_key(resolve({"*": {"count": 2, "type": "process"}}))
+        self.assertEqual(key, DutSession.get_key(resolve({"*": {"type": "process", "count": 2}})))
+        self.assertNotEqual(key, DutSession.get_key(resolve({"*": {"count": 1,
+                                                                   "type": "process"}})))
+        self.assertNotEqual(key, DutSession.get_key(
+            resolve({"*": {"count": 2, "type": "process"}, "2": {"nick": "router"}})))
+
+    def test_take_matching_key(self):
+        duts = [mock.MagicMock()]
+        allocations = mock.MagicMock()
+        self.session.park("a", allocations, duts)
+        self.assertEqual(self.session.take("a"), (allocations, duts))
+        self.assertIsNone(self.session.take("a"))
+        duts[0].close_dut.assert_not_called()
+        self.assertDictEqual(self.session.stats(), {"hits": 1, "misses": 1, "parked": 1})
+
+    def test_other_key_closes_duts(self):
+        duts = [mock.MagicMock(), mock.MagicMock()]
+        duts[0].close_dut.side_effect = RuntimeError("close failed")
+        self.session.park("a", mock.MagicMock(), duts)
+        self.assertIsNone(self.session.take("b"))
+        for dut in duts:
+            dut.close_dut.assert_called_once()
+            self.release.assert_any_call(dut)
+        duts[1].close_connection.assert_called_once()
+        self.assertIsNone(self.session.take("a"))
+
+    def test_close(self):
+        dut = mock.MagicMock()
+        self.session.park("a", mock.MagicMock(), [dut])
+        self.session.close()
+        dut.close_connection.assert_called_once()
+        self.release.assert_called_once_with(dut)
+        self.session.close()
+        self.release.assert_called_once_with(dut)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -26,3 +26,25 @@ class EnhancedSerialTests(unittest.TestCase):
             self.assertIsNone(ens.readline(timeout=0))
             self.assertIsNone(ens.readline(timeout=0))
             self.assertIsNone(ens.readline(timeout=0))
+
+    def test_readlines_batch(self):
+        with mock.patch.object(EnhancedSerial, "read") as mock_read:
+            ens = EnhancedSerial()
+            mock_read.side_effect = [b"line1\nline2\nli", b"ne3\n"]
+            self.assertListEqual(ens.readlines(timeout=0), ["line1\n", "line2\n"])
+            self.assertEqual(ens.peek(), "li")
+            self.assertListEqual(ens.readlines(timeout=0), ["line3\n"])
+
+    def test_readline_split_multibyte(self):
+        with mock.patch.object(EnhancedSerial, "read") as mock_read:
+            ens = EnhancedSerial()
+            data = u"\u00e4\u00f6\n".encode("utf-8")
+            mock_read.side_effect = [data[:1], data[1:]]
+            self.assertEqual(ens.readline(timeout=1), u"\u00e4\u00f6\n")
+
+    def test_readline_invalid_bytes_kept(self):
+        with mock.patch.object(EnhancedSerial, "read") as mock_read:
+            ens = EnhancedSerial()
+            mock_read.side_effect = [b"first\n\xff\nlast\n"]
+            self.assertListEqual(ens.readlines(timeout=0), ["first\n", u"\ufffd\n", "last\n"])
+
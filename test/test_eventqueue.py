@@ -0,0 +1,134 @@
+# pylint: disable=missing-docstring
+
+"""
+Copyright 2019 ARM Limited
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import unittest
+from threading import Event as EventFlag, current_thread
+
+import mock
+
+from icetea_lib.Events.EventQueue import EventQueue
+from icetea_lib.Events.Generics import EventTypes, Event, Observer, set_event_queue
+
+
+class EventQueueTestcase(unittest.TestCase):
+    def setUp(self):
+        self.queue = None
+
+    def tearDown(self):
+        if self.queue is not None:
+            self.queue.stop()
+
+    def _start(self, **kwargs):
+        self.queue = EventQueue(**kwargs)
+        self.queue.start()
+        return self.queue
+
+    def test_order_per_key(self):
+        queue = self._start(workers=3)
+        received = {0: [], 1: [], 2: [], 3: []}
+        for i in range(200):
+            queue.put(i % 4, received[i % 4].append, (i, ))
+        queue.flush()
+        for key, values in received.items():
+            self.assertListEqual(values, list(range(key, 200, 4)))
+        stats = queue.stats()
+        self.assertEqual(stats["delivered"], 200)
+        self.assertEqual(stats["dropped"], 0)
+        self.assertEqual(stats["depth"], 0)
+
+    def test_drop_when_full(self):
+        queue = self._start(workers=1, queue_size=2, policy="drop")
+        release = EventFlag()
+        queue.put(0, release.wait, ())
+        results = [queue.put(0, lambda: None, ()) for _ in range(5)]
+        release.set()
+        queue.flush()
+        self.assertIn(False, results)
+        stats = queue.stats()
+        self.assertEqual(stats["dropped"], results.count(False))
+        self.assertEqual(stats["delivered"], 1 + results.count(True))
+        self.assertLessEqual(stats["max_depth"], 2)
+
+    def test_put_from_worker_does_not_block(self):
+        queue = self._start(workers=1, queue_size=1)
+        received = []
+
+        def emit():
+            for i in range(3):
+                queue.put(0, received.append, (i, ))
+        queue.put(0, emit, ())
+        queue.flush()
+        self.assertListEqual(sorted(received), [0, 1, 2])
+
+    def test_callback_exception_logged(self):
+        logger = mock.MagicMock()
+        queue = self._start(workers=1, logger=logger)
+        received = []
+        queue.put(0, lambda: 1 / 0, ())
+        queue.put(0, received.append, (1, ))
+        queue.flush()
+        logger.exception.assert_called_once()
+        self.assertListEqual(received, [1])
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            EventQueue(policy="wait")
+
+
+class AsyncEventTestcase(unittest.TestCase):
+    def setUp(self):
+        self.queue = EventQueue(workers=2)
+        self.queue.start()
+        set_event_queue(self.queue)
+
+    def tearDown(self):
+        set_event_queue(None)
+        self.queue.stop()
+
+    def test_observers_called_in_workers(self):
+        threads = []
+        lines = []
+        obs = Observer()
+
+        def callback(ref, line):  # pylint: disable=unused-argument
+            threads.append(current_thread())
+            lines.append(line)
+        obs.observe(EventTypes.DUT_LINE_RECEIVED, callback)
+        source = object()
+        for i in range(50):
+            Event(EventTypes.DUT_LINE_RECEIVED, source, "line%d" % i)
+        self.queue.flush()
+        obs.forget()
+        self.assertListEqual(lines, ["line%d" % i for i in range(50)])
+        self.assertNotIn(current_thread(), threads)
+
+    def test_forgotten_observer_not_called(self):
+        obs = Observer()
+        callback = mock.MagicMock()
+        release = EventFlag()
+        obs.observe(EventTypes.DUT_LINE_RECEIVED, callback)
+        # Block the worker of obs until it has forgotten the event.
+        self.queue.put(id(obs), release.wait, ())
+        Event(EventTypes.DUT_LINE_RECEIVED, "data")
+        obs.forget()
+        release.set()
+        self.queue.flush()
+        callback.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
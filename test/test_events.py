@@ -136,6 +136,52 @@ class EventTestcase(unittest.TestCase):
         event = Event(EventTypes.DUT_LINE_RECEIVED, "data")
         callback.assert_called_once_with("data")
 
+    def test_observer_source(self):
+        source = mock.MagicMock()
+        other = mock.MagicMock()
+        calls = []
+        obs_any = Observer()
+        obs_any.observe(EventTypes.DUT_LINE_RECEIVED, lambda ref, data: calls.append("any"))
+        obs_source = Observer()
+        obs_source.observe(EventTypes.DUT_LINE_RECEIVED,
+                           lambda ref, data: calls.append("source"), source=source)
+        obs_last = Observer()
+        obs_last.observe(EventTypes.DUT_LINE_RECEIVED, lambda ref, data: calls.append("last"))
+        Event(EventTypes.DUT_LINE_RECEIVED, other, "data")
+        self.assertListEqual(calls, ["any", "last"])
+        del calls[:]
+        Event(EventTypes.DUT_LINE_RECEIVED, source, "data")
+        self.assertListEqual(calls, ["any", "source", "last"])
+        for obs in (obs_any, obs_source, obs_last):
+            obs.forget()
+        del calls[:]
+        Event(EventTypes.DUT_LINE_RECEIVED, source, "data")
+        self.assertListEqual(calls, [])
+        sources = Observer._index.get(EventTypes.DUT_LINE_RECEIVED, {})  # pylint: disable=protected-access
+        self.assertNotIn(id(source), sources)
+
+    def test_forget_during_event(self):
+        first = Observer()
+        second = Observer()
+        callback = mock.MagicMock()
+        first.observe(EventTypes.DUT_LINE_RECEIVED, lambda data: second.forget())
+        second.observe(EventTypes.DUT_LINE_RECEIVED, callback)
+        Event(EventTypes.DUT_LINE_RECEIVED, "data")
+        callback.assert_not_called()
+        first.forget()
+
+    @mock.patch("icetea_lib.Events.EventMatcher.re")
+    def test_regex_compiled_once(self, mock_re):
+        mock_re.compile.return_value.search.return_value = None
+        event_object = mock.MagicMock()
+        event_matcher = EventMatcher(EventTypes.DUT_LINE_RECEIVED, "regex:test[0-9]",
+                                     event_object)
+        for _ in range(3):
+            Event(EventTypes.DUT_LINE_RECEIVED, event_object, "line")
+        mock_re.compile.assert_called_once_with("test[0-9]")
+        self.assertEqual(mock_re.compile.return_value.search.call_count, 3)
+        event_matcher.forget()
+
 
 if __name__ == '__main__':
     unittest.main()
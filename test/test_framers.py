@@ -0,0 +1,87 @@
+# pylint: disable=missing-docstring
+
+"""
+Copyright 2019 ARM Limited
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import unittest
+
+from icetea_lib.tools.Framers import CobsFramer, LengthPrefixFramer, LineFramer, SlipFramer
+from icetea_lib.tools.Framers import create_framer
+
+PAYLOADS = [b"", b"\x00", b"text", b"\xc0\xdb\xdc\xdd\x00\x00", bytes(bytearray(range(256))),
+            b"\x01" * 254, b"\x01" * 255 + b"\x00" + b"\x02" * 600]
+
+
+def feed_bytes(framer, data):
+    frames = []
+    for index in range(len(data)):
+        frames.extend(framer.feed(data[index:index + 1]))
+    return frames
+
+
+class FramersTestcase(unittest.TestCase):
+
+    def _roundtrip(self, framer, skip_empty=False):
+        payloads = [payload for payload in PAYLOADS if payload or not skip_empty]
+        data = b"".join([framer.encode(payload) for payload in payloads])
+        self.assertListEqual(framer.feed(data), payloads)
+        self.assertListEqual(feed_bytes(framer, data), payloads)
+        self.assertEqual(len(framer), 0)
+        self.assertEqual(framer.errors, 0)
+
+    def test_slip(self):
+        framer = SlipFramer()
+        # SLIP can not represent empty frames, END bytes only separate frames.
+        self._roundtrip(framer, skip_empty=True)
+        self.assertEqual(framer.encode(b"\xc0\xdb"), b"\xc0\xdb\xdc\xdb\xdd\xc0")
+        self.assertListEqual(framer.feed(b"\xc0bad\xdb\x01\xc0ok\xc0"), [b"ok"])
+        self.assertEqual(framer.errors, 1)
+
+    def test_cobs(self):
+        framer = CobsFramer()
+        self._roundtrip(framer, skip_empty=True)
+        self.assertEqual(framer.encode(b"\x11\x22\x00\x33"), b"\x03\x11\x22\x02\x33\x00")
+        self.assertEqual(framer.encode(b""), b"\x01\x00")
+        self.assertListEqual(framer.feed(b"\x05ab\x00\x03ok\x00"), [b"ok"])
+        self.assertEqual(framer.errors, 1)
+
+    def test_length_prefix(self):
+        self._roundtrip(LengthPrefixFramer())
+        self._roundtrip(LengthPrefixFramer(header_size=4, byteorder="little"))
+        framer = LengthPrefixFramer(header_size=1)
+        self.assertEqual(framer.encode(b"ab"), b"\x02ab")
+        with self.assertRaises(ValueError):
+            framer.encode(b"x" * 256)
+        framer = LengthPrefixFramer(max_size=4)
+        self.assertListEqual(framer.feed(b"\x00\x05abcde"), [])
+        self.assertEqual(framer.errors, 1)
+        self.assertEqual(len(framer), 0)
+        self.assertListEqual(framer.feed(b"\x00\x02ok\x00"), [b"ok"])
+        self.assertEqual(framer.peek(), b"\x00")
+
+    def test_create_framer(self):
+        self.assertIsInstance(create_framer(), LineFramer)
+        self.assertIsInstance(create_framer("line"), LineFramer)
+        self.assertIsInstance(create_framer("slip"), SlipFramer)
+        framer = create_framer({"type": "length", "header_size": 4})
+        self.assertIsInstance(framer, LengthPrefixFramer)
+        self.assertEqual(framer.encode(b"a"), b"\x00\x00\x00\x01a")
+        for framing in ("hdlc", {"type": "length", "header_size": 3}, {"type": "cobs", "a": 1}):
+            with self.assertRaises(ValueError):
+                create_framer(framing)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -19,13 +19,15 @@ limitations under the License.
 import signal
 import subprocess
 import sys
+import threading
 import unittest
 import platform
 import os
+import time
 import mock
 
 from icetea_lib.IceteaManager import ExitCodes
-from icetea_lib.tools.GenericProcess import GenericProcess
+from icetea_lib.tools.GenericProcess import GenericProcess, NonBlockingStreamReader
 from icetea_lib.TestStepError import TestStepError
 
 
@@ -78,12 +80,14 @@ class GenericProcessTestcase(unittest.TestCase):
 
 @unittest.skipIf(sys.platform == 'win32', "process tests don't support Windows.")
 class GenericProcessUnittests(unittest.TestCase):
+    def tearDown(self):
+        # Tests replace GenericProcess.proc with a PropertyMock, restore the instance attribute.
+        if "proc" in GenericProcess.__dict__:
+            del GenericProcess.proc
 
     @mock.patch("icetea_lib.tools.GenericProcess.os")
-    @mock.patch("icetea_lib.tools.GenericProcess.time")
-    def test_stop_process(self, mocked_time, mocked_os):
+    def test_stop_process(self, mocked_os):
         mocked_os.killpg = mock.MagicMock()
-        mocked_time.sleep = mock.MagicMock(return_value=1)
         my_process = GenericProcess("test", logger=MockLogger())
         my_process.read_thread = mock.MagicMock()
         my_process.read_thread.stop = mock.MagicMock()
@@ -92,29 +96,26 @@ class GenericProcessUnittests(unittest.TestCase):
         mocked_proc = mock.MagicMock()
         pid = 11111111
         type(mocked_proc).pid = mock.PropertyMock(return_value=pid)
-        mocked_proc.poll = mock.MagicMock()
-        mocked_proc.poll.side_effect = [None, None, None, None, None,
-                                        None, None, None, None, None,
-                                        None, None, None, None, 0, 0, 0, 0, 0]
+        my_process._wait_exit = mock.MagicMock(side_effect=[None, None, 0])
         type(my_process).proc = mock.PropertyMock(return_value=mocked_proc)
         my_process.stop_process()
         self.assertEqual(mocked_os.killpg.call_count, 3)
         mocked_os.killpg.assert_has_calls([mock.call(pid, signal.SIGINT),
                                            mock.call(pid, signal.SIGTERM),
                                            mock.call(pid, signal.SIGKILL)])
+        my_process._wait_exit.assert_has_calls([mock.call(5), mock.call(5), mock.call(5)])
 
         my_process = GenericProcess("test", logger=MockLogger())
         my_process.read_thread = mock.MagicMock()
         my_process.read_thread.stop = mock.MagicMock()
+        my_process._wait_exit = mock.MagicMock(return_value=0)
         my_process.stop_process()
         my_process.read_thread.stop.assert_called_once()
 
         mocked_proc = mock.MagicMock()
         pid = 11111111
         type(mocked_proc).pid = mock.PropertyMock(return_value=pid)
-        mocked_proc.poll = mock.MagicMock()
-        mocked_proc.poll.side_effect = [None, None, None, None, None, None,
-                                        None, None, None, 0, 0, 0]
+        my_process._wait_exit = mock.MagicMock(side_effect=[None, 0])
         type(my_process).proc = mock.PropertyMock(return_value=mocked_proc)
         mocked_os.killpg.reset_mock()
         my_process.stop_process()
@@ -122,6 +123,32 @@ class GenericProcessUnittests(unittest.TestCase):
         mocked_os.killpg.assert_has_calls([mock.call(pid, signal.SIGINT),
                                            mock.call(pid, signal.SIGTERM)])
 
+    @mock.patch("icetea_lib.tools.GenericProcess.os")
+    def test_stop_process_deadline(self, mocked_os):
+        mocked_os.killpg = mock.MagicMock()
+        my_process = GenericProcess("test", logger=MockLogger())
+        mocked_proc = mock.MagicMock()
+        type(mocked_proc).pid = mock.PropertyMock(return_value=11111111)
+        my_process._wait_exit = mock.MagicMock(side_effect=[None, None, 0])
+        type(my_process).proc = mock.PropertyMock(return_value=mocked_proc)
+        my_process.stop_process(timeout=0)
+        self.assertEqual(mocked_os.killpg.call_count, 3)
+        # SIGINT and SIGTERM get no time after the deadline, SIGKILL is still waited for.
+        my_process._wait_exit.assert_has_calls([mock.call(0), mock.call(0), mock.call(5)])
+
+    def test_wait_exit(self):
+        my_process = Process("test", logger=MockLogger())
+        my_process.proc = subprocess.Popen([sys.executable, "-c", "import sys; sys.exit(3)"])
+        start = time.time()
+        self.assertEqual(my_process._wait_exit(5), 3)
+        self.assertLess(time.time() - start, 1)
+        my_process.proc = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(5)"])
+        try:
+            self.assertIsNone(my_process._wait_exit(0.1))
+        finally:
+            my_process.proc.kill()
+            my_process.proc.wait()
+
     @mock.patch("icetea_lib.tools.GenericProcess.os", create=True)
     def test_stop_process_errors(self, mocked_os):
         mocked_os.killpg = mock.MagicMock(side_effect=OSError)
@@ -207,5 +234,146 @@ class GenericProcessUnittests(unittest.TestCase):
         self.assertEqual(my_process.valgrind_extra_params, 4)
 
 
+class Process(GenericProcess):
+    # Tests above replace GenericProcess.proc with a PropertyMock.
+    proc = None
+
+
+def wait_for(condition, timeout=5):
+    end = time.time() + timeout
+    while not condition() and time.time() < end:
+        time.sleep(0.01)
+    return condition()
+
+
+@unittest.skipIf(sys.platform == 'win32', "process tests don't support Windows.")
+class NonBlockingStreamReaderTests(unittest.TestCase):
+
+    def setUp(self):
+        self.pipes = []
+
+    def tearDown(self):
+        for read_fd, write_fd in self.pipes:
+            for file_descr in (read_fd, write_fd):
+                try:
+                    os.close(file_descr)
+                except OSError:
+                    pass
+
+    def _pipe(self):
+        pipe = os.pipe()
+        self.pipes.append(pipe)
+        return pipe
+
+    def test_lines_from_several_streams(self):
+        readers = []
+        callbacks = []
+        for index in range(3):
+            read_fd, write_fd = self._pipe()
+            callback = mock.MagicMock()
+            reader = NonBlockingStreamReader(read_fd, callback, label="stream%d" % index)
+            reader.start()
+            readers.append((reader, write_fd))
+            callbacks.append(callback)
+        for index, (reader, write_fd) in enumerate(readers):
+            os.write(write_fd, "line{}\nsecond\n".format(index).encode("ascii"))
+        for index, (reader, write_fd) in enumerate(readers):
+            self.assertTrue(wait_for(lambda cb=callbacks[index]: cb.call_count == 2))
+            self.assertEqual(reader.readline(), "line{}".format(index))
+            self.assertEqual(reader.readline(), "second")
+            self.assertIsNone(reader.readline())
+            self.assertEqual(reader.label, "stream{}".format(index))
+        # Streams are unregistered one by one, the others keep working.
+        readers[0][0].stop()
+        os.write(readers[1][1], b"after stop\n")
+        self.assertTrue(wait_for(lambda: callbacks[1].call_count == 3))
+        self.assertEqual(readers[1][0].readline(), "after stop")
+        for reader, _ in readers[1:]:
+            reader.stop()
+        self.assertIsNone(NonBlockingStreamReader._rt)
+
+    def test_start_racing_last_stop(self):
+        for _ in range(50):
+            first = NonBlockingStreamReader(self._pipe()[0])
+            first.start()
+            read_fd, write_fd = self._pipe()
+            callback = mock.MagicMock()
+            second = NonBlockingStreamReader(read_fd, callback)
+            stopper = threading.Thread(target=first.stop)
+            stopper.start()
+            second.start()
+            stopper.join(5)
+            self.assertFalse(stopper.is_alive())
+            # The stream started while the last one was stopped is still read.
+            os.write(write_fd, b"line\n")
+            self.assertTrue(wait_for(lambda: callback.call_count == 1))
+            second.stop()
+        self.assertIsNone(NonBlockingStreamReader._rt)
+
+    def test_utf8_split_between_reads(self):
+        read_fd, write_fd = self._pipe()
+        callback = mock.MagicMock()
+        reader = NonBlockingStreamReader(read_fd, callback)
+        reader.start()
+        data = u"m\u00e4\u20ac\n".encode("utf-8")
+        os.write(write_fd, data[:2])
+        self.assertTrue(wait_for(lambda: reader.peek() != u""))
+        os.write(write_fd, data[2:])
+        self.assertTrue(wait_for(lambda: callback.call_count == 1))
+        self.assertEqual(reader.readline(), u"m\u00e4\u20ac")
+        reader.stop()
+
+    def test_end_of_stream(self):
+        read_fd, write_fd = self._pipe()
+        callback = mock.MagicMock()
+        reader = NonBlockingStreamReader(read_fd, callback)
+        reader.start()
+        os.write(write_fd, b"last line without newline")
+        os.close(write_fd)
+        self.assertTrue(wait_for(reader.has_error))
+        self.assertEqual(reader.readline(), "last line without newline")
+        with self.assertRaises(RuntimeError):
+            reader.readline()
+        reader.stop()
+
+    def test_stderr_captured(self):
+        logger = mock.MagicMock()
+        my_process = Process("test", logger=logger)
+        my_process.ignore_return_code = True
+        script = "import sys; sys.stderr.write('error line\\n'); sys.stderr.flush(); " \
+                 "sys.stdout.write('output line\\n'); sys.stdout.flush(); sys.stdin.read()"
+        callback = mock.MagicMock()
+        my_process.start_process([sys.executable, "-c", script], processing_callback=callback)
+        try:
+            self.assertTrue(wait_for(lambda: callback.call_count == 1))
+            self.assertEqual(my_process.readline(), "output line")
+            self.assertIsNone(my_process.readline())
+            self.assertEqual(my_process.stderr_thread.label, "stderr")
+            self.assertTrue(wait_for(lambda: mock.call("error line", extra={'type': 'E<-'})
+                                     in logger.info.call_args_list))
+        finally:
+            my_process.stop_process()
+        self.assertIsNone(my_process.stderr_thread)
+
+    def test_pty(self):
+        my_process = Process("test", logger=mock.MagicMock())
+        my_process.ignore_return_code = True
+        my_process.use_pty()
+        # Output is not flushed, the process relies on its stdout being line buffered.
+        script = "import sys; print(sys.stdout.isatty()); " \
+                 "print(sys.stdin.readline().strip() + ' back'); sys.stdin.read()"
+        callback = mock.MagicMock()
+        my_process.start_process([sys.executable, "-c", script], processing_callback=callback)
+        try:
+            self.assertTrue(wait_for(lambda: callback.call_count == 1))
+            self.assertEqual(my_process.readline(), "True")
+            my_process.writeline("hello", crlf="\n")
+            self.assertTrue(wait_for(lambda: callback.call_count == 2))
+            self.assertEqual(my_process.readline(), "hello back")
+            self.assertIsNone(my_process.readline())
+        finally:
+            my_process.stop_process()
+
+
 if __name__ == '__main__':
     unittest.main()
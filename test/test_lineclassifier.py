@@ -0,0 +1,88 @@
+# pylint: disable=missing-docstring
+
+"""
+Copyright 2019 ARM Limited
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import unittest
+
+from icetea_lib.DeviceConnectors.LineClassifier import LineClass, LineClassifier
+
+
+class LineClassifierTestcase(unittest.TestCase):
+
+    def test_defaults(self):
+        classifier = LineClassifier()
+        self.assertEqual(classifier.classify("plain line"), LineClass(None, False, False, False))
+        self.assertEqual(classifier.classify("retcode: -5"), LineClass(-5, False, False, False))
+        self.assertEqual(classifier.classify("[INFO][main]: retcode: 0"),
+                         LineClass(0, False, True, False))
+        self.assertEqual(classifier.classify("retcode: 1 retcode: 2"),
+                         LineClass(1, False, False, False))
+        self.assertTrue(classifier.classify("retcode: 0 cmd tasklet init").boot)
+        self.assertFalse(classifier.classify("x [INFO][main]: not a trace").trace)
+
+    def test_custom_patterns(self):
+        classifier = LineClassifier.from_config({"retcode": r"^(OK|ERR(-?\d+))$",
+                                                 "prompt": r"^> $", "trace": None})
+        self.assertEqual(classifier.classify("> "), LineClass(None, False, False, True))
+        self.assertEqual(classifier.classify("[INFO][main]: x").trace, False)
+        self.assertEqual(classifier.classify("cmd tasklet init").boot, True)
+        # The first group is the return code, num converts non-numbers to -1.
+        self.assertEqual(classifier.classify("OK").retcode, -1)
+        classifier = LineClassifier(retcode=r"^(?:OK|ERR)\s*(-?\d*)", boot=None)
+        self.assertEqual(classifier.classify("ERR 22").retcode, 22)
+        self.assertFalse(classifier.classify("cmd tasklet init").boot)
+
+    def test_from_config_cached(self):
+        self.assertIs(LineClassifier.from_config(None), LineClassifier.from_config({}))
+        self.assertIs(LineClassifier.from_config({"prompt": "> "}),
+                      LineClassifier.from_config({"prompt": "> "}))
+        self.assertIsNot(LineClassifier.from_config(), LineClassifier.from_config({"boot": None}))
+
+    def test_invalid_config(self):
+        for config in ({"retcode": "retcode: \\d+"}, {"trace": "(["}, {"level": "x"}, "x"):
+            with self.assertRaises(ValueError):
+                LineClassifier.from_config(config)
+
+    def test_global_flags(self):
+        with self.assertRaises(ValueError):
+            LineClassifier(retcode=r"(?i)retcode: (-?\d+)")
+        with self.assertRaises(ValueError):
+            LineClassifier.from_config({"prompt": "(?x) > "})
+        classifier = LineClassifier(retcode=r"(?i:retcode): (-?\d+)")
+        self.assertEqual(classifier.classify("RETCODE: 3").retcode, 3)
+        self.assertFalse(classifier.classify("CMD TASKLET INIT").boot)
+
+    def test_group_names(self):
+        with self.assertRaises(ValueError):
+            LineClassifier(retcode=r"retcode: (?P<value>-?\d+)", prompt=r"(?P<value>>) ")
+        classifier = LineClassifier(retcode=r"retcode: (?P<code>-?\d+)", prompt=r"(?P<p>>) $")
+        self.assertEqual(classifier.classify("retcode: 4").retcode, 4)
+        self.assertTrue(classifier.classify("> ").prompt)
+
+    def test_numbered_backreferences(self):
+        classifier = LineClassifier(boot=r"^(\w)\1 (boot)(?(2)ed)$")
+        self.assertTrue(classifier.classify("aa booted").boot)
+        self.assertFalse(classifier.classify("ab booted").boot)
+        self.assertEqual(classifier.classify("retcode: 2").retcode, 2)
+        # Octal escapes and escapes in character classes are not references.
+        classifier = LineClassifier(prompt=r"^(x)[\1]\101\1$")
+        self.assertTrue(classifier.classify("x\x01Ax").prompt)
+        with self.assertRaises(ValueError):
+            LineClassifier(boot=r"(a)\2")
+
+
+if __name__ == '__main__':
+    unittest.main()
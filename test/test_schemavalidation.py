@@ -63,6 +63,42 @@ class ValidatorTestcase(unittest.TestCase):
                }
         validate(meta, self.tc_meta_schema)
 
+    @staticmethod
+    def _meta(application):
+        return {"requirements": {"duts": {"*": {"count": 1, "application": application}}}}
+
+    def test_application_types(self):
+        valid = {
+            "tcp_nodelay": False,
+            "tcp_keepalive": 5,
+            "tcp_reconnect": 3,
+            "tcp_reconnect_delay": 0.5,
+            "tcp_connect_timeout": 10,
+            "tcp_write_timeout": 10,
+            "use_pty": True,
+            "pool_reset_cmds": ["reset"],
+            "pool_health_cmd": "ping",
+            "cli_pipelining": True,
+            "cli_pipeline_depth": 4,
+        }
+        invalid = {
+            "tcp_nodelay": 1,
+            "tcp_keepalive": -1,
+            "tcp_reconnect": 1.5,
+            "tcp_reconnect_delay": "1",
+            "tcp_connect_timeout": None,
+            "tcp_write_timeout": -1,
+            "use_pty": "true",
+            "pool_reset_cmds": "reset",
+            "pool_health_cmd": ["ping"],
+            "cli_pipelining": "yes",
+            "cli_pipeline_depth": 0,
+        }
+        validate(self._meta(valid), self.tc_meta_schema)
+        for key, value in invalid.items():
+            with self.assertRaises(ValidationError):
+                validate(self._meta({key: value}), self.tc_meta_schema)
+
     def test_validation_successful_with_extra_fields_and_missing_fields(self):
         meta = {"extra_field": {"This field does not exist in the schema": "data"}}
 
@@ -15,9 +15,11 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
+import random
 import unittest
-from icetea_lib.Searcher import verify_message
-from icetea_lib.Searcher import Invert
+from icetea_lib.Searcher import verify_message, find_next
+from icetea_lib.Searcher import Invert, AhoCorasick, TraceSearcher
+from icetea_lib.TraceStore import TraceStore
 
 class TestVerify(unittest.TestCase):
     def test_default(self):
@@ -72,7 +74,78 @@ class TestVerify(unittest.TestCase):
         self.assertTrue(verify_message(lines, {"oop"}))
         self.assertFalse(verify_message(lines, {"ai"}))
         self.assertFalse(verify_message(lines, {1}))
+        self.assertTrue(verify_message(lines, {"huhheli", "aapeli"}))
+        self.assertFalse(verify_message(lines, {"huhheli", "ai"}))
 
     def test_false_type(self):
         with self.assertRaises(TypeError):
             verify_message([], 1)
+
+
+def _verify_legacy(lines, expected):
+    position = 0
+    for message in expected:
+        try:
+            found, position, _ = find_next(lines, message, position)
+        except LookupError:
+            return False
+        if not found:
+            return False
+        position += 1
+    return True
+
+
+class TestTraceSearcher(unittest.TestCase):
+    def test_cursor_continues_search(self):
+        lines = ["boot", "ready"]
+        searcher = TraceSearcher(lines)
+        self.assertFalse(searcher.verify(["ready", "done"]))
+        lines.extend(["done"])
+        self.assertTrue(searcher.verify(["ready", "done"]))
+        lines.append("ready")
+        self.assertTrue(searcher.verify(["ready", "done"]))
+
+    def test_same_result_as_find_next(self):
+        rand = random.Random(1)
+        words = ["aa", "bb", "cc", "^a", "b$"]
+        for _ in range(200):
+            lines = []
+            searcher = TraceSearcher(lines)
+            expected = [rand.choice(words) for _ in range(rand.randint(1, 3))]
+            expected = [Invert(msg) if rand.random() < 0.3 else msg for msg in expected]
+            for _ in range(6):
+                lines.append("".join(rand.choice("abc") for _ in range(3)))
+                self.assertEqual(searcher.verify(list(expected)),
+                                 _verify_legacy(lines, expected), (lines, expected))
+
+    def test_set_any_order(self):
+        lines = ["three", "two", "one"]
+        self.assertTrue(TraceSearcher(lines).verify({"one", "two", "three"}))
+        self.assertFalse(TraceSearcher(lines).verify({"one", "four"}))
+
+    def test_large_set(self):
+        words = ["word%d" % i for i in range(20)] + ["ord1", "d1", "^word19$"]
+        lines = []
+        searcher = TraceSearcher(lines)
+        for word in reversed(words[:-1]):
+            lines.append("prefix %s suffix" % word)
+            self.assertFalse(searcher.verify(set(words)))
+        lines.append("word19")
+        self.assertTrue(searcher.verify(set(words)))
+
+    def test_aho_corasick_overlapping(self):
+        automaton = AhoCorasick(["he", "she", "his", "hers", "x", ""])
+        self.assertSetEqual(automaton.search("ushers"), {0, 1, 3, 5})
+        self.assertSetEqual(automaton.search("his"), {2, 5})
+        self.assertSetEqual(automaton.search(""), {5})
+
+    def test_trace_store_cleared(self):
+        store = TraceStore(ring_size=3)
+        store.extend(["a", "b", "c", "d"])
+        self.assertTrue(verify_message(store, ["c", "d"]))
+        self.assertFalse(verify_message(store, ["a"]))
+        store.clear()
+        self.assertFalse(verify_message(store, ["c", "d"]))
+        store.extend(["c", "d"])
+        self.assertTrue(verify_message(store, ["c", "d"]))
+        self.assertIs(store.searcher, store.searcher)
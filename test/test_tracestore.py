@@ -0,0 +1,113 @@
+# pylint: disable=missing-docstring,protected-access
+
+"""
+Copyright 2019 ARM Limited
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from argparse import Namespace
+
+import mock
+
+from icetea_lib.DeviceConnectors.Dut import Dut
+from icetea_lib.Searcher import verify_message
+from icetea_lib.TraceStore import TraceStore
+
+
+class TraceStoreTestcase(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.spill_file = os.path.join(self.tempdir, "traces.log")
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_unlimited(self):
+        store = TraceStore()
+        store.extend(["line%d" % i for i in range(100)])
+        self.assertEqual(len(store), 100)
+        self.assertEqual(store[0], "line0")
+        self.assertEqual(store[-1], "line99")
+        self.assertEqual(store, ["line%d" % i for i in range(100)])
+
+    def test_ring_drops_oldest(self):
+        store = TraceStore(ring_size=10)
+        store.extend(["line%d" % i for i in range(25)])
+        self.assertEqual(len(store), 10)
+        self.assertEqual(store.dropped, 15)
+        self.assertListEqual(list(store), ["line%d" % i for i in range(15, 25)])
+        self.assertFalse(os.path.exists(self.spill_file))
+        with self.assertRaises(IndexError):
+            store[10]  # pylint: disable=pointless-statement
+
+    def test_spill_keeps_history(self):
+        store = TraceStore(ring_size=10, spill_file=self.spill_file)
+        store.read_block = 7
+        lines = ["line%d" % i for i in range(100)] + [u"äö unicode"]
+        store.extend(lines)
+        self.assertEqual(len(store), 101)
+        self.assertEqual(store.dropped, 0)
+        self.assertTrue(os.path.exists(self.spill_file))
+        self.assertListEqual(list(store), lines)
+        self.assertListEqual(store[5:15], lines[5:15])
+        self.assertEqual(store[50], "line50")
+        self.assertEqual(store[-1], lines[-1])
+        self.assertTrue(verify_message(store, ["line3", "line42", "line95"]))
+        self.assertFalse(verify_message(store, ["line42", "line3"]))
+
+    def test_spill_readable_after_close(self):
+        store = TraceStore(ring_size=2, spill_file=self.spill_file)
+        store.extend(["a", "b", "c", "d"])
+        store.close()
+        self.assertEqual(store[0], "a")
+        store.append("e")
+        self.assertListEqual(list(store), ["a", "b", "c", "d", "e"])
+
+    def test_clear(self):
+        store = TraceStore(ring_size=2, spill_file=self.spill_file)
+        store.extend(["a", "b", "c", "d"])
+        store.clear()
+        self.assertEqual(len(store), 0)
+        self.assertFalse(os.path.exists(self.spill_file))
+        store.extend(["e", "f", "g"])
+        self.assertListEqual(list(store), ["e", "f", "g"])
+
+
+@mock.patch("icetea_lib.DeviceConnectors.Dut.LogManager")
+class DutTracePolicyTestcase(unittest.TestCase):
+    def test_policy_from_arguments(self, mock_log):
+        mock_log.get_testcase_log_dir.return_value = None
+        dut = Dut("D1", params=Namespace(trace_policy="spill", trace_ring_size=5))
+        self.addCleanup(dut.traces.clear)
+        self.assertEqual(dut.trace_policy, "spill")
+        self.assertEqual(dut.trace_ring_size, 5)
+        dut.traces.extend(["line%d" % i for i in range(20)])
+        self.assertEqual(len(dut.traces), 20)
+        self.assertTrue(os.path.exists(dut.traces.spill_file))
+
+    def test_store_traces_restores_policy(self, mock_log):  # pylint: disable=unused-argument
+        dut = Dut("D1", params=Namespace(trace_policy="ring", trace_ring_size=0))
+        dut.trace_policy = "off"
+        self.assertFalse(dut.store_traces)
+        dut.store_traces = True
+        self.assertEqual(dut.trace_policy, "ring")
+        with self.assertRaises(ValueError):
+            dut.trace_policy = "unknown"
+
+
+if __name__ == '__main__':
+    unittest.main()